@@ -0,0 +1,202 @@
+"""Benchmark each stage of `create_dataset` on its own, and end to end, on synthetic survey data.
+
+Run with `python -m pytest benchmarks/bench_create_dataset.py`; this requires the `pytest-benchmark` package. By
+default, each stage is benchmarked on 1,000, 10,000, and 100,000 rows of survey data; set the `BENCHMARK_ROWS`
+environment variable to a comma-separated list of row counts to change this, e.g. `BENCHMARK_ROWS=1000`, and
+`BENCHMARK_ROUNDS` to change the number of timed rounds per benchmark. The rows per second, and the peak traced
+memory in MiB, of each stage are recorded in the `extra_info` of each benchmark, so use `--benchmark-json` to save
+them for comparison.
+
+The synthetic survey data is generated by `generate_survey_rows`. For the stages after part-of-speech (POS) tagging,
+the English comments are replaced by comments built from POS tagged phrases, so these stages are benchmarked on known
+POS tags, without needing spaCy.
+"""
+from src.make_feedback_tool_data.make_data_for_feedback_tool import (
+    create_dataset,
+    create_phrase_level_columns,
+    drop_duplicate_rows,
+    extract_phrase_mentions,
+    preprocess_filter_comment_text,
+    save_intermediate_df,
+    save_outputs
+)
+from src.make_feedback_tool_data.preprocess import PreProcess
+from src.make_feedback_tool_data.synthetic_survey import NON_ENGLISH_COMMENTS, SURVEY_COLUMNS, generate_survey_rows
+from src.make_feedback_tool_data.text_chunking import CHUNK_ENGINES, ChunkParser
+from typing import Any, Callable, List, Tuple
+import os
+import pandas as pd
+import pytest
+import random
+import re
+import tracemalloc
+
+# Define the number of survey rows, and the number of timed rounds, for each benchmark
+ROW_COUNTS = [int(n) for n in os.getenv("BENCHMARK_ROWS", "1000,10000,100000").split(",")]
+ROUNDS = int(os.getenv("BENCHMARK_ROUNDS", "3"))
+
+# Define the POS tagged phrases used to build each synthetic sentence, as space-separated 'token/tag' or
+# 'token/tag/lemma' strings; if the lemma is not given, it is the lowercase token
+SUBJECTS = ["I/PRP/-PRON-", "We/PRP/-PRON-", "My/PRP$/-PRON- mother/NN", "My/PRP$/-PRON- employer/NN",
+            "Our/PRP$/-PRON- small/JJ business/NN"]
+VERBS = ["want/VBP to/TO apply/VB for/IN", "need/VBP to/TO find/VB", "tried/VBD/try to/TO claim/VB",
+         "am/VBP/be looking/VBG/look for/IN", "could/MD not/RB register/VB for/IN", "would/MD like/VB to/TO check/VB",
+         "can/MD not/RB get/VB", "was/VBD/be refused/VBN/refuse", "have/VBP been/VBN/be waiting/VBG/wait for/IN",
+         "do/VBP not/RB understand/VB"]
+OBJECTS = ["a/DT food/NN parcel/NN", "universal/JJ credit/NN", "the/DT furlough/NN scheme/NN",
+           "statutory/JJ sick/JJ pay/NN", "the/DT latest/JJS/late guidance/NN", "a/DT business/NN grant/NN",
+           "the/DT self/NN -/HYPH employment/NN income/NN support/NN scheme/NN", "a/DT coronavirus/NN test/NN",
+           "my/PRP$/-PRON- tax/NN return/NN", "the/DT shielding/NN letter/NN", "a/DT mortgage/NN holiday/NN",
+           "free/JJ school/NN meals/NNS/meal"]
+MODIFIERS = ["", "for/IN my/PRP$/-PRON- family/NN", "during/IN the/DT lockdown/NN",
+             "because/IN of/IN the/DT outbreak/NN", "in/IN 2/CD weeks/NNS/week",
+             "as/IN a/DT vulnerable/JJ person/NN", "online/RB", "on/IN this/DT website/NN"]
+
+# Define POS tagged sentences with personally identifiable information (PII) placeholders; the placeholder is not
+# tagged, as it is removed before POS tagging
+PII_SENTENCES = [("Please call me on [PHONE_NUMBER].", "Please/UH call/VB me/PRP/-PRON- on/IN ./."),
+                 ("My name is [PERSON_NAME].", "My/PRP$/-PRON- name/NN is/VBZ/be ./.")]
+
+
+def _parse_tagged(phrase: str) -> List[Tuple[str, str, str]]:
+    """Parse a space-separated string of 'token/tag' or 'token/tag/lemma' into (token, POS tag, lemma) tuples."""
+    tokens = []
+    for word in phrase.split():
+        token, tag, *lemma = word.split("/")
+        tokens.append((token, tag, lemma[0] if lemma else token.lower()))
+    return tokens
+
+
+def make_sentence(rng: random.Random) -> Tuple[str, List[Tuple[str, str, str]]]:
+    """Make a random POS tagged sentence, and return its text, and POS tags."""
+    tagged = _parse_tagged(" ".join([rng.choice(SUBJECTS), rng.choice(VERBS), rng.choice(OBJECTS),
+                                     rng.choice(MODIFIERS), "./."]))
+    return " ".join(t[0] for t in tagged).replace(" .", "."), tagged
+
+
+def make_survey_data(n_rows: int, seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Make synthetic survey data, and the same data de-duplicated, filtered, and POS tagged.
+
+    The survey data is generated by `generate_survey_rows`. The comments of its de-duplicated, English rows are then
+    replaced by POS tagged sentences, so the stages after POS tagging run on known POS tags.
+
+    :param n_rows: The number of rows of survey data.
+    :param seed: Default: 42. The seed of the random number generators.
+    :return: A two-element tuple. The first element is a pandas DataFrame of survey data, with columns `primary_key`,
+        `intents_clientID`, `session_id`, and `Q3`. The second element is a pandas DataFrame of the de-duplicated,
+        English rows, with the columns added by `create_dataset` before phrase mentions are extracted.
+
+    """
+
+    # Generate the survey data, and keep the de-duplicated rows with English comments below the length threshold of
+    # `preprocess_filter_comment_text`, without detecting languages
+    df = pd.DataFrame(generate_survey_rows(n_rows, seed=seed), columns=SURVEY_COLUMNS)
+    tagged_df = df.drop_duplicates("primary_key")
+    tagged_df = tagged_df[~tagged_df["Q3"].isin(NON_ENGLISH_COMMENTS) & (tagged_df["Q3"].str.len() < 4000)] \
+        .reset_index(drop=True)
+
+    # Create a comment for each of these rows from one to three random POS tagged sentences, and sometimes a sentence
+    # with PII
+    rng = random.Random(seed)
+    comments, pos_tags = [], []
+    for _ in range(len(tagged_df)):
+        sentences = [make_sentence(rng) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.1:
+            text, tagged = rng.choice(PII_SENTENCES)
+            sentences.append((text, _parse_tagged(tagged)))
+        comments.append(" ".join(s[0] for s in sentences))
+        pos_tags.append([s[1] for s in sentences])
+
+    # Create the POS tagged survey data, as `create_dataset` does before extracting phrase mentions
+    tagged_df = tagged_df.assign(Q3=comments, pos_tag=pos_tags)
+    tagged_df = tagged_df.assign(Q3_pii_removed=tagged_df["Q3"].map(PreProcess.replace_pii_regex), language="en",
+                                 is_en=True)
+    tagged_df["Q3_edit"] = tagged_df["Q3"].map(lambda x: " ".join(re.sub(r"[()\[\]+*]", "", x).split()))
+    return df, tagged_df[["primary_key", "intents_clientID", "session_id", "Q3", "Q3_pii_removed", "language",
+                          "is_en", "pos_tag", "Q3_edit"]]
+
+
+def run_stage(benchmark, n_rows: int, func: Callable, *args: Any) -> Any:
+    """Benchmark a stage, recording its rows per second, and peak traced memory, in the benchmark extra info."""
+
+    # Measure the peak traced memory of one call outside the timed rounds, as tracing slows down the stage
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Time the stage, and record the rows per second, and peak memory
+    output = benchmark.pedantic(func, args=args, rounds=ROUNDS)
+    benchmark.extra_info["rows"] = n_rows
+    benchmark.extra_info["rows_per_sec"] = n_rows / benchmark.stats.stats.mean
+    benchmark.extra_info["peak_memory_mib"] = peak / 2 ** 20
+    return output
+
+
+@pytest.fixture(scope="module", params=ROW_COUNTS, ids=lambda n: f"{n}-rows")
+def survey_data(request):
+    """Synthetic survey data, and its de-duplicated, filtered, and POS tagged version, for each row count."""
+    return make_survey_data(request.param)
+
+
+@pytest.fixture(scope="module")
+def phrase_mentions_df(survey_data):
+    """The POS tagged survey data, with phrase mentions extracted."""
+    return extract_phrase_mentions(survey_data[1], parser=ChunkParser(engine="compiled"))
+
+
+def test_benchmark_drop_duplicate_rows(benchmark, survey_data):
+    """Benchmark `drop_duplicate_rows`."""
+    run_stage(benchmark, len(survey_data[0]), drop_duplicate_rows, survey_data[0])
+
+
+def test_benchmark_preprocess_filter_comment_text(benchmark, survey_data):
+    """Benchmark `preprocess_filter_comment_text`, which removes PII, and detects the language of each comment."""
+    df = drop_duplicate_rows(survey_data[0])
+    run_stage(benchmark, len(df), preprocess_filter_comment_text, df)
+
+
+def test_benchmark_part_of_speech_tag_batch(benchmark, survey_data):
+    """Benchmark `PreProcess.part_of_speech_tag_batch` on the English comments."""
+    texts = survey_data[1]["Q3_pii_removed"]
+    run_stage(benchmark, len(texts), lambda x: PreProcess.part_of_speech_tag_batch(x), texts)
+
+
+@pytest.mark.parametrize("engine", CHUNK_ENGINES)
+def test_benchmark_extract_phrase(benchmark, survey_data, engine):
+    """Benchmark `ChunkParser.extract_phrase` on the POS tags of each comment, for each chunking engine."""
+    parser = ChunkParser(engine=engine)
+    pos_tags = survey_data[1]["pos_tag"].to_list()
+    run_stage(benchmark, len(pos_tags), lambda x: [parser.extract_phrase(v, merge_inplace=True) for v in x], pos_tags)
+
+
+@pytest.mark.parametrize("engine", CHUNK_ENGINES)
+def test_benchmark_extract_phrase_mentions(benchmark, survey_data, engine):
+    """Benchmark `extract_phrase_mentions`, for each chunking engine."""
+    parser = ChunkParser(engine=engine)
+    run_stage(benchmark, len(survey_data[1]), lambda x: extract_phrase_mentions(x, parser=parser), survey_data[1])
+
+
+def test_benchmark_create_phrase_level_columns(benchmark, phrase_mentions_df):
+    """Benchmark `create_phrase_level_columns`."""
+    run_stage(benchmark, len(phrase_mentions_df), create_phrase_level_columns, phrase_mentions_df)
+
+
+def test_benchmark_save_intermediate_df(benchmark, tmp_path, phrase_mentions_df):
+    """Benchmark `save_intermediate_df`, which writes the Parquet checkpoint."""
+    run_stage(benchmark, len(phrase_mentions_df), save_intermediate_df, phrase_mentions_df,
+              str(tmp_path.joinpath("checkpoint.parquet")))
+
+
+def test_benchmark_save_outputs(benchmark, tmp_path, survey_data, phrase_mentions_df):
+    """Benchmark writing the Parquet checkpoint, and the CSV output, of `create_dataset`."""
+    run_stage(benchmark, len(phrase_mentions_df), save_outputs, phrase_mentions_df, survey_data[0].columns,
+              str(tmp_path.joinpath("checkpoint.parquet")), str(tmp_path.joinpath("output.csv")))
+
+
+def test_benchmark_create_dataset(benchmark, tmp_path, survey_data):
+    """Benchmark `create_dataset` end to end, from the survey CSV file to the output CSV file."""
+    survey_filename = str(tmp_path.joinpath("survey.csv"))
+    survey_data[0].to_csv(survey_filename, index=False)
+    run_stage(benchmark, len(survey_data[0]), create_dataset, survey_filename, None,
+              str(tmp_path.joinpath("checkpoint.parquet")), str(tmp_path.joinpath("output.csv")))
@@ -0,0 +1,77 @@
+"""Benchmark the `PreProcess.find_needle` engines against the original implementation on the fake data.
+
+Run with `python -m pytest benchmarks/bench_find_needle.py`; this requires the `pytest-benchmark` package.
+"""
+from difflib import SequenceMatcher as SM
+from nltk.util import ngrams
+from src.make_feedback_tool_data.preprocess import FIND_NEEDLE_ENGINES, PreProcess
+import os
+import pandas as pd
+import pytest
+import random
+import re
+
+# Get the folder path to the fake data
+DIR_FAKE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fake-data")
+
+
+def find_needle_original(needle, hay):
+    """Original implementation of `PreProcess.find_needle`, which computes the ratio of every n-gram."""
+    needle_length = len(needle.split())
+    max_sim_val = 0
+    max_sim_string = u""
+    for ngram in ngrams(hay.split(), needle_length + int(.65 * needle_length)):
+        hay_ngram = u" ".join(ngram)
+        similarity = SM(None, hay_ngram, needle).ratio()
+        if similarity > max_sim_val:
+            max_sim_val = similarity
+            max_sim_string = hay_ngram
+    if max_sim_string == "":
+        max_sim_string = hay
+    tokens = needle.split(" ")
+    expression = tokens[0] if len(tokens) == 1 else f"({tokens[0]}).*({tokens[-1]})"
+    result = re.search(expression, max_sim_string)
+    return {needle: result.group() if result else None}
+
+
+def create_needles_and_hays(n: int = 500, seed: int = 42):
+    """Create (needle, hay) pairs from the fake data, where each needle is a perturbed word n-gram from its hay."""
+
+    # Initialise a random number generator, and create hays by concatenating the text fields of each fake data row
+    rng = random.Random(seed)
+    hays = []
+    for f in sorted(os.listdir(DIR_FAKE_DATA)):
+        df = pd.read_csv(os.path.join(DIR_FAKE_DATA, f), dtype=str).fillna("")
+        hays.extend(" ".join(re.sub(r"[^a-z0-9 ]", " ", " ".join(row).lower()).split()) for row in df.values)
+    hays = rng.sample([h for h in hays if len(h.split()) > 8], n)
+
+    # Create a needle from a random n-gram of each hay, dropping one of its middle words
+    pairs = []
+    for hay in hays:
+        words = hay.split()
+        length = rng.randint(2, 6)
+        start = rng.randrange(len(words) - length)
+        needle = words[start:start + length]
+        if length > 3:
+            del needle[rng.randrange(1, length - 1)]
+        pairs.append((" ".join(needle), hay))
+    return pairs
+
+
+@pytest.fixture(scope="module")
+def needles_and_hays():
+    """The benchmark (needle, hay) pairs, which are only created when a benchmark is run, not when it is collected."""
+    return create_needles_and_hays()
+
+
+@pytest.mark.parametrize("engine", ["original", *FIND_NEEDLE_ENGINES])
+def test_benchmark_find_needle(benchmark, needles_and_hays, engine):
+    """Benchmark `PreProcess.find_needle` for each engine, and the original implementation."""
+    func = find_needle_original if engine == "original" else \
+        (lambda needle, hay: PreProcess.find_needle(needle, hay, engine=engine))
+    output = benchmark(lambda: [func(needle, hay) for needle, hay in needles_and_hays])
+
+    # Record how many outputs match the original implementation
+    expected = [find_needle_original(needle, hay) for needle, hay in needles_and_hays]
+    benchmark.extra_info["pairs"] = len(needles_and_hays)
+    benchmark.extra_info["matches_original"] = sum(o == e for o, e in zip(output, expected))
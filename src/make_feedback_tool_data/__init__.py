@@ -1,20 +1,38 @@
 from .chunk import Chunk
+from .compiled_chunker import CompiledChunker
 from .make_data_for_feedback_tool import (
+    PHRASE_MENTION_LABEL_PAIRS,
     create_dataset,
     create_phrase_level_columns,
     drop_duplicate_rows,
+    drop_processed_rows,
     extract_phrase_mentions,
+    is_valid_checkpoint,
+    load_intermediate_df,
     preprocess_filter_comment_text,
-    save_intermediate_df
+    save_intermediate_df,
+    save_outputs
 )
+from .pos_tag_cache import PosTagCache
 from .preprocess import PreProcess, PII_REGEX
+from .primary_key_store import PrimaryKeyStore
 from .regex_categorisation import (
+    RegexCategoriser,
+    get_regex_categoriser,
     regex_category_identification,
     regex_group_verbs,
-    regex_for_theme
+    regex_for_theme,
+    required_literals
 )
+from .run_metrics import RunMetrics, StageMetrics
+from .stage_profiler import SamplingProfiler, StageProfiler
+from .synthetic_survey import generate_survey_rows, sample_regex, write_survey_file
 from .text_chunking import ChunkParser
 
-__all__ = ["Chunk", "ChunkParser", "PreProcess", "PII_REGEX", "create_dataset", "create_phrase_level_columns",
-           "drop_duplicate_rows", "extract_phrase_mentions", "preprocess_filter_comment_text",
-           "regex_category_identification", "regex_group_verbs", "regex_for_theme", "save_intermediate_df"]
+__all__ = ["Chunk", "ChunkParser", "CompiledChunker", "PHRASE_MENTION_LABEL_PAIRS", "PosTagCache", "PreProcess",
+           "PII_REGEX", "PrimaryKeyStore", "RegexCategoriser", "RunMetrics", "SamplingProfiler", "StageMetrics",
+           "StageProfiler", "create_dataset", "create_phrase_level_columns", "drop_duplicate_rows",
+           "drop_processed_rows", "extract_phrase_mentions", "generate_survey_rows", "get_regex_categoriser",
+           "is_valid_checkpoint", "load_intermediate_df", "preprocess_filter_comment_text",
+           "regex_category_identification", "regex_group_verbs", "regex_for_theme", "required_literals", "sample_regex",
+           "save_intermediate_df", "save_outputs", "write_survey_file"]
@@ -1,40 +1,119 @@
-from typing import List, Tuple
-import re
+from types import MappingProxyType
+from typing import List, Optional, Tuple, Union
+import sys
+
+# Define the part-of-speech (POS) tag class flags; a POS tag is in a class if it contains the class substring, e.g.
+# 'NNP' is a noun, and 'VBD' is a verb
+POS_TAG_NOUN = 1
+POS_TAG_VERB = 2
+POS_TAG_ADJECTIVE = 4
+POS_TAG_CARDINAL = 8
+POS_TAG_CLASS_SUBSTRINGS = ((POS_TAG_NOUN, "NN"), (POS_TAG_VERB, "VB"), (POS_TAG_ADJECTIVE, "JJ"),
+                            (POS_TAG_CARDINAL, "CD"))
+
+# Define the POS tag classes of tagable, and important tokens
+TAGABLE_TAG_FLAGS = POS_TAG_NOUN | POS_TAG_VERB
+IMPORTANT_TAG_FLAGS = POS_TAG_NOUN | POS_TAG_VERB | POS_TAG_ADJECTIVE | POS_TAG_CARDINAL
+
+# Define the Penn Treebank POS tags, as used by spaCy's English models
+PENN_TREEBANK_TAGS = ("$", "''", ",", "-LRB-", "-RRB-", ".", ":", "ADD", "AFX", "CC", "CD", "DT", "EX", "FW", "HYPH",
+                      "IN", "JJ", "JJR", "JJS", "LS", "MD", "NFP", "NN", "NNP", "NNPS", "NNS", "PDT", "POS", "PRP",
+                      "PRP$", "RB", "RBR", "RBS", "RP", "SYM", "TO", "UH", "VB", "VBD", "VBG", "VBN", "VBP", "VBZ",
+                      "WDT", "WP", "WP$", "WRB", "XX", "_SP", "``")
+
+
+def pos_tag_class_flags(tag: str) -> int:
+    """Get the class flags of a part-of-speech (POS) tag.
+
+    :param tag: A POS tag.
+    :return: The bitwise OR of the `POS_TAG_*` class flags of `tag`, or 0 if it is in none of these classes.
+
+    """
+    return sum(flag for flag, substring in POS_TAG_CLASS_SUBSTRINGS if substring in tag)
+
+
+class _PosTagFlags(dict):
+    """A dictionary of POS tags to class flags, which computes the class flags of any tag not in the dictionary."""
+
+    def __missing__(self, tag: str) -> int:
+        return pos_tag_class_flags(tag)
+
+
+# Define a read-only lookup table of the class flags of each Penn Treebank POS tag, shared by all `Chunk` objects; tags
+# outside the Penn Treebank have their class flags computed on lookup
+POS_TAG_FLAGS = MappingProxyType(_PosTagFlags({sys.intern(t): pos_tag_class_flags(t) for t in PENN_TREEBANK_TAGS}))
+
+# Define a sentinel for string views, and the character span, of a `Chunk` that have not been computed yet; the span
+# can be None, so None cannot be used
+_NOT_COMPUTED = object()
+
+
+def _join(left: str, right: str) -> str:
+    """Join two space-delimited strings with a space, ignoring either string if it is empty.
+
+    :param left: A space-delimited string.
+    :param right: A space-delimited string.
+    :return: `left` and `right` delimited by a space, or whichever is non-empty if the other is empty.
+
+    """
+    return f"{left} {right}" if left and right else left or right
 
 
 class Chunk:
 
-    def __init__(self, label: str, tokens: List[Tuple[str, str, str]], indices: List[int]) -> None:
+    __slots__ = ("label", "tokens", "indices", "_text", "_lemma", "_important_word", "_important_lemma", "_span")
+
+    def __init__(self, label: str, tokens: List[Tuple[Union[str, int], ...]], indices: List[int]) -> None:
         """Helper class to extract and combine useful tokens/lemmas based on part-of-speech (POS) tag.
 
+        The string views of the tokens, and their character span, are only computed when first accessed, and then
+        cached, as most chunks are discarded without being used.
+
         :param label: A POS tag.
-        :param tokens: A three-element tuple or list of a token, its POS tag, and its lemma.
+        :param tokens: A three-element tuple or list of a token, its POS tag, and its lemma. Optionally, a fourth
+            element of the character offset of the token in the tagged text.
         :param indices: The index of the word in the sentence.
 
         """
         self.label = label
         self.tokens = tokens
         self.indices = indices
-        self.text = self.text()
-        self.lemma = self.lemma()
-        self.important_lemma = self.important_lemma()
-        self.important_word = self.important_word()
-
+        self._text = _NOT_COMPUTED
+        self._lemma = _NOT_COMPUTED
+        self._important_word = _NOT_COMPUTED
+        self._important_lemma = _NOT_COMPUTED
+        self._span = _NOT_COMPUTED
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Chunk):
+            return NotImplemented
+        return (self.label, list(self.tokens), list(self.indices)) == \
+            (other.label, list(other.tokens), list(other.indices))
+
+    def __repr__(self) -> str:
+        return f"Chunk({self.label!r}, {self.tokens!r}, {self.indices!r})"
+
+    @property
     def text(self) -> str:
         """Combine tokens into a text string.
 
         :return: A string of all tokens delimited by a space.
 
         """
-        return " ".join([w for w, _, _ in self.tokens])
+        if self._text is _NOT_COMPUTED:
+            self._text = " ".join([t[0] for t in self.tokens])
+        return self._text
 
+    @property
     def lemma(self) -> str:
         """Combine lemmas of the tokens into a string.
 
         :return: A string of all lemmas delimited by a space.
 
         """
-        return " ".join([l for _, _, l in self.tokens])
+        if self._lemma is _NOT_COMPUTED:
+            self._lemma = " ".join([t[2] for t in self.tokens])
+        return self._lemma
 
     def tagable_words(self) -> List[Tuple[str, str]]:
         """Get each token and its parts-of-speech (POS) tag, if the POS tag is a noun or verb.
@@ -43,8 +122,9 @@ class Chunk:
         noun or verb POS tag (NN or VB).
 
         """
-        return [(w, pos) for w, pos, _ in self.tokens if re.search(r"(NN)|(VB)", pos)]
+        return [(t[0], t[1]) for t in self.tokens if POS_TAG_FLAGS[t[1]] & TAGABLE_TAG_FLAGS]
 
+    @property
     def important_word(self) -> str:
         """Get a string of all important tokens, based on their part-of-speech (POS) tag.
 
@@ -53,8 +133,12 @@ class Chunk:
         :return: A string of all important tokens delimited by a space.
 
         """
-        return " ".join([w for w, pos, _ in self.tokens if re.search(r"(NN)|(VB)|(JJ)|(CD)", pos)])
+        if self._important_word is _NOT_COMPUTED:
+            self._important_word = " ".join([t[0] for t in self.tokens
+                                             if POS_TAG_FLAGS[t[1]] & IMPORTANT_TAG_FLAGS])
+        return self._important_word
 
+    @property
     def important_lemma(self) -> str:
         """Get a string of all important lemmas, based on their part-of-speech (POS) tag.
 
@@ -63,4 +147,55 @@ class Chunk:
         :return: A string of all important lemmas delimited by a space.
 
         """
-        return " ".join([l for _, pos, l in self.tokens if re.search(r"(NN)|(VB)|(JJ)|(CD)", pos)])
+        if self._important_lemma is _NOT_COMPUTED:
+            self._important_lemma = " ".join([t[2] for t in self.tokens
+                                              if POS_TAG_FLAGS[t[1]] & IMPORTANT_TAG_FLAGS])
+        return self._important_lemma
+
+    @property
+    def span(self) -> Optional[Tuple[int, int]]:
+        """Get the character span of the chunk in the tagged text, if the tokens have character offsets.
+
+        :return: A two-element tuple of the start and end character offsets of the chunk in the tagged text, such that
+            slicing the tagged text with these offsets returns the chunk, including any text between its tokens. If
+            any token does not have a character offset, returns None.
+
+        """
+        if self._span is _NOT_COMPUTED:
+            if not self.tokens or any(len(t) < 4 for t in self.tokens):
+                self._span = None
+            else:
+                self._span = self.tokens[0][3], self.tokens[-1][3] + len(self.tokens[-1][0])
+        return self._span
+
+    def merge(self, other: "Chunk") -> "Chunk":
+        """Merge this chunk with the chunk that follows it, keeping the label of this chunk.
+
+        Any string views, or character spans, already computed for both chunks are combined, rather than re-computed
+        from the merged tokens.
+
+        :param other: A `Chunk` object that follows this chunk.
+        :return: A new `Chunk` object with the label of this chunk, and the tokens, and indices of this chunk followed
+            by those of `other`.
+
+        """
+
+        # Create the merged chunk from the combined tokens, and indices
+        merged = Chunk(self.label, self.tokens + other.tokens, self.indices + other.indices)
+
+        # Combine the string views computed for both chunks; the important views can be empty, so are joined without
+        # a leading or trailing space
+        if self._text is not _NOT_COMPUTED and other._text is not _NOT_COMPUTED:
+            merged._text = _join(self._text, other._text)
+        if self._lemma is not _NOT_COMPUTED and other._lemma is not _NOT_COMPUTED:
+            merged._lemma = _join(self._lemma, other._lemma)
+        if self._important_word is not _NOT_COMPUTED and other._important_word is not _NOT_COMPUTED:
+            merged._important_word = _join(self._important_word, other._important_word)
+        if self._important_lemma is not _NOT_COMPUTED and other._important_lemma is not _NOT_COMPUTED:
+            merged._important_lemma = _join(self._important_lemma, other._important_lemma)
+
+        # Combine the character spans computed for both chunks, if either has no span the merged chunk has none
+        if self._span is not _NOT_COMPUTED and other._span is not _NOT_COMPUTED:
+            merged._span = (self._span[0], other._span[1]) if self._span and other._span else None
+
+        return merged
@@ -0,0 +1,165 @@
+from nltk.tree import Tree
+from src.make_feedback_tool_data.chunk import PENN_TREEBANK_TAGS
+from typing import Dict, List, Optional, Pattern, Sequence, Tuple, Union
+import re
+
+# Define a regular expression to find each tag pattern, e.g. '<NN.*>', in a chunk rule, and the characters allowed
+# between tag patterns in a chunk rule supported by `CompiledChunker`
+TAG_PATTERN_REGEX = re.compile(r"<([^<>]*)>")
+RULE_OPERATORS_REGEX = re.compile(r"[()?*+|]*")
+
+# Define the first character used to represent a tag; characters are taken from the Unicode private use area, so that
+# they cannot clash with regular expression syntax
+FIRST_TAG_CHAR = 0xE000
+
+# Define the zero-width regular expression pattern that only matches positions outside existing chunks; this is the
+# same as `nltk.chunk.regexp.ChunkString.IN_STRIP_PATTERN`
+IN_STRIP_PATTERN = r"(?=[^}]*({|$))"
+
+
+def _read_grammar(grammar: str) -> List[Tuple[str, List[str]]]:
+    """Read the stages of a chunk grammar, in the same format as nltk.chunk.regexp.RegexpParser.
+
+    :param grammar: A string of grammar regular expressions, where each stage starts with a line of its label
+        followed by a colon, and each following line is a chunk rule for this stage, e.g. '{<DT>?<NN.*>+}'.
+    :return: A list of two-element tuples of the label of each stage, and a list of its chunk rule tag patterns, in
+        order.
+    :raise ValueError: If a rule is not a chunk rule, or is not in a stage.
+
+    """
+
+    # Initialise a storage variable
+    stages = []
+
+    # Iterate over each line of `grammar`; a new stage begins with an unescaped colon
+    for line in grammar.split("\n"):
+        line = line.strip()
+        m = re.match(r"(?P<label>(\\.|[^:])*)(:(?P<rule>.*))", line)
+        if m:
+            stages.append((m.group("label").strip(), []))
+            line = m.group("rule").strip()
+
+        # Remove any comment from the line, and skip blank lines
+        line = re.match(r"(?P<rule>(\\.|[^#])*)", line).group("rule").strip()
+        if not line:
+            continue
+
+        # Only chunk rules are supported; any other rule type needs the nltk engine
+        if not (line.startswith("{") and line.endswith("}")):
+            raise ValueError(f"Unsupported chunk rule for the compiled engine: {line}")
+        if not stages:
+            raise ValueError("Expected stage marker (eg NP:)")
+        stages[-1][1].append(re.sub(r"\s", "", line[1:-1]))
+
+    # Return the stages with at least one rule
+    return [(label, rules) for label, rules in stages if rules]
+
+
+class CompiledChunker:
+
+    def __init__(self, grammar: str, root_label: str = "S") -> None:
+        """Chunk part-of-speech (POS) tagged text using grammar regular expressions, compiled over a tag alphabet.
+
+        Gives the same output as nltk.chunk.regexp.RegexpParser for grammars of chunk rules. Each tag, and each stage
+        label, is mapped to a single character, so that each sentence is a short string of tag characters. Each tag
+        pattern, e.g. '<NN.*>', is compiled into a character class of the tags it matches, and each rule into one
+        regular expression over these characters. Rules are compiled once, and only re-compiled when a tag is seen
+        that is not in the Penn Treebank tag set, or the stage labels.
+
+        :param grammar: A string of grammar regular expressions usable by the `grammar` argument of the
+            nltk.chunk.regexp.RegexpParser class. Only chunk rules, e.g. '{<DT>?<NN.*>+}', are supported.
+        :param root_label: Default: 'S'. The label of the tree returned by `CompiledChunker.parse`.
+        :raise ValueError: If `grammar` has a rule that is not a chunk rule, or a tag pattern that is not supported.
+
+        """
+        self.root_label = root_label
+        self.stages = _read_grammar(grammar)
+
+        # Compile the tag pattern of each tag pattern in the grammar, and check the rules only have supported
+        # operators between tag patterns
+        self._tag_patterns: Dict[str, Pattern] = {}
+        for _, rules in self.stages:
+            for rule in rules:
+                if not RULE_OPERATORS_REGEX.fullmatch(TAG_PATTERN_REGEX.sub("", rule)):
+                    raise ValueError(f"Unsupported tag pattern for the compiled engine: {rule}")
+                for tag_pattern in TAG_PATTERN_REGEX.findall(rule):
+                    self._tag_patterns.setdefault(tag_pattern, re.compile(tag_pattern))
+
+        # Assign a character to each stage label, and each Penn Treebank tag, and compile the rules
+        self._tag_chars: Dict[str, str] = {}
+        self._rules: Optional[List[Tuple[str, str, List[Pattern]]]] = None
+        for tag in [*(label for label, _ in self.stages), *PENN_TREEBANK_TAGS]:
+            self._tag_char(tag)
+        self._compile()
+
+    def _tag_char(self, tag: str) -> str:
+        """Get the character of a tag, assigning a new character if the tag has not been seen before.
+
+        :param tag: A POS tag, or a stage label.
+        :return: The character representing `tag`.
+
+        """
+        char = self._tag_chars.get(tag)
+        if char is None:
+            char = self._tag_chars[tag] = chr(FIRST_TAG_CHAR + len(self._tag_chars))
+            self._rules = None
+        return char
+
+    def _compile(self) -> None:
+        """Compile the rules of each stage over the current tag characters.
+
+        :return: None.
+
+        """
+
+        # Get the character class of each tag pattern, which matches the characters of all the tags it fully matches;
+        # tag patterns that match no tags never match
+        classes = {}
+        for tag_pattern, regex in self._tag_patterns.items():
+            chars = "".join(c for t, c in self._tag_chars.items() if regex.fullmatch(t))
+            classes[tag_pattern] = f"[{chars}]" if chars else "(?!)"
+
+        # Compile each rule, such that it only matches outside existing chunks
+        self._rules = [
+            (label, self._tag_chars[label],
+             [re.compile(f"(?P<chunk>{TAG_PATTERN_REGEX.sub(lambda m: classes[m.group(1)], rule)}){IN_STRIP_PATTERN}")
+              for rule in rules])
+            for label, rules in self.stages
+        ]
+
+    def parse(self, tagged: Sequence[Union[Tuple[Union[str, int], ...], Tree]]) -> Tree:
+        """Chunk a POS tagged sentence.
+
+        :param tagged: A list of tuples, where the second element of each tuple is a POS tag, e.g. a token, its POS
+            tag, and its lemma.
+        :return: An nltk.tree.Tree object, with the same structure as the output of the `parse` method of
+            nltk.chunk.regexp.RegexpParser, where each chunk is a subtree labelled with its stage label.
+
+        """
+
+        # Get the character of each tag, and re-compile the rules if a new tag has been seen
+        pieces = list(tagged)
+        chars = "".join([self._tag_char(p.label() if isinstance(p, Tree) else p[1]) for p in pieces])
+        if self._rules is None:
+            self._compile()
+
+        # Apply each stage in turn, where each rule of the stage chunks any matching tags outside existing chunks
+        for label, label_char, rules in self._rules:
+            for rule in rules:
+                chars = rule.sub(r"{\g<chunk>}", chars).replace("{}", "")
+
+            # If any chunks were found, replace the pieces of each chunk with a subtree labelled with `label`, and
+            # each chunk in `chars` with the character of `label`
+            if "{" in chars:
+                new_pieces, new_chars, index = [], [], 0
+                for i, segment in enumerate(re.split("[{}]", chars)):
+                    if i % 2:
+                        new_pieces.append(Tree(label, pieces[index:index + len(segment)]))
+                        new_chars.append(label_char)
+                    else:
+                        new_pieces.extend(pieces[index:index + len(segment)])
+                        new_chars.append(segment)
+                    index += len(segment)
+                pieces, chars = new_pieces, "".join(new_chars)
+
+        return Tree(self.root_label, pieces)
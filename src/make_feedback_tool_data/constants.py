@@ -0,0 +1,12 @@
+# Import the regular expression parser, and its constants; these were renamed in Python 3.11. Modules needing to parse
+# regular expressions import these from here, rather than from each other
+try:
+    from re import _constants as sre_constants, _parser as sre_parse  # noqa: F401
+except ImportError:
+    import sre_constants  # noqa: F401
+    import sre_parse  # noqa: F401
+
+# Define the personally identifiable information (PII) placeholders stripped out of the survey comments. These are
+# kept here, without any third-party imports, so that lightweight modules do not need to import `preprocess`
+PII_FILTERED = ["DATE_OF_BIRTH", "EMAIL_ADDRESS", "PASSPORT", "PERSON_NAME", "PHONE_NUMBER", "STREET_ADDRESS",
+                "UK_NATIONAL_INSURANCE_NUMBER", "UK_PASSPORT"]
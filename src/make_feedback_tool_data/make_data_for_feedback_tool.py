@@ -1,15 +1,33 @@
-from src.make_feedback_tool_data.preprocess import PreProcess
+from src.make_feedback_tool_data.pos_tag_cache import PosTagCache
+from src.make_feedback_tool_data.preprocess import (
+    FIND_NEEDLE_ENGINES,
+    LANGUAGE_ERROR,
+    PreProcess,
+    SPACY_DEFAULT_PROFILE,
+    SPACY_PROFILES
+)
+from src.make_feedback_tool_data.primary_key_store import PrimaryKeyStore
 from src.make_feedback_tool_data.regex_categorisation import regex_for_theme, regex_group_verbs
-from src.make_feedback_tool_data.text_chunking import ChunkParser
+from src.make_feedback_tool_data.run_metrics import RunMetrics
+from src.make_feedback_tool_data.stage_profiler import PROFILERS, StageProfiler
+from src.make_feedback_tool_data.text_chunking import CHUNK_ENGINES, ChunkParser
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
 from tqdm import tqdm
-from typing import Optional
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple, Union
 import logging.config
 import os
 import nltk
 import numpy as np
 import argparse
+import glob
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import re
+import shutil
+import sys
 
 try:
     nltk.data.find('tokenizers/punkt')
@@ -21,11 +39,43 @@ log_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loggin
 logging.config.fileConfig(log_file_path)
 logger = logging.getLogger(__name__)
 
-
-def drop_duplicate_rows(df: pd.DataFrame) -> pd.DataFrame:
+# Define the Arrow types of the nested columns in the intermediate checkpoint; POS tags are stored as a list of
+# sentences, where each sentence is a list of (text, tag, lemma, idx) structs. `idx` is the character offset of the
+# token, which is null if POS tags were created without character offsets
+POS_TAG_ARROW_TYPE = pa.list_(pa.list_(pa.struct([("text", pa.string()), ("tag", pa.string()),
+                                                  ("lemma", pa.string()), ("idx", pa.int32())])))
+THEMED_PHRASE_MENTIONS_ARROW_TYPE = pa.list_(pa.struct([
+    (k, pa.list_(pa.string())) for k in ["chunked_phrase", "exact_phrase", "generic_phrase", "key"]
+]))
+CHECKPOINT_ARROW_TYPES = {"pos_tag": POS_TAG_ARROW_TYPE, "lemmas": pa.list_(pa.string()),
+                          "words": pa.list_(pa.string()), "themed_phrase_mentions": THEMED_PHRASE_MENTIONS_ARROW_TYPE}
+
+# Define the minimum number of rows for which `preprocess_filter_comment_text` removes PII using the vectorised
+# `PreProcess.replace_pii_regex_batch` method
+VECTORISE_PII_MIN_ROWS = 1000
+
+# Define the pairs of grammar chunk labels of each combination type extracted as a phrase mention by
+# `extract_phrase_mentions`
+PHRASE_MENTION_LABEL_PAIRS = frozenset({("verb", "noun"), ("verb", "prep_noun"), ("verb", "noun_verb"),
+                                        ("noun", "prep_noun"), ("prep_noun", "noun"), ("prep_noun", "prep_noun")})
+
+# Define the data types of survey data columns that must be read the same way, whatever values are in the survey file,
+# or each chunk of it; primary keys are read as text, so the same key is never read as an integer in one chunk and a
+# string or float in another
+SURVEY_DTYPES = {"primary_key": str}
+
+# Define the columns, in addition to the survey data columns, that must be in the intermediate checkpoint to resume
+# processing from it
+CHECKPOINT_RESUME_COLUMNS = ["Q3_pii_removed", "language", "is_en", "pos_tag", "Q3_edit"]
+
+
+def drop_duplicate_rows(df: pd.DataFrame, seen_keys: Optional[PrimaryKeyStore] = None) -> pd.DataFrame:
     """Dropped duplicated rows, based on the primary_key column, which is a unique session identifier.
 
     :param df: A pandas DataFrame with a column called `primary_key`, which (potentially) contains duplicate data
+    :param seen_keys: Default: None. A store of primary keys seen in previous calls, e.g. for previous chunks of the
+        same survey file. If given, rows whose primary key is in `seen_keys` are also dropped, and the remaining
+        primary keys are added to `seen_keys`.
     :return: A pandas DataFrame identical to `df`, except duplicates along the `primary_key` column are dropped.
 
     """
@@ -38,57 +88,119 @@ def drop_duplicate_rows(df: pd.DataFrame) -> pd.DataFrame:
     logger.info(f"Unique session_ids: {df.session_id.nunique()}")
     logger.info("Dropping duplicates...")
 
-    # Drop the duplicates using the `primary_key` column, and reset the index
+    # Drop the duplicates using the `primary_key` column, and reset the index; if `seen_keys` is given, the first
+    # occurrence of each primary key not already in `seen_keys` is kept instead
     duplicate_key = "primary_key"
-    df_out = df.drop_duplicates(duplicate_key).reset_index(drop=True)
+    if seen_keys is None:
+        df_out = df.drop_duplicates(duplicate_key).reset_index(drop=True)
+    else:
+        df_out = df[seen_keys.mark_new(df[duplicate_key])].reset_index(drop=True)
     logger.info(f"Dropped {loaded_number_rows - df_out.shape[0]} rows based on column {duplicate_key}.")
 
     # Return the de-duplicated pandas DataFrame
     return df_out
 
 
-def preprocess_filter_comment_text(df: pd.DataFrame, length_threshold: int = 4000) -> pd.DataFrame:
+def drop_processed_rows(df: pd.DataFrame, processed_keys: PrimaryKeyStore) -> pd.DataFrame:
+    """Drop rows whose primary key was processed by a previous run, so only new rows are processed incrementally.
+
+    :param df: A pandas DataFrame with a column called `primary_key`.
+    :param processed_keys: A store of primary keys processed by previous runs, i.e. a manifest.
+    :return: A pandas DataFrame identical to `df`, except rows whose primary key is in `processed_keys` are dropped.
+
+    """
+
+    # Drop the rows whose primary key is in `processed_keys`, and reset the index
+    loaded_number_rows = df.shape[0]
+    processed = list(processed_keys.contains_many(df["primary_key"].tolist()))
+    df_out = df[~df["primary_key"].isin(processed)].reset_index(drop=True)
+    logger.info(f"Dropped {loaded_number_rows - df_out.shape[0]} rows processed by previous runs.")
+
+    # Return the pandas DataFrame of new rows
+    return df_out
+
+
+def preprocess_filter_comment_text(df: pd.DataFrame, length_threshold: int = 4000,
+                                   vectorise_min_rows: int = VECTORISE_PII_MIN_ROWS) -> pd.DataFrame:
     """Filter down text to only English text and comments below a character length threshold.
 
     Also removes personally identifiable information (PII) from the text, according to the
-    `PreProcess.replace_pii_regex` method.
+    `PreProcess.replace_pii_regex` method. Languages are identified using the `PreProcess.detect_language_batch`
+    method, and stored in a categorical `language` column. Rows with missing text are filtered out, whichever way PII
+    is removed.
 
     :param df: A pandas DataFrame with a text column `Q3` for filtering.
     :param length_threshold: Default: 4000. The maximum number of characters any text within `Q3` of `df` can have
         - only rows less than this character limit are retained. All others are filtered out.
+    :param vectorise_min_rows: Default: 1000. If `df` has at least this many rows, PII is removed from all rows at
+        once using the vectorised `PreProcess.replace_pii_regex_batch` method. Otherwise, PII is removed from each row
+        with a progress bar.
     :return: A pandas DataFrame with PII removed, and only English text below the character length threshold.
 
     """
     logger.info("Removing non-English and lengthy comments...")
 
-    # Remove any personally identifiable information (PII), and filter out any rows were the text length is greater than
-    # or equal to `length_threshold`
-    out_df = df.assign(Q3_pii_removed=df["Q3"].progress_map(PreProcess.replace_pii_regex)) \
-        .query(f"Q3_pii_removed.str.len() < {length_threshold}")
+    # Filter out any rows with missing text, before PII is removed, so that both ways of removing PII behave the same
+    is_missing = df["Q3"].isna().to_numpy()
+    if is_missing.any():
+        logger.info(f"Dropping {is_missing.sum()} rows with missing comments...")
+        df = df[~is_missing]
+
+    # Remove any personally identifiable information (PII), vectorised for large pandas DataFrames, and flag the rows
+    # where the text length is less than `length_threshold`
+    if len(df) >= vectorise_min_rows:
+        pii_removed = PreProcess.replace_pii_regex_batch(df["Q3"])
+    else:
+        pii_removed = df["Q3"].progress_map(PreProcess.replace_pii_regex)
+    is_short = (pii_removed.str.len() < length_threshold).to_numpy()
+    pii_removed = pii_removed[is_short]
 
-    # Detect the language of each row of PII-removed text
-    out_df = out_df.assign(language=out_df["Q3_pii_removed"].progress_map(PreProcess.detect_language))
+    # Detect the language of each row of PII-removed text below the length threshold; each distinct text is only
+    # detected once, and the languages are stored as a categorical
+    logger.info(f"Detecting the language of {pii_removed.nunique()} distinct comments...")
+    language = pd.Categorical(PreProcess.detect_language_batch(pii_removed))
+
+    # Log the number of comments where language detection failed
+    number_errors = (language == LANGUAGE_ERROR).sum()
+    if number_errors:
+        logger.warning(f"Language detection failed for {number_errors} comments; their language is "
+                       f"'{LANGUAGE_ERROR}'.")
 
     # Get the count of distinct languages
-    lang_dist = out_df["language"].value_counts().to_dict()
+    lang_dist = {k: v for k, v in pd.Series(language).value_counts().to_dict().items() if v}
 
     # Log the counts from `lang_dist`
     logger.debug(f"Number of unique languages: {len(lang_dist)}")
     for k, v in lang_dist.items():
         logger.debug(f"{k}: {v / sum(lang_dist.values()):.2%}")
 
-    # Add a flag if the language is English, and filter for English only; return this output
-    return out_df.assign(is_en=out_df["language"].isin(["en", "un", "-", "sco"])).query("is_en")
+    # Flag if the language is English, and take only the English rows below the length threshold from `df` as a new
+    # pandas DataFrame, so that the new columns are added to it in place; return this output
+    is_en = language.isin(["en", "un", "-", "sco"])
+    out_df = df.take(np.flatnonzero(is_short)[is_en])
+    out_df["Q3_pii_removed"] = pii_removed.to_numpy()[is_en]
+    out_df["language"] = language[is_en]
+    out_df["is_en"] = True
+    return out_df
 
 
-def extract_phrase_mentions(df: pd.DataFrame, grammar_filename: Optional[str] = None) -> pd.DataFrame:
+def extract_phrase_mentions(df: pd.DataFrame, grammar_filename: Optional[str] = None, n_jobs: int = 1,
+                            inplace: bool = False,
+                            label_pairs: FrozenSet[Tuple[str, str]] = PHRASE_MENTION_LABEL_PAIRS,
+                            parser: Optional[ChunkParser] = None, needle_engine: str = "difflib") -> pd.DataFrame:
     """Extract phrase mentions from the text.
 
     For each POS-tagged sentence from comments in the survey data:
 
     1. Detect and extract chunks as defined by grammar, merge adjacent chunks
-    2. Compute pair-wise combinations of chunks
-    3. If a combination type is in predefined list, append it to phrase_mentions list
+    2. Compute pair-wise combinations of chunks, where the combination type is in `label_pairs`
+    3. Append each of these combinations to phrase_mentions list
+
+    If the POS tags include character offsets, and `df` has a `Q3_pii_removed` column of the tagged text, which is the
+    same text as `Q3_edit` once normalised, the exact phrase of each combination is sliced directly from the tagged
+    text. Otherwise, e.g. if PII placeholders were removed from the tagged text, so that its character offsets do not
+    match the comment, or if the sliced phrase is empty, the exact phrase is found in `Q3_edit` by fuzzy matching. See
+    `PreProcess.find_needle` for further details.
 
     :param df: A filtered, preprocessed survey pandas DataFrame.
     :param grammar_filename: Default: None. A path string to file containing regular expression grammar patterns
@@ -96,68 +208,234 @@ def extract_phrase_mentions(df: pd.DataFrame, grammar_filename: Optional[str] =
         each pattern should be listed on a separate line, and in descending order of priority (highest first). If
         None, it will use the default regular expression file - see
         src.make_feedback_tool_data.text_chunking.ChunkParser for further details.
-    :return: `df` with an additional column containing applicable phrase mentions.
+    :param n_jobs: Default: 1. The number of processes used to extract phrase mentions. If greater than 1, `df` is
+        split into `n_jobs` shards, which are processed in parallel, where each process builds one `ChunkParser`. If
+        -1, uses all available CPU cores. The output is identical, whatever the value of `n_jobs`.
+    :param inplace: Default: False. If True, add the phrase mentions column to `df` in place, and return `df`.
+        Otherwise, `df` is not modified, and a copy of `df` is returned.
+    :param label_pairs: Default: `PHRASE_MENTION_LABEL_PAIRS`. A frozenset of two-element tuples of the grammar chunk
+        labels of each combination type extracted as a phrase mention.
+    :param parser: Default: None. A `ChunkParser` class instance used to chunk the comments, in which case
+        `grammar_filename` is ignored. If None, a `ChunkParser` class instance is initialised using `grammar_filename`.
+    :param needle_engine: Default: 'difflib'. The engine used to fuzzy match exact phrases in `Q3_edit`, either
+        'difflib', or 'rapidfuzz'. See `PreProcess.find_needle` for further details.
+    :return: `df` with an additional column containing applicable phrase mentions. Phrase mentions are only extracted
+        once for rows with identical comments, POS tags, and tagged text, and then shared between these rows.
 
     """
 
     logger.info("Detecting and extracting phrase-level mentions...")
+    if needle_engine not in FIND_NEEDLE_ENGINES:
+        raise ValueError(f"Unknown needle engine '{needle_engine}'; expected one of: {', '.join(FIND_NEEDLE_ENGINES)}")
+
+    # Get the comments, their POS tags, and the tagged text, if it exists
+    rows = df[["Q3_edit", "pos_tag"]].assign(Q3_pii_removed=df.get("Q3_pii_removed")).values
+
+    # Only extract phrase mentions once for each distinct row, and set the number of processes
+    is_distinct, distinct_codes = _deduplicate(
+        ((comment, _freeze_pos_tag(vals), tagged_text) for comment, vals, tagged_text in rows),
+        "Phrase mention extraction"
+    )
+    rows = rows[is_distinct]
+    n_jobs = min(os.cpu_count() if n_jobs == -1 else n_jobs, len(rows))
+
+    # Initialise a `ChunkParser` class, if one is not given
+    if parser is None:
+        parser = ChunkParser(grammar_filename)
+
+    # If only one process is needed, iterate through the comments and the POS tagged text
+    if n_jobs <= 1:
+        phrase_mentions = [_extract_comment_phrase_mentions(parser, comment, vals, tagged_text, label_pairs,
+                                                            needle_engine)
+                           for comment, vals, tagged_text in tqdm(rows)]
+
+    # Otherwise, split the comments into `n_jobs` shards, and process each shard in a separate process; each process
+    # receives `parser` once when it starts, so the grammar is not compiled again in each process.
+    # `ProcessPoolExecutor.map` returns the results in the same order as the shards
+    else:
+        logger.info(f"Extracting phrase-level mentions using {n_jobs} processes...")
+        shards = [rows[k] for k in np.array_split(np.arange(len(rows)), n_jobs)]
+        with ProcessPoolExecutor(n_jobs, initializer=_init_phrase_mentions_worker,
+                                 initargs=(parser, label_pairs, needle_engine)) as executor:
+            phrase_mentions = [p for shard in tqdm(executor.map(_extract_shard_phrase_mentions, shards),
+                                                   total=len(shards)) for p in shard]
+
+    # Return `df` with a new column for `phrase_mentions`, broadcast back to all rows; if `inplace` is True, add the
+    # column to `df` rather than a copy of it
+    if inplace:
+        df["themed_phrase_mentions"] = _broadcast(phrase_mentions, distinct_codes)
+        return df
+    return df.assign(themed_phrase_mentions=_broadcast(phrase_mentions, distinct_codes))
+
+
+def _freeze_pos_tag(vals: List[List[Tuple[Any, ...]]]) -> Tuple[Tuple[Tuple[Any, ...], ...], ...]:
+    """Convert the POS tags of a comment into nested tuples, so that they can be hashed.
+
+    :param vals: The POS tags of a comment, i.e. a value in the `pos_tag` column.
+    :return: `vals` as a tuple of tuples of POS tag tuples.
+
+    """
+    return tuple(tuple(tuple(token) for token in sentence) for sentence in vals)
+
+
+def _normalise_exact_text(text: str) -> str:
+    """Normalise text sliced from the tagged text in the same way as the `Q3_edit` column, and lowercase it.
+
+    :param text: A text string.
+    :return: `text` in lowercase, with brackets, '+', and '*' characters removed, and whitespace collapsed.
+
+    """
+    return " ".join(re.sub(r"[()\[\]+*]", "", text).split()).lower()
+
+
+def _extract_comment_phrase_mentions(parser: ChunkParser, comment: str, vals: List[List[Tuple[Any, ...]]],
+                                     tagged_text: Optional[str] = None,
+                                     label_pairs: FrozenSet[Tuple[str, str]] = PHRASE_MENTION_LABEL_PAIRS,
+                                     needle_engine: str = "difflib") -> List[Dict[str, Any]]:
+    """Extract phrase mentions from a single comment. See `extract_phrase_mentions` for further details.
+
+    :param parser: A `ChunkParser` class instance.
+    :param comment: A pre-processed comment, i.e. a value in the `Q3_edit` column.
+    :param vals: The POS tags of `comment`, i.e. a value in the `pos_tag` column.
+    :param tagged_text: Default: None. The text that was POS tagged, i.e. a value in the `Q3_pii_removed` column. If
+        given, `vals` has character offsets, and `tagged_text` is the same text as `comment` once normalised, i.e. no
+        PII placeholders were removed from it, exact phrases are sliced from `tagged_text` rather than fuzzy matched in
+        `comment`.
+    :param label_pairs: Default: `PHRASE_MENTION_LABEL_PAIRS`. A frozenset of two-element tuples of the grammar chunk
+        labels of each combination type extracted as a phrase mention.
+    :param needle_engine: Default: 'difflib'. The engine used to fuzzy match exact phrases in `comment`. See
+        `PreProcess.find_needle` for further details.
+    :return: A list of applicable phrase mentions for `comment`.
+
+    """
 
     # Initialise a storing variable for the phrase mentions
     phrase_mentions = []
 
-    # Initialise a `ChunkParser` class
-    parser = ChunkParser(grammar_filename)
+    # Exact phrases sliced from `tagged_text` only match `comment` if both are the same text once normalised; if PII
+    # placeholders were removed from `tagged_text`, but kept in `comment` without their brackets, they are not
+    can_slice = isinstance(tagged_text, str) and _normalise_exact_text(tagged_text) == comment.lower()
+
+    # Lazily extract phrase mentions sentence by sentence, combining similar phrases together, and examine sequential
+    # pairwise combinations in each sentence, where the labels of each combination are in `label_pairs`; all other
+    # combinations are skipped before any text is computed
+    for combo in parser.iter_phrase_pairs(vals, label_pairs):
+
+        # Extract the label, and text for each pairwise combination
+        key = (combo[0].label, combo[1].label)
+        arg1 = combo[0].text.lower()
+        arg2 = combo[1].text.lower()
+
+        # Define a generic phrase for the text in the combination using regular expressions
+        generic_phrase = (regex_group_verbs(arg1), regex_for_theme(arg2))
+
+        # Remove certain characters from `arg1`, and `arg2` using regular expressions, and combine together
+        # in a tuple
+        arg1, arg2 = [re.sub(r"[?()\[\]+*]", "", a) for a in (arg1, arg2)]
+        phrase = (arg1, arg2)
+
+        # If the chunks have character spans in `tagged_text`, and these match `comment`, slice the verb, and the rest
+        # of the phrase, directly from `tagged_text`; if both are non-empty, append all the information to
+        # `phrase_mentions`
+        if can_slice and combo[0].span and combo[1].span:
+            exact_phrase = tuple(_normalise_exact_text(tagged_text[start:end]) for start, end in
+                                 [combo[0].span, (combo[0].span[1], combo[1].span[1])])
+            if all(exact_phrase):
+                phrase_mentions.append({"chunked_phrase": phrase, "exact_phrase": exact_phrase,
+                                        "generic_phrase": generic_phrase, "key": key})
+                continue
+
+        # Otherwise, get a phrase that matches `comment`
+        exact_phrase = list(PreProcess.find_needle(" ".join(phrase), comment.lower(),
+                                                   engine=needle_engine).values())[0]
+
+        # Get the verb that matches `exact_phrase`
+        if exact_phrase is not None:
+            exact_verb = list(PreProcess.find_needle(arg1, exact_phrase, engine=needle_engine).values())[0]
+
+            # If `exact_verb` exists, then remove it out from `exact_phrase`, trim any white space,
+            # and append all the information to `phrase_mentions`
+            if exact_verb is not None:
+                exact_phrase = (exact_verb, re.sub(exact_verb, "", exact_phrase).strip())
+                phrase_mentions.append({"chunked_phrase": phrase, "exact_phrase": exact_phrase,
+                                        "generic_phrase": generic_phrase, "key": key})
+
+    return phrase_mentions
+
+
+# Define the `ChunkParser` class instance, the label pairs, and the needle engine, of each `extract_phrase_mentions`
+# worker process
+_WORKER_PARSER: Optional[ChunkParser] = None
+_WORKER_LABEL_PAIRS: FrozenSet[Tuple[str, str]] = PHRASE_MENTION_LABEL_PAIRS
+_WORKER_NEEDLE_ENGINE: str = "difflib"
+
+
+def _init_phrase_mentions_worker(parser: ChunkParser, label_pairs: FrozenSet[Tuple[str, str]],
+                                 needle_engine: str = "difflib") -> None:
+    """Set the `ChunkParser` class instance once per `extract_phrase_mentions` worker process.
+
+    :param parser: A `ChunkParser` class instance.
+    :param label_pairs: A frozenset of two-element tuples of the grammar chunk labels of each combination type
+        extracted as a phrase mention.
+    :param needle_engine: Default: 'difflib'. The engine used to fuzzy match exact phrases.
+    :return: None.
+
+    """
+    global _WORKER_PARSER, _WORKER_LABEL_PAIRS, _WORKER_NEEDLE_ENGINE
+    _WORKER_PARSER = parser
+    _WORKER_LABEL_PAIRS = label_pairs
+    _WORKER_NEEDLE_ENGINE = needle_engine
 
-    # Iterate through the comments and the POS tagged text
-    for comment, vals in tqdm(df[["Q3_edit", "pos_tag"]].values):
 
-        # Extract phrase mentions, and combine similar phrases together
-        sents = parser.extract_phrase(vals, merge_inplace=True)
+def _extract_shard_phrase_mentions(rows: np.ndarray) -> List[List[Dict[str, Any]]]:
+    """Extract phrase mentions from a shard of comments in an `extract_phrase_mentions` worker process.
 
-        # Add additional storing elements to `phrase_mentions`
-        phrase_mentions.append([])
+    :param rows: A NumPy array of (comment, POS tags, tagged text) rows.
+    :return: A list of applicable phrase mentions for each row of `rows`.
 
-        # Examine sequential pairwise combinations of `sents`
-        for combo in PreProcess.compute_combinations(sents, 2):
+    """
+    return [_extract_comment_phrase_mentions(_WORKER_PARSER, comment, vals, tagged_text, _WORKER_LABEL_PAIRS,
+                                             _WORKER_NEEDLE_ENGINE)
+            for comment, vals, tagged_text in rows]
 
-            # Extract label and text for each pairwise combination
-            key = (combo[0].label, combo[1].label)
-            arg1 = combo[0].text.lower()
-            arg2 = combo[1].text.lower()
 
-            # If the labels for each combination match any of these, get the phrase mention
-            if key in [("verb", "noun"), ("verb", "prep_noun"), ("verb", "noun_verb"), ("noun", "prep_noun"),
-                       ("prep_noun", "noun"), ("prep_noun", "prep_noun")]:
+def _to_arrow(column: str, values: pd.Series) -> List[Any]:
+    """Convert the values of a nested column into Python objects matching its Arrow type in the checkpoint.
 
-                # Define a generic phrase for the text in the combination using regular expressions
-                generic_phrase = (regex_group_verbs(arg1), regex_for_theme(arg2))
+    :param column: A column name in `CHECKPOINT_ARROW_TYPES`.
+    :param values: The values of `column`.
+    :return: A list of values for `column`, where tuples are converted to dictionaries for Arrow structs.
 
-                # Remove certain characters from `arg1`, and `arg2` using regular expressions, and combine together
-                # in a tuple
-                arg1, arg2 = [re.sub(r"[?()\[\]+*]", "", a) for a in (arg1, arg2)]
-                phrase = (arg1, arg2)
+    """
+    if column == "pos_tag":
+        return [[[dict(zip(["text", "tag", "lemma", "idx"], token)) for token in sent] for sent in x] for x in values]
+    return values.to_list()
 
-                # Get a phrase that matches `comment`
-                exact_phrase = list(PreProcess.find_needle(" ".join(phrase), comment.lower()).values())[0]
 
-                # Get the verb that matches `exact_phrase`
-                if exact_phrase is not None:
-                    exact_verb = list(PreProcess.find_needle(arg1, exact_phrase).values())[0]
+def _from_arrow(column: str, values: List[Any]) -> List[Any]:
+    """Convert the values of a nested column read from the checkpoint back into the objects created by the pipeline.
 
-                    # If `exact_verb` exists, then remove it out from `exact_phrase`, trim any white space,
-                    # and append all the information to `phrase_mentions`
-                    if exact_verb is not None:
-                        exact_phrase = (exact_verb, re.sub(exact_verb, "", exact_phrase).strip())
-                        phrase_mentions[-1].append({"chunked_phrase": phrase, "exact_phrase": exact_phrase,
-                                                    "generic_phrase": generic_phrase, "key": key})
+    :param column: A column name in `CHECKPOINT_ARROW_TYPES`.
+    :param values: The values of `column`, as returned by `pyarrow.ChunkedArray.to_pylist`.
+    :return: A list of values for `column`, where Arrow structs and lists are converted back to tuples, as required,
+        and part-of-speech tags are interned.
 
-    # Return `df` with a new column for `phrase_mentions`
-    return df.assign(themed_phrase_mentions=phrase_mentions)
+    """
+    if column == "pos_tag":
+        return [[[(t["text"], sys.intern(t["tag"]), t["lemma"]) if t.get("idx") is None else
+                  (t["text"], sys.intern(t["tag"]), t["lemma"], t["idx"]) for t in sent] for sent in x] for x in values]
+    if column == "themed_phrase_mentions":
+        return [[{k: tuple(v) for k, v in item.items()} for item in x] for x in values]
+    return values
 
 
 def save_intermediate_df(df: pd.DataFrame, cache_pos_filename: str) -> None:
     """Save intermediate data processing once lemmas and words have been extracted from parts-of-speech tagging.
 
+    The intermediate data is saved as a Parquet checkpoint, where the nested `pos_tag`, `lemmas`, `words`, and
+    `themed_phrase_mentions` columns are stored as native Arrow list and struct types. See `load_intermediate_df` to
+    read the checkpoint.
+
     :param df: A partially processed pandas DataFrame for caching.
     :param cache_pos_filename: A file path for the cached `df`.
     :return: None. Saves a cached version of `df` in the location specified by `cache_pos_filename`.
@@ -171,8 +449,78 @@ def save_intermediate_df(df: pd.DataFrame, cache_pos_filename: str) -> None:
         words=df["pos_tag"].progress_map(lambda x: [token[0] for sent in x for token in sent])
     )
 
-    # Save the intermediate pandas DataFrame
-    out_df.to_csv(cache_pos_filename, index=False)
+    # Convert `out_df` to an Arrow table; the Arrow types of the flat columns are inferred, whilst the nested columns
+    # use their explicit Arrow types
+    flat_table = pa.Table.from_pandas(out_df.drop(columns=[*CHECKPOINT_ARROW_TYPES], errors="ignore"),
+                                      preserve_index=False)
+    table = pa.Table.from_arrays([
+        pa.array(_to_arrow(c, out_df[c]), type=CHECKPOINT_ARROW_TYPES[c]) if c in CHECKPOINT_ARROW_TYPES else
+        flat_table.column(c) for c in out_df.columns
+    ], names=[*out_df.columns])
+
+    # Save the intermediate checkpoint
+    pq.write_table(table, str(cache_pos_filename))
+
+
+def load_intermediate_df(cache_pos_filename: str) -> pd.DataFrame:
+    """Load the intermediate data saved by `save_intermediate_df`.
+
+    :param cache_pos_filename: A file path to the cached Parquet checkpoint.
+    :return: A pandas DataFrame of the cached data, where the nested columns are restored to the same Python objects
+        as `save_intermediate_df` received, e.g. POS tags are lists of (text, tag, lemma) tuples.
+
+    """
+    logger.info(f"Loading preprocessed survey data from: {cache_pos_filename}...")
+
+    # Read the checkpoint, and convert the flat columns to a pandas DataFrame
+    table = pq.read_table(str(cache_pos_filename))
+    nested_columns = [c for c in table.column_names if c in CHECKPOINT_ARROW_TYPES]
+    out_df = table.drop(nested_columns).to_pandas()
+
+    # Add the nested columns back in their original order, and return the pandas DataFrame
+    for column in nested_columns:
+        out_df[column] = _from_arrow(column, table.column(column).to_pylist())
+    return out_df[table.column_names]
+
+
+def is_valid_checkpoint(cache_pos_filename: str, survey_filename: str) -> bool:
+    """Check whether an intermediate checkpoint can be used to resume processing a survey file.
+
+    A valid checkpoint exists, is a readable Parquet file containing all the columns of the survey file and
+    `CHECKPOINT_RESUME_COLUMNS`, and was last modified after the survey file. The directory of Parquet checkpoints of
+    each chunk, saved if the survey file is processed in chunks, is never valid, as it cannot show whether every chunk
+    was processed.
+
+    :param cache_pos_filename: A file path to the cached Parquet checkpoint.
+    :param survey_filename: A file path where the survey data is located.
+    :return: True if the checkpoint is valid, otherwise False.
+
+    """
+
+    # Check the checkpoint exists, is not a directory of checkpoints of each chunk, and is newer than the survey file
+    if os.path.isdir(cache_pos_filename):
+        logger.warning(f"Checkpoint is a directory of chunk checkpoints, which cannot be resumed: {cache_pos_filename}")
+        return False
+    if not os.path.isfile(cache_pos_filename):
+        logger.info(f"No checkpoint found at: {cache_pos_filename}")
+        return False
+    if os.path.getmtime(cache_pos_filename) < os.path.getmtime(survey_filename):
+        logger.info(f"Checkpoint is older than the survey file: {cache_pos_filename}")
+        return False
+
+    # Check the checkpoint can be read, and has all the required columns
+    try:
+        checkpoint_columns = pq.read_schema(str(cache_pos_filename)).names
+    except (OSError, pa.ArrowInvalid):
+        logger.warning(f"Checkpoint cannot be read: {cache_pos_filename}")
+        return False
+    missing_columns = {*pd.read_csv(survey_filename, nrows=0).columns, *CHECKPOINT_RESUME_COLUMNS} \
+        .difference(checkpoint_columns)
+    if missing_columns:
+        logger.info(f"Checkpoint is missing columns {sorted(missing_columns)}: {cache_pos_filename}")
+        return False
+
+    return True
 
 
 def create_phrase_level_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -186,21 +534,28 @@ def create_phrase_level_columns(df: pd.DataFrame) -> pd.DataFrame:
 
     # Compile the extract phrases column - only uses phrase mentions where the first item is a verb
     logger.info("Assigning exact_phrases column...")
-    out_df = df.assign(exact_phrases=df["themed_phrase_mentions"].progress_map(
+    exact_phrases = df["themed_phrase_mentions"].progress_map(
         lambda x: "\n".join([", ".join(item["exact_phrase"]) for item in x if item["key"][0] == "verb"])
-    ))
+    )
 
     # Compile the generic phrases column - only uses phrase mentions where the first item is a verb
     logger.info("Assigning generic_phrases column...")
-    out_df = out_df.assign(generic_phrases=out_df["themed_phrase_mentions"].progress_map(
+    generic_phrases = df["themed_phrase_mentions"].progress_map(
         lambda x: "\n".join([", ".join(item["generic_phrase"]) for item in x if item["key"][0] == "verb"])
-    ))
+    )
 
-    # Return the amended pandas DataFrame
-    return out_df
+    # Return the amended pandas DataFrame, copying `df` once for both columns
+    return df.assign(exact_phrases=exact_phrases, generic_phrases=generic_phrases)
 
 
-def create_dataset(survey_filename: str, grammar_filename: str, cache_pos_filename: str, output_filename: str) -> None:
+def create_dataset(survey_filename: str, grammar_filename: str, cache_pos_filename: str, output_filename: str,
+                   batch_size: int = 1000, n_process: int = 1, spacy_profile: str = SPACY_DEFAULT_PROFILE,
+                   pos_cache_filename: Optional[str] = None, resume_from_cache: bool = False,
+                   chunksize: Optional[int] = None, n_jobs: int = 1, char_offsets: bool = False,
+                   chunk_engine: str = "nltk", parser_cache_filename: Optional[str] = None,
+                   report_filename: Optional[str] = None, top_allocators: int = 0,
+                   profiler: Optional[StageProfiler] = None, manifest_filename: Optional[str] = None,
+                   needle_engine: str = "difflib") -> None:
     """Process the survey data, and generate outputs.
 
     :param survey_filename: A file path where the survey data is located.
@@ -208,58 +563,389 @@ def create_dataset(survey_filename: str, grammar_filename: str, cache_pos_filena
         src.make_feedback_tool_data.text_chunking.ChunkParser for further details
     :param cache_pos_filename: A file path where partially-processed data will be cached for review.
     :param output_filename: A file path where the processed data will be cached.
-    :return: None in Python. Will create two CSV files in the file paths defined by `cache_pos_filename` and
-        `output_filename`; the first CSV is the partially-processed data, whilst the second is the final output.
+    :param batch_size: Default: 1000. The number of sentences per batch for part-of-speech tagging. See
+        `PreProcess.part_of_speech_tag_batch` for further details.
+    :param n_process: Default: 1. The number of processes used for part-of-speech tagging. If -1, uses all available
+        CPU cores.
+    :param spacy_profile: Default: 'pos'. The spaCy pipeline profile used for part-of-speech tagging. See
+        `src.make_feedback_tool_data.preprocess.load_spacy_model` for further details.
+    :param pos_cache_filename: Default: None. A file path to a persistent part-of-speech tag cache. If given, only
+        comments not already in the cache are tagged. See `src.make_feedback_tool_data.PosTagCache` for further
+        details. If None, all comments are tagged.
+    :param resume_from_cache: Default: False. If True, and `cache_pos_filename` is a valid checkpoint for
+        `survey_filename`, skip de-duplication, PII removal, language detection, and part-of-speech tagging, and resume
+        processing from the checkpoint instead. See `is_valid_checkpoint` for further details. Cannot be used with
+        `chunksize`, or `manifest_filename`.
+    :param chunksize: Default: None. If given, stream the survey data in chunks of `chunksize` rows, so that memory
+        use is bounded by the chunk size rather than the size of the survey file. Each chunk is pushed through every
+        step, and appended to `output_filename`; `cache_pos_filename` is then a directory of Parquet checkpoints, one
+        per chunk. Duplicate rows along the `primary_key` column are still dropped exactly across chunks. If None,
+        the whole survey file is processed at once.
+    :param n_jobs: Default: 1. The number of processes used to extract phrase mentions. If -1, uses all available CPU
+        cores. See `extract_phrase_mentions` for further details.
+    :param char_offsets: Default: False. If True, the part-of-speech tags include the character offset of each
+        token, so exact phrases are sliced directly from the comments, rather than found by fuzzy matching. See
+        `extract_phrase_mentions` for further details.
+    :param chunk_engine: Default: 'nltk'. The chunking engine used to extract phrase mentions, either 'nltk', or
+        'compiled'. See `src.make_feedback_tool_data.text_chunking.ChunkParser` for further details.
+    :param parser_cache_filename: Default: None. A file path to a persistent chunk parser cache. If given, the chunk
+        parser is loaded from this file, if it was saved for the same grammar, and `chunk_engine`, or otherwise saved
+        to it. See `src.make_feedback_tool_data.text_chunking.ChunkParser.from_cache` for further details.
+    :param report_filename: Default: None. A file path for the JSON run report, which records the wall time, CPU time,
+        rows in and out, rows per second, and peak resident set size increase of each stage. If None, the run report
+        is saved next to `output_filename`, with its name ending '_run_report.json' instead of '.csv'. See
+        `src.make_feedback_tool_data.run_metrics.RunMetrics` for further details.
+    :param top_allocators: Default: 0. If greater than 0, trace memory allocations during each stage, and record this
+        number of source lines with the largest memory allocations of each stage in the run report. This slows down
+        each stage considerably.
+    :param profiler: Default: None. If given, a `StageProfiler` class instance used to profile each stage separately.
+        See `src.make_feedback_tool_data.stage_profiler.StageProfiler` for further details.
+    :param manifest_filename: Default: None. If given, run incrementally: a file path to a persistent store of the
+        primary keys processed by previous runs, i.e. a manifest. Only rows whose primary key is not in the manifest
+        are processed, `output_filename` is a directory, and the final output of the run is written to a new
+        partition in it, named 'part-<timestamp>.csv'. The partition is only given this name, and its primary keys
+        added to the manifest, once it is complete, so a failed run is processed again by the next run. No partition
+        is written if there are no new rows. Cannot be used with `resume_from_cache`.
+    :param needle_engine: Default: 'difflib'. The engine used to fuzzy match exact phrases in the comments, either
+        'difflib', or 'rapidfuzz', which is faster. See `PreProcess.find_needle` for further details.
+    :return: None in Python. Will create a Parquet checkpoint and a CSV file in the file paths defined by
+        `cache_pos_filename` and `output_filename` respectively; the first is the partially-processed data, whilst the
+        second is the final output. Will also create a JSON run report of per-stage metrics.
 
     """
 
-    # Read in the survey data
-    logger.info(f"Reading survey file: {survey_filename}")
-    df = pd.read_csv(survey_filename)
+    # Resuming from a checkpoint is only possible if the whole survey file is processed at once, and not incrementally
+    if resume_from_cache and (chunksize is not None or manifest_filename):
+        raise ValueError("`resume_from_cache` cannot be used with `chunksize`, or `manifest_filename`")
+
+    # If running incrementally, write the final output to a temporary file in the `output_filename` directory, which
+    # is renamed to a new partition once complete
+    partition_filename = None
+    if manifest_filename:
+        os.makedirs(output_filename, exist_ok=True)
+        partition_filename = os.path.join(output_filename, f"part-{datetime.now():%Y%m%dT%H%M%S%f}.csv")
+        output_filename = f"{partition_filename}.inprogress"
+    report_filename = report_filename or \
+        f"{os.path.splitext(partition_filename or output_filename)[0]}_run_report.json"
+
+    # Initialise the per-stage metrics of the run, which are saved to a JSON run report at the end of the run, even
+    # if it fails
+    metrics = RunMetrics(top_allocators, profiler)
+    try:
+
+        # Initialise the chunk parser once for all the survey data; if `parser_cache_filename` is given, load it from,
+        # or save it to, the cache file
+        with metrics.stage("initialise_chunk_parser"):
+            parser = ChunkParser.from_cache(parser_cache_filename, grammar_filename, chunk_engine) \
+                if parser_cache_filename else ChunkParser(grammar_filename, chunk_engine)
+
+        # If requested, and a valid checkpoint exists, resume from the checkpoint; the survey data columns are only
+        # read from the header of the survey file
+        if resume_from_cache and is_valid_checkpoint(cache_pos_filename, survey_filename):
+            logger.info(f"Resuming from checkpoint: {cache_pos_filename}")
+            survey_columns = pd.read_csv(survey_filename, nrows=0).columns
+            with metrics.stage("load_intermediate_df") as stage:
+                survey_data_df = load_intermediate_df(cache_pos_filename)[[*survey_columns, *CHECKPOINT_RESUME_COLUMNS]]
+                stage.rows_out = len(survey_data_df)
+            with metrics.stage("extract_phrase_mentions", len(survey_data_df)) as stage:
+                survey_data_df = extract_phrase_mentions(survey_data_df, grammar_filename, n_jobs=n_jobs,
+                                                         parser=parser, needle_engine=needle_engine)
+                stage.rows_out = len(survey_data_df)
+            save_outputs(survey_data_df, survey_columns, cache_pos_filename, output_filename, metrics=metrics)
+            return
+
+        # Open the part-of-speech (POS) tag cache, and the manifest of primary keys processed by previous runs, if
+        # required, once for all the survey data
+        with PosTagCache(pos_cache_filename, spacy_profile, char_offsets) if pos_cache_filename else nullcontext() \
+                as pos_tag_cache, PrimaryKeyStore(manifest_filename) if manifest_filename else nullcontext() \
+                as processed_keys:
+
+            # Replace any previous checkpoint that cannot be overwritten by the checkpoint of this run
+            _clear_checkpoint(cache_pos_filename, chunked=chunksize is not None)
+
+            # If `chunksize` is None, process the whole survey file at once
+            if chunksize is None:
+
+                # Read in the survey data
+                logger.info(f"Reading survey file: {survey_filename}")
+                with metrics.stage("read_csv") as stage:
+                    df = pd.read_csv(survey_filename, dtype=SURVEY_DTYPES)
+                    stage.rows_out = len(df)
+
+                # Drop any duplicate rows along the `primary_key` column of `survey_data_df`, and any rows processed
+                # by previous runs, process the remaining rows, and save the outputs
+                survey_data_df = _drop_rows(df, metrics, processed_keys)
+                new_keys = survey_data_df["primary_key"].tolist()
+                survey_data_df = _process_survey_data(survey_data_df, grammar_filename, batch_size, n_process,
+                                                      spacy_profile, pos_tag_cache, n_jobs, char_offsets, parser,
+                                                      metrics, needle_engine)
+                save_outputs(survey_data_df, df.columns, cache_pos_filename, output_filename, metrics=metrics)
+                _commit_partition(output_filename, partition_filename, processed_keys, new_keys)
+                return
+
+            # Stream the survey data in chunks, using an on-disk store of primary keys seen in previous chunks, so
+            # duplicate rows are dropped exactly across chunks. Append the outputs of each chunk to the output file
+            logger.info(f"Reading survey file in chunks of {chunksize} rows: {survey_filename}")
+            with PrimaryKeyStore() as seen_keys:
+                for i, df in enumerate(metrics.iter_stage("read_csv",
+                                                          pd.read_csv(survey_filename, dtype=SURVEY_DTYPES,
+                                                                      chunksize=chunksize))):
+                    logger.info(f"Processing chunk {i} of survey data...")
+                    survey_data_df = _drop_rows(df, metrics, processed_keys, seen_keys)
+                    survey_data_df = _process_survey_data(survey_data_df, grammar_filename, batch_size, n_process,
+                                                          spacy_profile, pos_tag_cache, n_jobs, char_offsets, parser,
+                                                          metrics, needle_engine)
+                    save_outputs(survey_data_df, df.columns,
+                                 os.path.join(cache_pos_filename, f"part-{i:05d}.parquet"), output_filename,
+                                 append=i > 0, metrics=metrics)
+                _commit_partition(output_filename, partition_filename, processed_keys, seen_keys)
+
+    # Save the run report, by default next to `output_filename`, or the partition if running incrementally; failing to
+    # save the run report is only logged, so that it never replaces an exception raised whilst processing
+    finally:
+        try:
+            metrics.write_report(report_filename, survey_filename=survey_filename,
+                                 output_filename=partition_filename or output_filename, chunksize=chunksize,
+                                 n_jobs=n_jobs, n_process=n_process, chunk_engine=chunk_engine,
+                                 char_offsets=char_offsets, resume_from_cache=resume_from_cache,
+                                 manifest_filename=manifest_filename, needle_engine=needle_engine)
+        except Exception:
+            logger.exception(f"Failed to save the run report at: {report_filename}")
+
+
+def _clear_checkpoint(cache_pos_filename: str, chunked: bool) -> None:
+    """Replace a previous checkpoint with nothing, or an empty directory, so the checkpoint of a new run can be saved.
+
+    A run that processes the whole survey file at once saves its checkpoint to a Parquet file, whereas a run that
+    processes it in chunks saves a Parquet file per chunk to a directory, so a previous checkpoint of the other kind
+    must be removed first.
+
+    :param cache_pos_filename: A file path to the Parquet checkpoint, or the directory of Parquet checkpoints of each
+        chunk.
+    :param chunked: If True, the new run processes the survey file in chunks, and `cache_pos_filename` is replaced by
+        an empty directory. Otherwise, any directory at `cache_pos_filename` is removed.
+    :return: None.
 
-    # Drop any duplicate rows along the `primary_key` column of `survey_data_df`
-    survey_data_df = drop_duplicate_rows(df)
+    """
 
-    # Remove personally identifiable information (PII), and keep only rows with English comments less than
-    # 4,000 characters long
-    survey_data_df = preprocess_filter_comment_text(survey_data_df)
+    # If processing the whole survey file at once, remove any directory of checkpoints of each chunk
+    if not chunked:
+        if os.path.isdir(cache_pos_filename):
+            logger.info(f"Removing previous directory of chunk checkpoints: {cache_pos_filename}")
+            shutil.rmtree(cache_pos_filename)
+        return
+
+    # Otherwise, replace any previous checkpoint with an empty directory for the checkpoint of each chunk
+    if os.path.isfile(cache_pos_filename):
+        os.remove(cache_pos_filename)
+    os.makedirs(cache_pos_filename, exist_ok=True)
+    for f in glob.glob(os.path.join(cache_pos_filename, "part-*.parquet")):
+        os.remove(f)
+
+
+def _drop_rows(df: pd.DataFrame, metrics: RunMetrics, processed_keys: Optional[PrimaryKeyStore] = None,
+               seen_keys: Optional[PrimaryKeyStore] = None) -> pd.DataFrame:
+    """Drop rows processed by previous runs, if required, and then duplicate rows, recording the metrics of each.
+
+    :param df: A pandas DataFrame of survey data.
+    :param metrics: A `RunMetrics` class instance, to which the metrics of each stage are added.
+    :param processed_keys: Default: None. A store of primary keys processed by previous runs. If given, rows whose
+        primary key is in `processed_keys` are dropped. See `drop_processed_rows` for further details.
+    :param seen_keys: Default: None. A store of primary keys seen in previous chunks. See `drop_duplicate_rows` for
+        further details.
+    :return: A pandas DataFrame returned by `drop_duplicate_rows`.
+
+    """
+
+    # If required, drop rows processed by previous runs
+    if processed_keys is not None:
+        with metrics.stage("drop_processed_rows", len(df)) as stage:
+            df = drop_processed_rows(df, processed_keys)
+            stage.rows_out = len(df)
+
+    # Drop duplicate rows along the `primary_key` column, including those seen in previous chunks, if required
+    with metrics.stage("drop_duplicate_rows", len(df)) as stage:
+        df_out = drop_duplicate_rows(df) if seen_keys is None else drop_duplicate_rows(df, seen_keys)
+        stage.rows_out = len(df_out)
+    return df_out
+
+
+def _commit_partition(output_filename: str, partition_filename: Optional[str],
+                      processed_keys: Optional[PrimaryKeyStore], new_keys: Union[PrimaryKeyStore, List]) -> None:
+    """Rename the complete final output of an incremental run to a new partition, and add its keys to the manifest.
+
+    :param output_filename: A file path where the final output of the run was saved.
+    :param partition_filename: A file path for the new partition. If None, the run is not incremental, and nothing is
+        done.
+    :param processed_keys: A store of primary keys processed by previous runs, i.e. a manifest.
+    :param new_keys: The primary keys processed by this run, either as a store, or a list.
+    :return: None in Python.
+
+    """
+    if partition_filename is None:
+        return
+
+    # Rename the final output to the new partition, unless there were no new rows, in which case delete it instead
+    if len(new_keys):
+        os.replace(output_filename, partition_filename)
+        logger.info(f"Saved {len(new_keys)} new rows to partition: {partition_filename}")
+    else:
+        os.remove(output_filename)
+        logger.info("No new rows since the previous run; no partition saved.")
+
+    # Add the primary keys processed by this run to the manifest
+    if isinstance(new_keys, PrimaryKeyStore):
+        processed_keys.update(new_keys)
+    else:
+        processed_keys.add_many(new_keys)
+
+
+def _process_survey_data(df: pd.DataFrame, grammar_filename: str, batch_size: int, n_process: int,
+                         spacy_profile: str, pos_tag_cache: Optional[PosTagCache], n_jobs: int,
+                         char_offsets: bool = False, parser: Optional[ChunkParser] = None,
+                         metrics: Optional[RunMetrics] = None, needle_engine: str = "difflib") -> pd.DataFrame:
+    """Pre-process, part-of-speech tag, and extract phrase mentions from de-duplicated survey data.
+
+    :param df: A pandas DataFrame of survey data returned by `drop_duplicate_rows`.
+    :param grammar_filename: A file path where the regular expressions grammar file is located.
+    :param batch_size: The number of sentences per batch for part-of-speech tagging.
+    :param n_process: The number of processes used for part-of-speech tagging.
+    :param spacy_profile: The spaCy pipeline profile used for part-of-speech tagging.
+    :param pos_tag_cache: A part-of-speech tag cache. If None, all comments are tagged.
+    :param n_jobs: The number of processes used to extract phrase mentions.
+    :param char_offsets: Default: False. If True, the part-of-speech tags include the character offset of each token.
+    :param parser: Default: None. A `ChunkParser` class instance used to extract phrase mentions. If None, one is
+        initialised using `grammar_filename`.
+    :param metrics: Default: None. A `RunMetrics` class instance, to which the metrics of each stage are added. If
+        None, the metrics are not kept.
+    :param needle_engine: Default: 'difflib'. The engine used to fuzzy match exact phrases.
+    :return: A pandas DataFrame returned by `extract_phrase_mentions`.
+
+    """
+    metrics = RunMetrics() if metrics is None else metrics
 
-    # Extract the part-of-speech (POS) tags for the comments
+    # Remove personally identifiable information (PII), and keep only rows with English comments less than
+    # 4,000 characters long. This returns a new pandas DataFrame, so the columns of each later step are added to it in
+    # place, rather than copying it for each step
+    with metrics.stage("preprocess_filter_comment_text", len(df)) as stage:
+        survey_data_df = preprocess_filter_comment_text(df)
+        stage.rows_out = len(survey_data_df)
+
+    # Extract the part-of-speech (POS) tags for the comments in batches; the sentences of all comments are streamed
+    # through spaCy together, so that tagging can be spread across `n_process` processes rather than one comment at a
+    # time. Non-English comments are passed as empty strings, which have no POS tags. If `pos_tag_cache` is given,
+    # previously tagged comments are looked up from the cache instead
     logger.info("Part of speech tagging comments...")
-    survey_data_df = survey_data_df.assign(
-        pos_tag=survey_data_df[["Q3_pii_removed", "is_en"]].progress_apply(
-            lambda x: PreProcess.part_of_speech_tag(x[0]) if x[1] else [],
-            axis=1
-        )
-    )
+    with metrics.stage("part_of_speech_tag", len(survey_data_df)) as stage:
+        pos_tag_texts = survey_data_df["Q3_pii_removed"].where(survey_data_df["is_en"], "")
+
+        # Only tag each distinct text once, and broadcast the POS tags back to all rows with the same text
+        is_distinct, distinct_codes = _deduplicate(pos_tag_texts, "Part-of-speech tagging")
+        pos_tag_texts = pos_tag_texts[is_distinct]
+        if pos_tag_cache:
+            pos_tag = pos_tag_cache.part_of_speech_tag_batch(pos_tag_texts, batch_size=batch_size,
+                                                             n_process=n_process)
+        else:
+            pos_tag = PreProcess.part_of_speech_tag_batch(pos_tag_texts, batch_size=batch_size, n_process=n_process,
+                                                          profile=spacy_profile, char_offsets=char_offsets)
+        survey_data_df["pos_tag"] = _broadcast(pos_tag, distinct_codes)
+        stage.rows_out = len(survey_data_df)
 
     # Replace NaN values, and pre-process the feedback text
     logger.info("Pre-processing feedback text for matching...")
-    survey_data_df = survey_data_df.assign(Q3_edit=survey_data_df["Q3"].replace(np.nan, "", regex=True))
-    survey_data_df = survey_data_df.assign(
-        Q3_edit=survey_data_df["Q3_edit"].progress_map(lambda x: " ".join(re.sub(r"[()\[\]+*]", "", x).split()))
-    )
+    with metrics.stage("pre_process_text", len(survey_data_df)) as stage:
+        survey_data_df["Q3_edit"] = survey_data_df["Q3"].replace(np.nan, "", regex=True) \
+            .progress_map(lambda x: " ".join(re.sub(r"[()\[\]+*]", "", x).split()))
+        stage.rows_out = len(survey_data_df)
+
+    # Extract the phrase mentions, adding them to `survey_data_df` in place
+    with metrics.stage("extract_phrase_mentions", len(survey_data_df)) as stage:
+        survey_data_df = extract_phrase_mentions(survey_data_df, grammar_filename, n_jobs=n_jobs, inplace=True,
+                                                 parser=parser, needle_engine=needle_engine)
+        stage.rows_out = len(survey_data_df)
+    return survey_data_df
+
+
+def _deduplicate(keys: Iterable[Hashable], stage: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the distinct keys, e.g. texts, to process, and log the de-duplication ratio.
+
+    :param keys: An iterable of hashable keys, one per row, where rows with the same key have the same output.
+    :param stage: The name of the processing stage for logging.
+    :return: A two-element tuple. The first element is a boolean NumPy array, which is True for the first row of each
+        distinct key. The second element is a NumPy array of the position of each row's key amongst the distinct keys,
+        in order of their first appearance, such that the outputs for the distinct keys can be broadcast back to all
+        rows using `_broadcast`.
+
+    """
+
+    # Number the distinct keys in order of their first appearance, and flag the first row of each distinct key
+    positions = {}
+    distinct_codes = np.array([positions.setdefault(k, len(positions)) for k in keys], dtype=np.int64)
+    is_distinct = np.zeros(len(distinct_codes), dtype=bool)
+    is_distinct[np.unique(distinct_codes, return_index=True)[1]] = True
+
+    # Log the number of distinct keys, and the fraction of rows that do not need processing
+    logger.info(f"{stage}: {len(positions)} distinct of {len(distinct_codes)} comments; de-duplication ratio "
+                f"{1 - len(positions) / len(distinct_codes) if len(distinct_codes) else 0:.1%}")
+
+    return is_distinct, distinct_codes
 
-    # Extract the phrase mentions
-    survey_data_df = extract_phrase_mentions(survey_data_df, grammar_filename)
 
-    # Save the partially-processed `survey_data_df`
-    save_intermediate_df(survey_data_df, cache_pos_filename)
+def _broadcast(values: List[Any], distinct_codes: np.ndarray) -> List[Any]:
+    """Broadcast the outputs for each distinct key back to all rows.
+
+    :param values: A list of outputs, one for each distinct key, in order of their first appearance.
+    :param distinct_codes: The position of each row's key amongst the distinct keys, as returned by `_deduplicate`.
+    :return: A list of the output for each row.
+
+    """
+    return [values[code] for code in distinct_codes]
+
+
+def save_outputs(df: pd.DataFrame, survey_columns: pd.Index, cache_pos_filename: str, output_filename: str,
+                 append: bool = False, metrics: Optional[RunMetrics] = None) -> None:
+    """Save the intermediate checkpoint, and the final output, once phrase mentions have been extracted.
+
+    :param df: A pandas DataFrame returned by `extract_phrase_mentions`.
+    :param survey_columns: The columns of the original survey data.
+    :param cache_pos_filename: A file path where partially-processed data will be cached for review.
+    :param output_filename: A file path where the processed data will be cached.
+    :param append: Default: False. If True, append the final output to `output_filename` without a header, rather
+        than overwriting it.
+    :param metrics: Default: None. A `RunMetrics` class instance, to which the metrics of each stage are added. If
+        None, the metrics are not kept.
+    :return: None in Python.
+
+    """
+    metrics = RunMetrics() if metrics is None else metrics
+
+    # Save the partially-processed `df`
+    with metrics.stage("save_intermediate_df", len(df)) as stage:
+        save_intermediate_df(df, cache_pos_filename)
+        stage.rows_out = len(df)
 
     # Create phrase-level columns
-    survey_data_df = create_phrase_level_columns(survey_data_df)
+    with metrics.stage("create_phrase_level_columns", len(df)) as stage:
+        survey_data_df = create_phrase_level_columns(df)
+        stage.rows_out = len(survey_data_df)
 
-    # Overwrite the `Q3` column with `Q3_edit`
-    survey_data_df = survey_data_df.assign(Q3=survey_data_df["Q3_edit"])
+    # Define the columns to keep - all the original survey columns, but also the `exact_phrases`, and
+    # `generic_phrases` columns
+    columns_to_keep = [*survey_columns, "exact_phrases", "generic_phrases"]
 
-    # Define the columns to keep - all the original columns in `df`, but also the `exact_phrases`,
-    # and `generic_phrases` columns
-    columns_to_keep = [*df.columns, "exact_phrases", "generic_phrases"]
+    # Keep only the columns defined in `columns_to_keep`, and overwrite the `Q3` column with `Q3_edit`; only these
+    # columns are copied
+    survey_data_df = survey_data_df[columns_to_keep].assign(Q3=survey_data_df["Q3_edit"])
 
-    # Output the file to a CSV; only output the same columns as defined in `columns_to_keep`
+    # Output the file to a CSV
     logger.info(f"Saving survey data at: {output_filename}...")
-    logger.debug(f"Keeping columns: {df.columns}...")
-    survey_data_df[columns_to_keep].to_csv(output_filename, index=False)
+    logger.debug(f"Keeping columns: {survey_columns}...")
+    with metrics.stage("write_csv", len(survey_data_df)) as stage:
+        if append:
+            survey_data_df.to_csv(output_filename, mode="a", header=False, index=False)
+        else:
+            survey_data_df.to_csv(output_filename, index=False)
+        stage.rows_out = len(survey_data_df)
 
 
 if __name__ == "__main__":
@@ -271,13 +957,69 @@ if __name__ == "__main__":
     parser.add_argument('--filename', "-f", default="",
                         help="Survey data filename. If empty or doesn't exist, use most recently created survey file "
                              "in /data.")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="Number of sentences per batch for part-of-speech tagging.")
+    parser.add_argument("--n-process", type=int, default=1,
+                        help="Number of processes for part-of-speech tagging. If -1, use all available CPU cores.")
+    parser.add_argument("--n-jobs", type=int, default=1,
+                        help="Number of processes for phrase extraction. If -1, use all available CPU cores.")
+    parser.add_argument("--spacy-profile", choices=list(SPACY_PROFILES), default=SPACY_DEFAULT_PROFILE,
+                        help="spaCy pipeline profile for part-of-speech tagging; 'pos' only loads the components "
+                             "needed for tagging.")
+    parser.add_argument("--pos-cache", default=os.path.join(DATA_DIR, "pos_tag_cache.sqlite"),
+                        help="Part-of-speech tag cache file; only comments not in this cache are tagged. Defaults to "
+                             "/data/pos_tag_cache.sqlite.")
+    parser.add_argument("--no-pos-cache", action="store_true",
+                        help="Tag all comments without reading or updating the part-of-speech tag cache.")
+    parser.add_argument("--char-offsets", action="store_true",
+                        help="Record the character offset of each token when part-of-speech tagging, and slice exact "
+                             "phrases directly from the comments, rather than finding them by fuzzy matching.")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the survey file in chunks of this many rows to bound memory use. If not given, "
+                             "process the whole survey file at once.")
+    parser.add_argument("--chunk-engine", choices=list(CHUNK_ENGINES), default="nltk",
+                        help="Chunking engine for phrase extraction; 'compiled' gives the same phrases as 'nltk', but "
+                             "compiles the grammar once for faster chunking.")
+    parser.add_argument("--needle-engine", choices=list(FIND_NEEDLE_ENGINES), default="difflib",
+                        help="Fuzzy matching engine used to find exact phrases in the comments; 'rapidfuzz' is "
+                             "faster than 'difflib'.")
+    parser.add_argument("--parser-cache", default=None,
+                        help="Chunk parser cache file; if given, the chunk parser is loaded from this file, or saved "
+                             "to it, so repeated runs reuse it.")
+    parser.add_argument("--run-report", default=None,
+                        help="JSON run report file of per-stage metrics. Defaults to the output file name, ending "
+                             "'_run_report.json'.")
+    parser.add_argument("--top-allocators", type=int, default=0,
+                        help="If greater than 0, record this number of source lines with the largest memory "
+                             "allocations of each stage in the run report; this slows down each stage considerably.")
+    parser.add_argument("--profile", choices=PROFILERS, default=None,
+                        help="Profile each stage separately, and log the hot functions of each stage; 'cprofile' "
+                             "traces every function call, whilst 'sampling' samples the call stack with less overhead. "
+                             "Only the main process is profiled.")
+    parser.add_argument("--profile-out", default=None,
+                        help="Directory for the profiles; 'cprofile' saves a pstats file per stage, whilst 'sampling' "
+                             "saves a speedscope file. Defaults to the output file name, ending '_profile'.")
+    parser.add_argument("--profile-top", type=int, default=20,
+                        help="Number of functions with the most self time to log for each profiled stage.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process rows whose primary key was not processed by a previous incremental run, "
+                             "and save them to a new partition in /data/exact_generic_phrases.")
+    parser.add_argument("--manifest", default=os.path.join(DATA_DIR, "processed_primary_keys_manifest.sqlite"),
+                        help="Manifest file of the primary keys processed by previous incremental runs. Defaults to "
+                             "/data/processed_primary_keys_manifest.sqlite.")
+    parser.add_argument("--resume-from-cache", action="store_true",
+                        help="If a valid intermediate checkpoint exists for the survey file, skip de-duplication, PII "
+                             "removal, language detection and part-of-speech tagging, and resume from it. Cannot be "
+                             "used with --chunksize, or --incremental.")
 
     args = parser.parse_args()
+    if args.resume_from_cache and (args.chunksize is not None or args.incremental):
+        parser.error("--resume-from-cache cannot be used with --chunksize, or --incremental")
 
     if args.filename == "":
         files = os.listdir(DATA_DIR)
-        paths = [os.path.join(DATA_DIR, basename) for basename in files if all([exclude not in basename for
-                                                                                exclude in ["cache", "exact"]])]
+        paths = [os.path.join(DATA_DIR, basename) for basename in files
+                 if all([exclude not in basename for exclude in ["cache", "exact", "manifest"]])]
         survey_data_filename = max(paths, key=os.path.getctime)
         logger.debug("No filename specified, using most recently added...")
     else:
@@ -286,10 +1028,30 @@ if __name__ == "__main__":
     if os.path.isfile(survey_data_filename):
         # Define paths to various files
         chunk_grammar_filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar.txt")
-        cache_pos_data_filename = survey_data_filename.replace(".csv", "_cache.csv")
-        output_data_filename = survey_data_filename.replace(".csv", "_exact_generic_phrases.csv")
-
-        # Execute the `create_dataset` function
-        create_dataset(survey_data_filename, chunk_grammar_filename, cache_pos_data_filename, output_data_filename)
+        cache_pos_data_filename = survey_data_filename.replace(".csv", "_cache.parquet")
+        output_data_filename = os.path.join(DATA_DIR, "exact_generic_phrases") if args.incremental \
+            else survey_data_filename.replace(".csv", "_exact_generic_phrases.csv")
+
+        # Execute the `create_dataset` function, profiling each stage if required
+        stage_profiler = StageProfiler(args.profile) if args.profile else None
+        try:
+            create_dataset(survey_data_filename, chunk_grammar_filename, cache_pos_data_filename, output_data_filename,
+                           batch_size=args.batch_size, n_process=args.n_process, spacy_profile=args.spacy_profile,
+                           pos_cache_filename=None if args.no_pos_cache else args.pos_cache,
+                           resume_from_cache=args.resume_from_cache, chunksize=args.chunksize,
+                           n_jobs=args.n_jobs, char_offsets=args.char_offsets, chunk_engine=args.chunk_engine,
+                           parser_cache_filename=args.parser_cache, report_filename=args.run_report,
+                           top_allocators=args.top_allocators, profiler=stage_profiler,
+                           manifest_filename=args.manifest if args.incremental else None,
+                           needle_engine=args.needle_engine)
+
+        # Save the profiles, even if `create_dataset` fails, and log the hot functions of each stage
+        finally:
+            if stage_profiler:
+                profile_dir = args.profile_out or f"{os.path.splitext(output_data_filename)[0]}_profile"
+                for f in stage_profiler.write(profile_dir):
+                    logger.info(f"Saved profile at: {f}")
+                logger.info(f"Top {args.profile_top} functions by self time in each stage:\n"
+                            f"{stage_profiler.format_top_functions(args.profile_top)}")
     else:
         logger.error(f"Specified filename does not exist: {survey_data_filename}")
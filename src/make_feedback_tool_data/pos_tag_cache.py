@@ -0,0 +1,157 @@
+from src.make_feedback_tool_data.preprocess import PreProcess, SPACY_DEFAULT_PROFILE, SPACY_MODEL
+from typing import Dict, Iterable, List, Tuple, Union
+import hashlib
+import importlib.metadata
+import json
+import logging
+import sqlite3
+import sys
+
+# Define the maximum number of keys per SQLite query; SQLite limits the number of host parameters per statement
+SQLITE_MAX_VARIABLES = 900
+
+
+def package_version(package: str) -> str:
+    """Get the installed version of a package from its metadata, without importing it.
+
+    :param package: The name of the package, e.g. 'spacy', or a spaCy model package, such as 'en_core_web_sm'.
+    :return: The installed version of `package`, or an empty string if it is not installed.
+
+    """
+    try:
+        return importlib.metadata.version(package)
+    except importlib.metadata.PackageNotFoundError:
+        return ""
+
+
+class PosTagCache:
+
+    def __init__(self, cache_filename: str, profile: str = SPACY_DEFAULT_PROFILE, char_offsets: bool = False) -> None:
+        """Persistent, content-addressed on-disk cache of part-of-speech (POS) tags, backed by SQLite.
+
+        Each entry is keyed by a SHA-256 hash of the PII-removed text, alongside the spaCy model name, model version,
+        spaCy version, and pipeline profile used to tag it, and whether the tags include character offsets. Upgrading
+        the model or spaCy, or changing the profile, therefore never returns stale tags.
+
+        :param cache_filename: A file path to the SQLite database; this is created if it does not exist.
+        :param profile: Default: 'pos'. The spaCy pipeline profile used for tagging. See
+            `src.make_feedback_tool_data.preprocess.load_spacy_model` for further details.
+        :param char_offsets: Default: False. If True, POS tags include the character offset of each token. See
+            `PreProcess.part_of_speech_tag` for further details.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache_filename = cache_filename
+        self.profile = profile
+        self.char_offsets = char_offsets
+        self._model_signature = None
+
+        # Connect to the SQLite database, and create the cache table if it does not exist
+        self.logger.info(f"Using part-of-speech tag cache: {cache_filename}")
+        self.connection = sqlite3.connect(cache_filename)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS pos_tags (key TEXT PRIMARY KEY, pos_tag TEXT NOT NULL)")
+        self.connection.commit()
+
+    def __enter__(self) -> "PosTagCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the connection to the SQLite database."""
+        self.connection.close()
+
+    @property
+    def model_signature(self) -> str:
+        """Get the spaCy model name, version, pipeline profile, and character offsets flag used to key cache entries.
+
+        The versions of the spaCy model and spaCy are read from the installed package metadata, so a fully cached
+        batch never loads the spaCy model.
+
+        :return: A string of the model name and version, spaCy version, and profile, suffixed by ':offsets' if
+            `char_offsets` is True.
+
+        """
+        if self._model_signature is None:
+            self._model_signature = f"{SPACY_MODEL}=={package_version(SPACY_MODEL)}:" \
+                f"spacy=={package_version('spacy')}:{self.profile}{':offsets' if self.char_offsets else ''}"
+        return self._model_signature
+
+    def hash_text(self, text: str) -> str:
+        """Create the cache key for a text string.
+
+        :param text: A PII-removed text string.
+        :return: A hexadecimal SHA-256 hash of `text`, and the model signature.
+
+        """
+        return hashlib.sha256(f"{self.model_signature}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[List[Tuple[Union[str, int], ...]]]]:
+        """Look up the cached POS tags for multiple keys.
+
+        :param keys: An iterable of cache keys, as created by `PosTagCache.hash_text`.
+        :return: A dictionary of the keys found in the cache, and their POS tags. Keys not in the cache are omitted.
+
+        """
+
+        # Initialise a storage variable, and de-duplicate `keys`
+        found = {}
+        keys = list(dict.fromkeys(keys))
+
+        # Query the cache in batches of at most `SQLITE_MAX_VARIABLES` keys, and convert the JSON-decoded lists back
+        # into the nested list of tuples, with interned POS tags, returned by `PreProcess.part_of_speech_tag`
+        for i in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            batch = keys[i:i + SQLITE_MAX_VARIABLES]
+            query = f"SELECT key, pos_tag FROM pos_tags WHERE key IN ({', '.join('?' * len(batch))})"
+            for key, pos_tag in self.connection.execute(query, batch):
+                found[key] = [[(t[0], sys.intern(t[1]), *t[2:]) for t in sentence] for sentence in json.loads(pos_tag)]
+
+        return found
+
+    def set_many(self, items: Dict[str, List[List[Tuple[Union[str, int], ...]]]]) -> None:
+        """Store the POS tags for multiple keys in the cache.
+
+        :param items: A dictionary where the keys are cache keys, as created by `PosTagCache.hash_text`, and the values
+            are POS tags, as returned by `PreProcess.part_of_speech_tag`.
+        :return: None.
+
+        """
+        self.connection.executemany("INSERT OR REPLACE INTO pos_tags (key, pos_tag) VALUES (?, ?)",
+                                    ((k, json.dumps(v)) for k, v in items.items()))
+        self.connection.commit()
+
+    def part_of_speech_tag_batch(self, texts: Iterable[str], batch_size: int = 1000, n_process: int = 1) \
+            -> List[List[List[Tuple[Union[str, int], ...]]]]:
+        """Perform part-of-speech (POS) tagging on multiple text strings, only tagging texts not already cached.
+
+        A drop-in replacement for `PreProcess.part_of_speech_tag_batch`; newly tagged texts are added to the cache.
+
+        :param texts: An iterable of text strings for POS tagging.
+        :param batch_size: Default: 1000. The number of sentences to buffer in each batch passed to spaCy.
+        :param n_process: Default: 1. The number of processes spaCy uses to tag the sentences. If -1, uses all
+            available CPU cores.
+        :return: A list, where each element is the output of `PreProcess.part_of_speech_tag` for the corresponding
+            text string in `texts`.
+
+        """
+
+        # Hash each text, and look up any previously tagged texts
+        texts = list(texts)
+        keys = [self.hash_text(text) for text in texts]
+        cached = self.get_many(keys)
+
+        # Tag the distinct texts not in the cache, and add them to the cache
+        missing = {k: t for k, t in zip(keys, texts) if k not in cached}
+        self.logger.info(f"Part-of-speech tag cache hits: {len(texts) - sum(k in missing for k in keys)} of "
+                         f"{len(texts)} texts; tagging {len(missing)} distinct new texts...")
+        if missing:
+            tagged = dict(zip(missing.keys(), PreProcess.part_of_speech_tag_batch(
+                missing.values(), batch_size=batch_size, n_process=n_process, profile=self.profile,
+                char_offsets=self.char_offsets
+            )))
+            self.set_many(tagged)
+            cached.update(tagged)
+
+        # Return the POS tags in the same order as `texts`
+        return [cached[k] for k in keys]
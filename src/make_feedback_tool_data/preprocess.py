@@ -1,8 +1,11 @@
 from difflib import SequenceMatcher as SM
+from functools import lru_cache
 from nltk import sent_tokenize
 from nltk.util import ngrams
+from src.make_feedback_tool_data.constants import PII_FILTERED
 from tqdm import tqdm
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import pandas as pd
 import re
 import spacy
 import sys
@@ -18,13 +21,44 @@ except ImportError as e:
 
 tqdm.pandas()
 
-# Load spaCy's pre-trained statistical models for English 'en_core_web_sm'
-NLP = spacy.load("en_core_web_sm")
+# Define spaCy's pre-trained statistical models for English 'en_core_web_sm', and the pipeline components disabled for
+# each tagging profile. Part-of-speech tagging only uses the `tag_` and `lemma_` token attributes, so the 'pos' profile
+# drops the dependency parser and named entity recogniser
+SPACY_MODEL = "en_core_web_sm"
+SPACY_PROFILES = {"pos": ("parser", "ner"), "full": ()}
+SPACY_DEFAULT_PROFILE = "pos"
 
 # Define the regular expressions used for stripping out personally identifiable information (PII)
-PII_FILTERED = ["DATE_OF_BIRTH", "EMAIL_ADDRESS", "PASSPORT", "PERSON_NAME", "PHONE_NUMBER", "STREET_ADDRESS",
-                "UK_NATIONAL_INSURANCE_NUMBER", "UK_PASSPORT"]
 PII_REGEX = "|".join([rf"\[{p}\]" for p in PII_FILTERED])
+PII_PATTERN = re.compile(PII_REGEX)
+
+# Define the language codes returned by `PreProcess.detect_language_batch` for text strings with too few letters to
+# identify reliably, and text strings where language detection fails, the minimum number of letters needed for language
+# detection, and a regular expression to find any letter in a text string
+LANGUAGE_UNDETERMINED = "un"
+LANGUAGE_ERROR = "error"
+LANGUAGE_MIN_LETTERS = 4
+LETTER_REGEX = re.compile(r"[^\W\d_]")
+
+# Define the available engines for `PreProcess.find_needle`
+FIND_NEEDLE_ENGINES = ("difflib", "rapidfuzz")
+
+
+@lru_cache(maxsize=None)
+def load_spacy_model(profile: str = SPACY_DEFAULT_PROFILE) -> spacy.language.Language:
+    """Load spaCy's pre-trained statistical models for English, disabling the components not needed by `profile`.
+
+    The model is only loaded on first use, rather than on import, and then re-used for all subsequent calls with the
+    same `profile`.
+
+    :param profile: Default: 'pos'. A key of `SPACY_PROFILES`; 'pos' loads only the components needed for
+        part-of-speech tagging, whilst 'full' loads the entire pipeline.
+    :return: A spaCy `Language` object.
+
+    """
+    if profile not in SPACY_PROFILES:
+        raise ValueError(f"Unknown spaCy profile '{profile}'; expected one of: {', '.join(SPACY_PROFILES)}")
+    return spacy.load(SPACY_MODEL, disable=list(SPACY_PROFILES[profile]))
 
 
 class PreProcess:
@@ -51,26 +85,117 @@ class PreProcess:
         :return: `text` with PII removed.
 
         """
-        return re.sub(PII_REGEX, "", text)
+        return PII_PATTERN.sub("", text)
+
+    @staticmethod
+    def replace_pii_regex_batch(texts: pd.Series) -> pd.Series:
+        """Remove Personally Identifiable Information (PII) from multiple text strings using regular expressions.
+
+        Equivalent to calling `PreProcess.replace_pii_regex` on each text string in `texts`, but vectorised using the
+        pandas `Series.str.replace` method with the pre-compiled `PII_PATTERN` regular expression. Missing values are
+        left unchanged.
+
+        :param texts: A pandas Series of text strings potentially containing PII.
+        :return: `texts` with PII removed.
+
+        """
+
+        # Every PII placeholder starts with '[', so only text strings containing '[' need the regular expression
+        has_bracket = texts.str.contains("[", regex=False, na=False)
+        out = texts.copy()
+        out[has_bracket] = texts[has_bracket].str.replace(PII_PATTERN, "", regex=True)
+        return out
+
+    @staticmethod
+    def sentence_offsets(text: str, sentences: List[str]) -> List[int]:
+        """Find the character offset of each sentence within the text string it was split from.
+
+        :param text: A text string.
+        :param sentences: The sentences of `text`, in order, as returned by `PreProcess.split_sentences`.
+        :return: A list of the character offsets in `text` where each sentence of `sentences` starts.
+
+        """
+
+        # Initialise storage variables, and search for each sentence after the end of the previous one
+        offsets = []
+        position = 0
+        for sentence in sentences:
+            offset = text.find(sentence, position)
+            offsets.append(offset)
+            position = offset + len(sentence)
+        return offsets
 
     @classmethod
-    def part_of_speech_tag(cls, text: str) -> List[List[Tuple[str, str, str]]]:
+    def part_of_speech_tag(cls, text: str, profile: str = SPACY_DEFAULT_PROFILE, char_offsets: bool = False) \
+            -> List[List[Tuple[Union[str, int], ...]]]:
         """Perform part-of-speech (POS) tagging on a text string.
 
         Leverages spaCy's pre-trained statistical models for English 'en_core_web_sm'.
 
         :param text: A text string for POS tagging.
+        :param profile: Default: 'pos'. The spaCy pipeline profile to use. See `load_spacy_model` for further details.
+        :param char_offsets: Default: False. If True, each POS tag also includes the character offset of the token in
+            `text` as a fourth element.
         :return: A nested list of lists, where each nested list represents a sentence of `text`, and contains the POS
             tags of each token in this sentence. Each POS tag is represented as a three-element tuple of the token,
-            its POS tag, and its lemma (base word of the token).
+            its POS tag, and its lemma (base word of the token), or a four-element tuple additionally with the
+            character offset of the token in `text`, if `char_offsets` is True.
 
         """
 
         # Split `text` into a list of its sentences
         sentences = cls.split_sentences(text)
 
-        # Return the POS tags for each token in the sentence
-        return [[(token.text, token.tag_, token.lemma_) for token in NLP(sentence)] for sentence in sentences]
+        # Load the spaCy model, if it has not been loaded already
+        nlp = load_spacy_model(profile)
+
+        # Return the POS tags for each token in the sentence, where each POS tag is interned, so that equal tags share
+        # one string object; if required, add the sentence offset to the character offset of each token in its
+        # sentence
+        if char_offsets:
+            return [[(token.text, sys.intern(token.tag_), token.lemma_, offset + token.idx) for token in nlp(sentence)]
+                    for sentence, offset in zip(sentences, cls.sentence_offsets(text, sentences))]
+        return [[(token.text, sys.intern(token.tag_), token.lemma_) for token in nlp(sentence)]
+                for sentence in sentences]
+
+    @classmethod
+    def part_of_speech_tag_batch(cls, texts: Iterable[str], batch_size: int = 1000, n_process: int = 1,
+                                 profile: str = SPACY_DEFAULT_PROFILE, char_offsets: bool = False) \
+            -> List[List[List[Tuple[Union[str, int], ...]]]]:
+        """Perform part-of-speech (POS) tagging on multiple text strings in batches.
+
+        Equivalent to calling `PreProcess.part_of_speech_tag` on each text string in `texts`, but the sentences of all
+        text strings are streamed through spaCy's `nlp.pipe` in batches, optionally across multiple processes.
+
+        :param texts: An iterable of text strings for POS tagging.
+        :param batch_size: Default: 1000. The number of sentences to buffer in each batch passed to spaCy.
+        :param n_process: Default: 1. The number of processes spaCy uses to tag the sentences. If -1, uses all
+            available CPU cores.
+        :param profile: Default: 'pos'. The spaCy pipeline profile to use. See `load_spacy_model` for further details.
+        :param char_offsets: Default: False. If True, each POS tag also includes the character offset of the token in
+            its text string as a fourth element.
+        :return: A list, where each element is the output of `PreProcess.part_of_speech_tag` for the corresponding
+            text string in `texts`.
+
+        """
+
+        # Split each text string into a list of its sentences
+        texts = list(texts)
+        sentences = [cls.split_sentences(text) for text in texts]
+
+        # Tag all the sentences as a single stream, keeping the outputs in the same order as the inputs
+        nlp = load_spacy_model(profile)
+        docs = iter(tqdm(nlp.pipe((s for sents in sentences for s in sents), batch_size=batch_size,
+                                  n_process=n_process), total=sum(len(sents) for sents in sentences)))
+
+        # Re-group the tagged sentences by their original text string, interning each POS tag as in
+        # `PreProcess.part_of_speech_tag`; if required, add the sentence offset to the character offset of each token
+        # in its sentence
+        if char_offsets:
+            return [[[(token.text, sys.intern(token.tag_), token.lemma_, offset + token.idx) for token in next(docs)]
+                     for offset in cls.sentence_offsets(text, sents)] for text, sents in zip(texts, sentences)]
+        return [[[(token.text, sys.intern(token.tag_), token.lemma_) for token in next(docs)] for _ in sents]
+                for sents in sentences]
 
     @staticmethod
     def detect_language(text: str) -> str:
@@ -98,6 +223,44 @@ class PreProcess:
         else:
             return "-"
 
+    @staticmethod
+    def detect_language_batch(texts: Iterable[str]) -> List[str]:
+        """Identify the language of multiple text strings.
+
+        Equivalent to calling `PreProcess.detect_language` on each text string in `texts`, except that each distinct
+        text string is only identified once, and text strings with fewer than `LANGUAGE_MIN_LETTERS` letters, such as
+        'ok', 'no', or 'n/a', are returned as 'un' (undetermined) without calling `polyglot`. `polyglot` always returns
+        'un' for text strings without any letters, and an unreliable, arbitrary language for very short ones. If
+        language detection fails, the compact error code 'error' is returned instead of an error string.
+
+        :param texts: An iterable of text strings of one or more languages for identification.
+        :return: A list of the most confident/prevalent language detected in each text string of `texts`, a '-' (if
+            the text string is '-'), 'un' (if the text string has fewer than `LANGUAGE_MIN_LETTERS` letters), or
+            'error' (if a language could not be identified).
+
+        """
+
+        # Initialise a storage variable, and identify the language of each distinct text string in `texts`
+        texts = list(texts)
+        languages = {}
+        for text in tqdm(dict.fromkeys(texts)):
+
+            # Return '-' for '-', and 'un' for text strings with too few letters; otherwise, detect the language of
+            # `text`, and return the most confident/prevalent language. If language detection fails, return 'error'
+            if text == "-":
+                languages[text] = "-"
+            elif isinstance(text, str) and len(LETTER_REGEX.findall(text)) < LANGUAGE_MIN_LETTERS:
+                languages[text] = LANGUAGE_UNDETERMINED
+            else:
+                try:
+                    langs = {language.confidence: language.code for language in Detector(text, quiet=True).languages}
+                    languages[text] = langs[max(langs.keys())]
+                except Exception:
+                    languages[text] = LANGUAGE_ERROR
+
+        # Return the languages in the same order as `texts`
+        return [languages[text] for text in texts]
+
     @staticmethod
     def compute_combinations(items: List[Union[List[Any], Tuple]], n: int) -> List[List[Any]]:
         """Create list chunks from a nested list of items using a moving window of a set size n.
@@ -162,32 +325,52 @@ class PreProcess:
         return [r for r in res if r != ""]
 
     @staticmethod
-    def find_needle(needle: str, hay: str) -> Dict[str, Optional[str]]:
+    def find_needle(needle: str, hay: str, engine: str = "difflib") -> Dict[str, Optional[str]]:
         """For a pattern identical or similar to a phrase `needle` that can be found in a text string `hay`.
 
+        `hay` is split into word n-grams slightly longer than `needle`, and the n-gram most similar to `needle` is
+        searched for a pattern spanning the first and last words of `needle`.
+
+        The 'difflib' engine uses the `difflib.SequenceMatcher.ratio` similarity. `needle` is only pre-processed once
+        for all n-grams, and n-grams are skipped if the cheaper upper bounds of their ratio cannot beat the most similar
+        n-gram so far, so the results are identical to computing the ratio of every n-gram. The 'rapidfuzz' engine
+        uses the `rapidfuzz` package's normalised Indel similarity instead, which is faster, but can occasionally
+        select a different n-gram; this engine requires `rapidfuzz` to be installed.
+
         :param needle: A phrase to find in `hay`.
         :param hay: A text string that may contain `needle`, or a variant of it.
+        :param engine: Default: 'difflib'. The similarity engine, either 'difflib', or 'rapidfuzz'.
         :return: A dictionary, where the key is `needle`, and the value is a pattern similar or identical to `needle`
             that can be found in `hay`. If no pattern can be found, the value is None.
 
         """
+        if engine not in FIND_NEEDLE_ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'; expected one of: {', '.join(FIND_NEEDLE_ENGINES)}")
 
         # Initialise some storage variables
         needle_length = len(needle.split())
-        max_sim_val = 0
         max_sim_string = u""
 
-        # Split `hay` into n-grams, and search for a pattern that will match the n-grams
-        for ngram in ngrams(hay.split(), needle_length + int(.65 * needle_length)):
+        # Split `hay` into n-grams, and concatenate each n-gram
+        hay_ngrams = [u" ".join(ngram) for ngram in ngrams(hay.split(), needle_length + int(.65 * needle_length))]
 
-            # Concatenate the n-gram, and determine its similarity ratio to the overall phrase `needle`
-            hay_ngram = u" ".join(ngram)
-            similarity = SM(None, hay_ngram, needle).ratio()
-
-            # Store the similarity ratio, and the concatenated n-gram if the ratio is above `max_sim_val`
-            if similarity > max_sim_val:
-                max_sim_val = similarity
-                max_sim_string = hay_ngram
+        # Find the n-gram with the highest similarity ratio to the overall phrase `needle`; if multiple n-grams have
+        # the same highest ratio, use the first one. N-grams with a ratio of zero are never selected
+        if engine == "rapidfuzz":
+            from rapidfuzz import fuzz, process
+            best = process.extractOne(needle, hay_ngrams, scorer=fuzz.ratio, processor=None) if hay_ngrams else None
+            if best and best[1] > 0:
+                max_sim_string = best[0]
+        else:
+            max_sim_val = 0
+            matcher = SM(None, "", needle)
+            for hay_ngram in hay_ngrams:
+                matcher.set_seq1(hay_ngram)
+                if matcher.real_quick_ratio() > max_sim_val and matcher.quick_ratio() > max_sim_val:
+                    similarity = matcher.ratio()
+                    if similarity > max_sim_val:
+                        max_sim_val = similarity
+                        max_sim_string = hay_ngram
 
         # If no string is found, set it to `hay`
         if max_sim_string == "":
@@ -0,0 +1,147 @@
+from src.make_feedback_tool_data.pos_tag_cache import SQLITE_MAX_VARIABLES
+from typing import Hashable, Iterable, List, Optional
+import logging
+import numpy as np
+import os
+import pandas as pd
+import sqlite3
+import tempfile
+
+# Define the key stored for missing primary keys, e.g. NaN or None, so all missing primary keys are the same key, as
+# in `pandas.DataFrame.drop_duplicates`
+MISSING_KEY = "\x00missing"
+
+
+def canonical_keys(keys: Iterable[Hashable]) -> List[str]:
+    """Convert primary keys to the strings stored in a `PrimaryKeyStore`, so the same key always has the same string.
+
+    Keys are compared as text, so the same primary key matches whether it was read as an integer, a float, or a
+    string, e.g. 1, 1.0 and '1' are the same key. All missing keys, e.g. NaN and None, are the same key.
+
+    :param keys: An iterable of primary keys.
+    :return: A list of the canonical string of each key in `keys`.
+
+    """
+    return [MISSING_KEY if pd.isna(k) else str(int(k)) if isinstance(k, float) and k.is_integer() else str(k)
+            for k in keys]
+
+
+class PrimaryKeyStore:
+
+    def __init__(self, store_filename: Optional[str] = None) -> None:
+        """On-disk set of primary keys that have already been seen, backed by SQLite.
+
+        Used to de-duplicate rows exactly across chunks of a survey file, without holding all the primary keys in
+        memory.
+
+        :param store_filename: Default: None. A file path to the SQLite database; this is created if it does not
+            exist. If None, a temporary file is used, which is deleted when the store is closed.
+
+        """
+        self.logger = logging.getLogger(__name__)
+
+        # If `store_filename` is None, create a temporary file that is deleted on closing
+        self._is_temporary = store_filename is None
+        if self._is_temporary:
+            file_descriptor, store_filename = tempfile.mkstemp(suffix=".sqlite")
+            os.close(file_descriptor)
+        self.store_filename = store_filename
+
+        # Connect to the SQLite database, and create the key table if it does not exist; keys are stored, and compared,
+        # as their canonical strings. See `canonical_keys` for further details
+        self.connection = sqlite3.connect(store_filename)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS primary_keys (key TEXT PRIMARY KEY)")
+        self.connection.commit()
+
+    def __enter__(self) -> "PrimaryKeyStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM primary_keys").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the connection to the SQLite database, and delete it if it is a temporary file."""
+        self.connection.close()
+        if self._is_temporary and os.path.isfile(self.store_filename):
+            os.remove(self.store_filename)
+
+    def contains_many(self, keys: Iterable) -> set:
+        """Find which keys are already in the store.
+
+        :param keys: An iterable of primary keys.
+        :return: A set of the keys in `keys` that are already in the store, compared by their canonical strings. See
+            `canonical_keys` for further details.
+
+        """
+        keys = list(keys)
+        canonical = canonical_keys(keys)
+        found = self._find_canonical(canonical)
+        return {k for k, c in zip(keys, canonical) if c in found}
+
+    def _find_canonical(self, canonical: Iterable[str]) -> set:
+
+        # Initialise a storage variable, and de-duplicate `canonical`
+        found = set()
+        canonical = list(dict.fromkeys(canonical))
+
+        # Query the store in batches of at most `SQLITE_MAX_VARIABLES` keys
+        for i in range(0, len(canonical), SQLITE_MAX_VARIABLES):
+            batch = canonical[i:i + SQLITE_MAX_VARIABLES]
+            query = f"SELECT key FROM primary_keys WHERE key IN ({', '.join('?' * len(batch))})"
+            found.update(k for k, in self.connection.execute(query, batch))
+
+        return found
+
+    def add_many(self, keys: Iterable) -> None:
+        """Add multiple keys to the store, as their canonical strings. See `canonical_keys` for further details.
+
+        :param keys: An iterable of primary keys.
+        :return: None.
+
+        """
+        self._add_canonical(canonical_keys(keys))
+
+    def _add_canonical(self, canonical: Iterable[str]) -> None:
+        self.connection.executemany("INSERT OR IGNORE INTO primary_keys (key) VALUES (?)", ((k, ) for k in canonical))
+        self.connection.commit()
+
+    def update(self, other: "PrimaryKeyStore") -> None:
+        """Add all the keys of another store to this store, without loading them into memory.
+
+        :param other: A `PrimaryKeyStore` class instance.
+        :return: None.
+
+        """
+        self.connection.execute("ATTACH DATABASE ? AS other", (other.store_filename, ))
+        try:
+            self.connection.execute("INSERT OR IGNORE INTO primary_keys (key) SELECT key FROM other.primary_keys")
+            self.connection.commit()
+        finally:
+            self.connection.execute("DETACH DATABASE other")
+
+    def mark_new(self, keys: Iterable) -> np.ndarray:
+        """Flag the first occurrence of each key not already in the store, and add these keys to the store.
+
+        :param keys: An iterable of primary keys, e.g. a pandas Series.
+        :return: A boolean NumPy array, the same length as `keys`, which is True where the key has not been seen
+            before, either in the store, or earlier in `keys`.
+
+        """
+
+        # Convert NumPy scalars to Python objects, and then to their canonical strings, which are stored
+        canonical = canonical_keys(np.asarray(keys, dtype=object).tolist())
+        seen = self._find_canonical(canonical)
+
+        # Flag each key not in `seen`, and add it to `seen` so later duplicates within `keys` are not flagged
+        is_new = np.zeros(len(canonical), dtype=bool)
+        for i, key in enumerate(canonical):
+            if key not in seen:
+                is_new[i] = True
+                seen.add(key)
+
+        # Add the new keys to the store, and return the flags
+        self._add_canonical(k for k, n in zip(canonical, is_new) if n)
+        return is_new
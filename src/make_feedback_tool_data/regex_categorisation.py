@@ -1,4 +1,6 @@
-from typing import Dict, Optional
+from functools import lru_cache
+from src.make_feedback_tool_data.constants import sre_constants, sre_parse
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
 import os
 import re
 import yaml
@@ -17,6 +19,206 @@ with open(os.path.join(DIR_DATA, FILE_REGEX_GROUP_VERBS), "r") as gvf:
     DICT_GROUP_VERBS = yaml.safe_load(gvf)
 
 
+# Define the available `RegexCategoriser` engines
+REGEX_CATEGORISER_ENGINES = ("multi", "sequential")
+
+
+def required_literals(pattern: str) -> Optional[FrozenSet[str]]:
+    """Find lowercase literal strings, where at least one must be in any text string matched by a regular expression.
+
+    For example, any match of `(deliver(y|ies))|(slot)` must contain 'deliver' or 'slot'. Only literal characters,
+    groups, alternations, and repeats of at least one are used; all other parts of the pattern, such as character
+    classes, are skipped.
+
+    :param pattern: A regular expression pattern, matched ignoring case.
+    :return: A frozenset of lowercase literal strings, or None if no such literal strings can be found, or if the
+        pattern contains non-ASCII literal characters.
+
+    """
+
+    def _sequence_literals(items) -> Optional[FrozenSet[str]]:
+
+        # Initialise storage variables for the candidate sets of literal strings, and the current run of literal
+        # characters
+        candidates, run = [], []
+
+        # Iterate through the parsed items; runs of literal characters are required literal strings, as are the
+        # required literal strings of any groups, alternations, and repeats of at least one
+        for op, av in [*items, (None, None)]:
+            if op is sre_constants.LITERAL and chr(av).isascii():
+                run.append(chr(av).lower())
+                continue
+            if op is sre_constants.LITERAL:
+                return None
+            if run:
+                candidates.append(frozenset(["".join(run)]))
+                run = []
+            if op is sre_constants.SUBPATTERN:
+                candidates.append(_sequence_literals(av[-1]))
+            elif op is sre_constants.BRANCH:
+                branches = [_sequence_literals(b) for b in av[1]]
+                candidates.append(None if None in branches else frozenset().union(*branches))
+            elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+                candidates.append(_sequence_literals(av[2]))
+
+        # Return the most selective candidate, i.e. the one with the longest shortest literal string, and the fewest
+        # literal strings
+        candidates = [c for c in candidates if c]
+        return max(candidates, key=lambda c: (min(map(len, c)), -len(c))) if candidates else None
+
+    return _sequence_literals(sre_parse.parse(pattern, re.IGNORECASE))
+
+
+class RegexCategoriser:
+
+    def __init__(self, dict_category: Dict[str, str], engine: str = "multi") -> None:
+        """Determine the category of text strings using precompiled regular expressions.
+
+        The regular expression patterns are compiled once, and searched in the key order of `dict_category`; the first
+        matching category is returned, in the same way as `regex_category_identification`.
+
+        The 'multi' engine treats the patterns as a multi-pattern set. Each pattern is reduced to literal strings, one
+        of which must be in any match (see `required_literals`); patterns that cannot be reduced are always candidates.
+        For ASCII text strings, a single scan of the text string, using one regular expression of all these literal
+        strings, finds the candidate patterns, and only the candidates are searched, in priority order. Text strings
+        without any matches, which are common, therefore rarely need any pattern searches. The results are the same as
+        the 'sequential' engine, which searches each pattern in turn.
+
+        :param dict_category: A dictionary where the keys are possible categories, and the values are regular
+            expression patterns that match said category.
+        :param engine: Default: 'multi'. The matching engine, either 'multi', or 'sequential'.
+
+        """
+        if engine not in REGEX_CATEGORISER_ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'; expected one of: {', '.join(REGEX_CATEGORISER_ENGINES)}")
+
+        self.engine = engine
+        self.categories = list(dict_category.keys())
+        self.patterns = [re.compile(v, re.IGNORECASE) for v in dict_category.values()]
+
+        # For the 'multi' engine, map each required literal string to the priority indices of its patterns. Patterns
+        # without any required literal strings are always candidates, as are patterns where `required_literals` fails,
+        # as it relies on the private regular expression parser, which may change between Python versions
+        self._always_candidates = set()
+        literal_candidates = {}
+        for i, v in enumerate(dict_category.values()):
+            try:
+                literals = required_literals(v) if self.engine == "multi" else None
+            except Exception:
+                literals = None
+            if not literals:
+                self._always_candidates.add(i)
+            for literal in literals or ():
+                literal_candidates.setdefault(literal, set()).add(i)
+
+        # Compile one regular expression that finds the longest literal string starting at each position of a text
+        # string, using a lookahead, so overlapping literal strings are all found. Any shorter literal strings starting
+        # at the same position are prefixes of the longest one, so each literal string is mapped to the patterns of
+        # itself, and all its prefixes
+        literals = sorted(literal_candidates, key=len, reverse=True)
+        self._literal_regex = re.compile(f"(?=({'|'.join(map(re.escape, literals))}))") if literals else None
+        self._literal_candidates = {
+            literal: set().union(*(v for k, v in literal_candidates.items() if literal.startswith(k)))
+            for literal in literals
+        }
+
+    def _candidates(self, text: str) -> List[int]:
+        """Find the priority indices of the patterns that may match a text string.
+
+        :param text: A text string for category identification.
+        :return: A sorted list of the priority indices of the candidate patterns; this is every pattern if `text` is
+            not ASCII, as ignoring case can then match non-ASCII characters to ASCII literal characters.
+
+        """
+        if self.engine == "sequential" or not text.isascii():
+            return list(range(len(self.patterns)))
+
+        # Find the candidate patterns in one scan of `text` for all the required literal strings
+        candidates = set(self._always_candidates)
+        if self._literal_regex:
+            for literal in {m.group(1) for m in self._literal_regex.finditer(text.lower())}:
+                candidates.update(self._literal_candidates[literal])
+        return sorted(candidates)
+
+    def categorise(self, text: str) -> str:
+        """Determine the category of a text string.
+
+        :param text: A text string for category identification; the text case is ignored.
+        :return: A string of the first matching category, or 'unknown' if no matching categories exist.
+
+        """
+
+        # Search for each candidate compiled pattern in `text` in priority order; return the category of the first
+        # match
+        for i in self._candidates(text):
+            if self.patterns[i].search(text):
+                return self.categories[i]
+
+        # If there are no matches with any categories, return 'unknown'
+        return "unknown"
+
+    def categorise_all(self, text: str) -> List[str]:
+        """Determine all the matching categories of a text string.
+
+        :param text: A text string for category identification; the text case is ignored.
+        :return: A list of every matching category in priority order, which is empty if no matching categories exist.
+
+        """
+        return [self.categories[i] for i in self._candidates(text) if self.patterns[i].search(text)]
+
+    def categorise_many(self, texts: Iterable[str], return_all: bool = False) -> Union[List[str], List[List[str]]]:
+        """Determine the category of multiple text strings.
+
+        Each distinct text string is only categorised once.
+
+        :param texts: An iterable of text strings for category identification, e.g. a pandas Series.
+        :param return_all: Default: False. If True, return all the matching categories of each text string, as
+            returned by `RegexCategoriser.categorise_all`, rather than the first matching category.
+        :return: A list of the categories for each text string in `texts`, in the same order.
+
+        """
+        # Categorise each distinct text string once, and return the categories in the same order as `texts`
+        texts = list(texts)
+        func = self.categorise_all if return_all else self.categorise
+        categories = {t: func(t) for t in dict.fromkeys(texts)}
+        return [categories[t] for t in texts]
+
+
+@lru_cache(maxsize=None)
+def _get_regex_categoriser(dict_category_items: Tuple[Tuple[str, str], ...]) -> RegexCategoriser:
+    """Build, and cache, a `RegexCategoriser` class instance for the items of a category dictionary.
+
+    :param dict_category_items: A tuple of the (category, pattern) items of a category dictionary.
+    :return: A `RegexCategoriser` class instance for `dict_category_items`.
+
+    """
+    return RegexCategoriser(dict(dict_category_items))
+
+
+# Build the `RegexCategoriser` class instances of the theme, and group verbs, dictionaries once, through the cache, so
+# dictionaries with the same items get the same class instance
+THEME_CATEGORISER = _get_regex_categoriser(tuple(DICT_THEMES.items()))
+GROUP_VERBS_CATEGORISER = _get_regex_categoriser(tuple(DICT_GROUP_VERBS.items()))
+
+
+def get_regex_categoriser(dict_category: Dict[str, str]) -> RegexCategoriser:
+    """Get a `RegexCategoriser` class instance for a category dictionary, which is only built once per dictionary.
+
+    The theme, and group verbs, dictionaries are categorised for every phrase, so their prebuilt class instances,
+    `THEME_CATEGORISER`, and `GROUP_VERBS_CATEGORISER`, are returned without hashing their items.
+
+    :param dict_category: A dictionary where the keys are possible categories, and the values are regular expression
+        patterns that match said category.
+    :return: A `RegexCategoriser` class instance for `dict_category`.
+
+    """
+    if dict_category is DICT_THEMES:
+        return THEME_CATEGORISER
+    if dict_category is DICT_GROUP_VERBS:
+        return GROUP_VERBS_CATEGORISER
+    return _get_regex_categoriser(tuple(dict_category.items()))
+
+
 def regex_category_identification(text: str, dict_category: Dict[str, str]) -> str:
     """Use regular expressions to determine a category of a text string.
 
@@ -26,14 +228,9 @@ def regex_category_identification(text: str, dict_category: Dict[str, str]) -> s
     :return: A string of the category from the keys of `dict_category`, or 'unknown' if no matching categories exist.
     """
 
-    # Iterate through `dict_category` in key order, and search for the regular expression pattern in `text`; return the
-    # key, i.e. the category, if there is a match
-    for k, v in dict_category.items():
-        if re.search(v, text, re.IGNORECASE):
-            return k
-
-    # If there are no matches with any theme keys in `dict_category`, return 'unknown'
-    return "unknown"
+    # Search for the precompiled regular expression patterns of `dict_category` in `text` in key order; return the
+    # key, i.e. the category, of the first match, or 'unknown' if there are no matches
+    return get_regex_categoriser(dict_category).categorise(text)
 
 
 def regex_for_theme(text: str, dict_themes: Optional[Dict[str, str]] = None) -> str:
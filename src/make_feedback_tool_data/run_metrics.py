@@ -0,0 +1,277 @@
+from datetime import datetime
+from src.make_feedback_tool_data.stage_profiler import StageProfiler
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sized
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+# Try/except block to import the `resource` module, which is not available on Windows; without it, peak resident set
+# size (RSS) is not recorded
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Define the file with the current memory use of the process, in pages, which is only available on Linux
+STATM_FILENAME = "/proc/self/statm"
+
+
+def peak_rss_mib() -> Optional[float]:
+    """Get the peak resident set size (RSS) of the current process so far.
+
+    :return: The peak RSS in MiB, or None if it cannot be measured on this platform.
+
+    """
+    if resource is None:
+        return None
+
+    # `ru_maxrss` is in bytes on macOS, and in KiB on Linux
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 2 ** 10
+
+
+def current_rss_mib() -> Optional[float]:
+    """Get the current resident set size (RSS) of the current process.
+
+    Unlike `peak_rss_mib`, this goes down when memory is freed, so the change in the current RSS over a stage shows
+    the memory it keeps, even if an earlier stage used more memory at its peak.
+
+    :return: The current RSS in MiB, or None if it cannot be measured on this platform.
+
+    """
+    try:
+        with open(STATM_FILENAME) as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+class StageMetrics:
+
+    def __init__(self, name: str, rows_in: Optional[int] = None, top_allocators: int = 0,
+                 profiler: Optional[StageProfiler] = None) -> None:
+        """Measure the cost of one call of a pipeline stage, when used as a context manager.
+
+        Records the wall time, CPU time, rows in and out, rows per second, and two memory metrics: the increase in the
+        peak resident set size (RSS) of the process during the stage, and the change in the current RSS of the process
+        over the stage. The process peak is a high-water mark, so its increase is 0 for any stage that uses less memory
+        than an earlier stage did; the change in the current RSS is negative if the stage frees memory. Set the
+        `rows_out` attribute inside the context manager.
+
+        :param name: The name of the stage.
+        :param rows_in: Default: None. The number of rows input to the stage.
+        :param top_allocators: Default: 0. If greater than 0, trace memory allocations using `tracemalloc` during the
+            stage, and record this number of source lines with the largest net memory allocations.
+        :param profiler: Default: None. If given, a `StageProfiler` class instance used to profile the stage.
+
+        """
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.top_allocators = top_allocators
+        self.profiler = profiler
+        self.wall_time = None
+        self.cpu_time = None
+        self.peak_rss_increase_mib = None
+        self.rss_delta_mib = None
+        self.allocators = []
+
+    def __enter__(self) -> "StageMetrics":
+
+        # If required, start tracing memory allocations, unless they are already traced, and take a snapshot
+        if self.top_allocators:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot()
+
+        # Get the peak, and current, RSS, and start the timers
+        self._peak_rss = peak_rss_mib()
+        self._rss = current_rss_mib()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+        # If required, start profiling the stage
+        if self.profiler:
+            self.profiler.enable(self.name)
+        return self
+
+    def __exit__(self, *args) -> None:
+
+        # If required, stop profiling the stage, then stop the timers, and get the increase in the peak RSS, and the
+        # change in the current RSS
+        if self.profiler:
+            self.profiler.disable()
+        self.wall_time = time.perf_counter() - self._wall_start
+        self.cpu_time = time.process_time() - self._cpu_start
+        if self._peak_rss is not None:
+            self.peak_rss_increase_mib = peak_rss_mib() - self._peak_rss
+        if self._rss is not None:
+            self.rss_delta_mib = current_rss_mib() - self._rss
+
+        # If required, get the source lines with the largest net memory allocations since the start of the stage, and
+        # stop tracing memory allocations if they were not already traced
+        if self.top_allocators:
+            statistics = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]) \
+                .compare_to(self._snapshot, "lineno")
+            self.allocators = [{"location": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                                "size_diff_kib": s.size_diff / 2 ** 10, "count_diff": s.count_diff}
+                               for s in statistics[:self.top_allocators]]
+            if self._started_tracing:
+                tracemalloc.stop()
+            del self._snapshot
+
+    @property
+    def rows_per_sec(self) -> Optional[float]:
+        """Get the number of input rows processed per second of wall time.
+
+        :return: `rows_in` divided by `wall_time`, or None if either is not known, or the wall time is 0.
+
+        """
+        return self.rows_in / self.wall_time if self.rows_in is not None and self.wall_time else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the stage metrics as a dictionary.
+
+        :return: A dictionary of the name, wall time and CPU time in seconds, rows in and out, rows per second,
+            increase in the process peak RSS, and change in the current RSS, in MiB, and top memory allocators, if
+            traced, of the stage.
+
+        """
+        return {"name": self.name, "wall_time": self.wall_time, "cpu_time": self.cpu_time, "rows_in": self.rows_in,
+                "rows_out": self.rows_out, "rows_per_sec": self.rows_per_sec,
+                "peak_rss_increase_mib": self.peak_rss_increase_mib, "rss_delta_mib": self.rss_delta_mib,
+                "allocators": self.allocators}
+
+
+class RunMetrics:
+
+    def __init__(self, top_allocators: int = 0, profiler: Optional[StageProfiler] = None) -> None:
+        """Collect the per-stage metrics of a pipeline run, and write them to a JSON run report.
+
+        :param top_allocators: Default: 0. If greater than 0, trace memory allocations using `tracemalloc` during each
+            stage, and record this number of source lines with the largest net memory allocations. Tracing memory
+            allocations slows down each stage considerably.
+        :param profiler: Default: None. If given, a `StageProfiler` class instance used to profile each stage
+            separately.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.top_allocators = top_allocators
+        self.profiler = profiler
+        self.stages: List[StageMetrics] = []
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def stage(self, name: str, rows_in: Optional[int] = None) -> StageMetrics:
+        """Measure a call of a pipeline stage, for use as a context manager.
+
+        >>> metrics = RunMetrics()
+        >>> with metrics.stage("double", rows_in=3) as stage:
+        ...     rows = [2 * x for x in [1, 2, 3]]
+        ...     stage.rows_out = len(rows)
+        >>> metrics.stages[0].rows_out
+        3
+
+        :param name: The name of the stage; calls of stages with the same name are combined in the run report.
+        :param rows_in: Default: None. The number of rows input to the stage.
+        :return: A `StageMetrics` object, which is added to the `stages` attribute.
+
+        """
+        stage = StageMetrics(name, rows_in, self.top_allocators, self.profiler)
+        self.stages.append(stage)
+        return stage
+
+    def iter_stage(self, name: str, iterable: Iterable[Sized]) -> Iterator[Sized]:
+        """Measure getting each item of an iterable as a call of a pipeline stage, e.g. reading a file in chunks.
+
+        :param name: The name of the stage.
+        :param iterable: An iterable of sized items, e.g. pandas DataFrames; the length of each item is recorded as the
+            rows output by each call of the stage.
+        :return: An iterator of the items in `iterable`.
+
+        """
+        iterator = iter(iterable)
+        while True:
+            stage = StageMetrics(name, top_allocators=self.top_allocators, profiler=self.profiler)
+            with stage:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            stage.rows_out = len(item)
+            self.stages.append(stage)
+            yield item
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Combine the metrics of the calls of each stage, in the order each stage was first called.
+
+        Wall times, CPU times, rows, and changes in the current RSS are summed over calls, the increase in the process
+        peak RSS is summed too, as each call can only raise the peak further, and the top memory allocators are summed
+        by source line.
+
+        :return: A list of dictionaries of the combined metrics of each stage, with the same keys as
+            `StageMetrics.to_dict`, and the number of `calls` of the stage.
+
+        """
+
+        # Group the calls of each stage by name
+        grouped = {}
+        for stage in self.stages:
+            grouped.setdefault(stage.name, []).append(stage)
+
+        # Combine the metrics of the calls of each stage
+        out = []
+        for name, stages in grouped.items():
+            wall_time = sum(s.wall_time or 0 for s in stages)
+            rows_in = sum(s.rows_in for s in stages) if all(s.rows_in is not None for s in stages) else None
+            rows_out = sum(s.rows_out for s in stages) if all(s.rows_out is not None for s in stages) else None
+            peak_rss = [s.peak_rss_increase_mib for s in stages if s.peak_rss_increase_mib is not None]
+            rss = [s.rss_delta_mib for s in stages if s.rss_delta_mib is not None]
+            allocators = {}
+            for a in (a for s in stages for a in s.allocators):
+                combined = allocators.setdefault(a["location"], {**a, "size_diff_kib": 0, "count_diff": 0})
+                combined["size_diff_kib"] += a["size_diff_kib"]
+                combined["count_diff"] += a["count_diff"]
+            out.append({"name": name, "calls": len(stages), "wall_time": wall_time,
+                        "cpu_time": sum(s.cpu_time or 0 for s in stages), "rows_in": rows_in, "rows_out": rows_out,
+                        "rows_per_sec": rows_in / wall_time if rows_in is not None and wall_time else None,
+                        "peak_rss_increase_mib": sum(peak_rss) if peak_rss else None,
+                        "rss_delta_mib": sum(rss) if rss else None,
+                        "allocators": sorted(allocators.values(), key=lambda a: -a["size_diff_kib"])
+                        [:self.top_allocators]})
+        return out
+
+    def to_dict(self, **run_info: Any) -> Dict[str, Any]:
+        """Get the run report as a dictionary.
+
+        :param run_info: Keyword arguments describing the run, e.g. the survey file name, added to the run report.
+        :return: A dictionary of the start time, total wall time and CPU time in seconds, and peak RSS in MiB of the
+            run, `run_info`, and the combined metrics of each stage. See `RunMetrics.summary` for further details.
+
+        """
+        return {"started_at": self.started_at, "wall_time": time.perf_counter() - self._wall_start,
+                "cpu_time": time.process_time() - self._cpu_start, "peak_rss_mib": peak_rss_mib(), **run_info,
+                "stages": self.summary()}
+
+    def write_report(self, report_filename: str, **run_info: Any) -> None:
+        """Write the run report to a JSON file, and log the metrics of each stage.
+
+        :param report_filename: A file path for the JSON run report.
+        :param run_info: Keyword arguments describing the run, e.g. the survey file name, added to the run report.
+        :return: None. Writes the run report to `report_filename`.
+
+        """
+        report = self.to_dict(**run_info)
+        for s in report["stages"]:
+            rows_per_sec = f"{s['rows_per_sec']:.1f} rows/sec" if s["rows_per_sec"] is not None else "n/a rows/sec"
+            self.logger.info(f"Stage {s['name']}: {s['wall_time']:.3f}s wall, {s['cpu_time']:.3f}s CPU, "
+                             f"{s['rows_in']} rows in, {s['rows_out']} rows out, {rows_per_sec}")
+        with open(report_filename, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        self.logger.info(f"Saved run report at: {report_filename}")
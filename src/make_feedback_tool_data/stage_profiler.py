@@ -0,0 +1,213 @@
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+
+# Define the available profilers
+PROFILERS = ("cprofile", "sampling")
+
+# Define the schema of speedscope files; see https://www.speedscope.app/file-format-schema.json
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Define a type for a function in a profile: its file name, first line number, and name
+Function = Tuple[str, int, str]
+
+
+class SamplingProfiler:
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """Statistical profiler that samples the call stack of a thread at a regular interval.
+
+        Unlike `cProfile.Profile`, this does not slow down every function call, so it suits long runs on large files,
+        at the cost of only estimating the time spent in each function.
+
+        :param interval: Default: 0.005. The interval between samples, in seconds.
+
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self) -> None:
+        """Start sampling the call stack of the calling thread in a background thread.
+
+        :return: None.
+
+        """
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def disable(self) -> None:
+        """Stop sampling the call stack.
+
+        :return: None.
+
+        """
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _sample(self) -> None:
+
+        # Until stopped, record the call stack of the profiled thread, from the outermost to the innermost function
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+
+class StageProfiler:
+
+    def __init__(self, profiler: str = "cprofile", interval: float = 0.005) -> None:
+        """Profile each pipeline stage separately, combining the calls of each stage.
+
+        Pass to `src.make_feedback_tool_data.run_metrics.RunMetrics` to profile every stage it measures. Only the
+        calling process is profiled, so work done in child processes, e.g. if `n_jobs` is not 1, is not seen.
+
+        :param profiler: Default: 'cprofile'. The profiler to use; either 'cprofile', which traces every function call
+            using `cProfile`, and is saved as `pstats` files, or 'sampling', which samples the call stack using
+            `SamplingProfiler`, and is saved as a speedscope file.
+        :param interval: Default: 0.005. The interval between samples, in seconds, if `profiler` is 'sampling'.
+
+        """
+        if profiler not in PROFILERS:
+            raise ValueError(f"Invalid `profiler`; must be one of {PROFILERS}: {profiler}")
+        self.profiler = profiler
+        self.interval = interval
+        self.profiles: Dict[str, Any] = {}
+        self._active = None
+
+    def enable(self, name: str) -> None:
+        """Start profiling a call of a stage; only one stage can be profiled at a time.
+
+        :param name: The name of the stage; calls of stages with the same name are combined into one profile.
+        :return: None.
+
+        """
+        if self._active is not None:
+            raise RuntimeError(f"Cannot profile stage '{name}' whilst profiling stage '{self._active}'")
+        if name not in self.profiles:
+            self.profiles[name] = cProfile.Profile() if self.profiler == "cprofile" \
+                else SamplingProfiler(self.interval)
+        self.profiles[name].enable()
+        self._active = name
+
+    def disable(self) -> None:
+        """Stop profiling the current stage, if any.
+
+        :return: None.
+
+        """
+        if self._active is not None:
+            self.profiles[self._active].disable()
+            self._active = None
+
+    def function_stats(self, name: str) -> Dict[Function, Dict[str, float]]:
+        """Get the number of calls, self time, and total time of each function profiled in a stage.
+
+        For the 'sampling' profiler, the number of calls is the number of samples the function is in, and the times
+        are estimated from the number of samples.
+
+        :param name: The name of the stage.
+        :return: A dictionary where the keys are functions, i.e. tuples of file name, first line number, and name, and
+            the values are dictionaries with keys 'calls', 'self_time', and 'total_time'.
+
+        """
+        profile = self.profiles[name]
+
+        # For the 'cprofile' profiler, get the statistics in the same format as `pstats`; unlike `pstats.Stats`, this
+        # also works for stages where no functions were profiled
+        if self.profiler == "cprofile":
+            profile.create_stats()
+            return {f: {"calls": nc, "self_time": tt, "total_time": ct}
+                    for f, (_, nc, tt, ct, _) in profile.stats.items()}
+
+        # Otherwise, count the samples each function is innermost in, and the samples each function is anywhere in,
+        # counting recursive functions only once per sample
+        out = {}
+        for stack, count in profile.samples.items():
+            for f in set(stack):
+                stats = out.setdefault(f, {"calls": 0, "self_time": 0.0, "total_time": 0.0})
+                stats["calls"] += count
+                stats["total_time"] += count * profile.interval
+            out[stack[-1]]["self_time"] += count * profile.interval
+        return out
+
+    def top_functions(self, name: str, n: int = 20) -> List[Dict[str, Any]]:
+        """Get the functions with the most self time in a stage.
+
+        :param name: The name of the stage.
+        :param n: Default: 20. The number of functions to get.
+        :return: A list of up to `n` dictionaries, in descending order of self time, with keys 'function', i.e.
+            'file:line(name)', 'calls', 'self_time', and 'total_time'.
+
+        """
+        stats = sorted(self.function_stats(name).items(), key=lambda x: -x[1]["self_time"])
+        return [{"function": f"{f[0]}:{f[1]}({f[2]})", **s} for f, s in stats[:n]]
+
+    def format_top_functions(self, n: int = 20) -> str:
+        """Format a table of the functions with the most self time in each stage.
+
+        :param n: Default: 20. The number of functions to show per stage.
+        :return: A table of the `n` functions with the most self time in each stage, in the order each stage was first
+            profiled.
+
+        """
+        lines = []
+        for name in self.profiles:
+            lines.extend([f"Stage {name}:", f"{'calls':>10} {'self (s)':>10} {'total (s)':>10}  function"])
+            lines.extend(f"{r['calls']:>10} {r['self_time']:>10.3f} {r['total_time']:>10.3f}  {r['function']}"
+                         for r in self.top_functions(name, n))
+        return "\n".join(lines)
+
+    def write(self, profile_dir: str) -> List[str]:
+        """Save the profile of each stage to a directory.
+
+        For the 'cprofile' profiler, save one `pstats` file per stage, named '<stage>.pstats', which can be read using
+        `pstats.Stats`, or opened in viewers such as snakeviz. For the 'sampling' profiler, save one speedscope file,
+        named 'profile.speedscope.json', with one profile per stage, which can be opened at https://www.speedscope.app.
+
+        :param profile_dir: A directory path for the profiles; this is created if it does not exist.
+        :return: A list of the file paths saved.
+
+        """
+        os.makedirs(profile_dir, exist_ok=True)
+
+        # For the 'cprofile' profiler, save a `pstats` file per stage, replacing any characters that are not safe in
+        # file names
+        if self.profiler == "cprofile":
+            out = []
+            for name, profile in self.profiles.items():
+                out.append(os.path.join(profile_dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.pstats"))
+                profile.dump_stats(out[-1])
+            return out
+
+        # Otherwise, save a speedscope file, where each frame is shared by the profiles of all stages
+        frames: Dict[Function, int] = {}
+        profiles = []
+        for name, profile in self.profiles.items():
+            samples = [[frames.setdefault(f, len(frames)) for f in stack] for stack in profile.samples]
+            weights = [count * profile.interval for count in profile.samples.values()]
+            profiles.append({"type": "sampled", "name": name, "unit": "seconds", "startValue": 0,
+                             "endValue": sum(weights), "samples": samples, "weights": weights})
+        speedscope = {"$schema": SPEEDSCOPE_SCHEMA, "name": "make_data_for_feedback_tool",
+                      "exporter": "src.make_feedback_tool_data.stage_profiler", "activeProfileIndex": 0,
+                      "shared": {"frames": [{"name": f[2], "file": f[0], "line": f[1]} for f in frames]},
+                      "profiles": profiles}
+        out = os.path.join(profile_dir, "profile.speedscope.json")
+        with open(out, "w") as f:
+            json.dump(speedscope, f)
+        return [out]
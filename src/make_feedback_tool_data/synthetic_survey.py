@@ -0,0 +1,263 @@
+from itertools import count, islice
+from src.make_feedback_tool_data.constants import PII_FILTERED, sre_constants, sre_parse
+from src.make_feedback_tool_data.regex_categorisation import DICT_THEMES
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import argparse
+import logging.config
+import os
+import pandas as pd
+import random
+import string
+
+# Set up a logger
+logger = logging.getLogger(__name__)
+
+# Define the survey data columns consumed by `create_dataset`
+SURVEY_COLUMNS = ["primary_key", "intents_clientID", "session_id", "Q3"]
+
+# Define the characters used for wildcards, and negated character sets, when sampling text strings from a regular
+# expression, and the characters of each character class
+SAMPLE_CHARS = string.ascii_lowercase + string.digits + " "
+CATEGORY_CHARS = {sre_constants.CATEGORY_DIGIT: string.digits, sre_constants.CATEGORY_SPACE: " ",
+                  sre_constants.CATEGORY_WORD: string.ascii_lowercase + string.digits + "_"}
+
+# Define the sentence parts of synthetic comments; each sentence is an opener, a theme phrase sampled from
+# `DICT_THEMES` (or a generic object), and an optional ending
+OPENERS = ["I need help with", "I want to apply for", "Where can I find information about", "I have not received",
+           "Please tell me more about", "I can not get", "I am worried about", "What is the latest advice on",
+           "I tried to sign up for", "How do I check"]
+GENERIC_OBJECTS = ["what I was looking for", "the right page", "anything useful", "the answer", "the form"]
+ENDINGS = ["", " for my family", " during the lockdown", " because of the outbreak", " as soon as possible",
+           " this week", " on this website", " for my business"]
+
+# Define sentences containing personally identifiable information (PII) placeholders, for each placeholder removed by
+# `PreProcess.replace_pii_regex`
+PII_SENTENCES = {"DATE_OF_BIRTH": "I was born on [DATE_OF_BIRTH].", "EMAIL_ADDRESS": "Email me at [EMAIL_ADDRESS].",
+                 "PASSPORT": "My passport number is [PASSPORT].", "PERSON_NAME": "My name is [PERSON_NAME].",
+                 "PHONE_NUMBER": "Please call me on [PHONE_NUMBER].", "STREET_ADDRESS": "I live at [STREET_ADDRESS].",
+                 "UK_NATIONAL_INSURANCE_NUMBER": "My national insurance number is [UK_NATIONAL_INSURANCE_NUMBER].",
+                 "UK_PASSPORT": "My UK passport is [UK_PASSPORT]."}
+
+# Define non-English comments, in the languages most often seen in the survey data
+NON_ENGLISH_COMMENTS = ["Je voudrais demander une aide financière pour mon entreprise.",
+                        "Ich möchte einen Antrag auf Kurzarbeitergeld stellen.",
+                        "Quiero solicitar un subsidio por desempleo para mi familia.",
+                        "Chciałbym dowiedzieć się więcej o zasiłku chorobowym.",
+                        "Aş dori să aflu cum pot primi ajutor pentru chirie.",
+                        "Hoffwn gael gwybodaeth am y cynllun cymorth busnes.",
+                        "Gostaria de saber como pedir o subsídio de doença."]
+
+# Define short comments, which are often repeated word for word
+SHORT_COMMENTS = ["-", "No", "Nothing", "Thank you", "N/A", "Very helpful", "Not really"]
+
+# Define the parameters of the log-normal distribution of the number of sentences per comment; this gives mostly one
+# to three sentences, with a long tail of comments over the 4,000 character threshold of
+# `preprocess_filter_comment_text`
+SENTENCES_MU = 0.5
+SENTENCES_SIGMA = 1.0
+
+# Define the number of recent rows kept to draw duplicate rows from
+DUPLICATE_POOL_SIZE = 10000
+
+
+def _sample_char_set(items: List[Tuple[Any, Any]], rng: random.Random) -> str:
+    """Sample a random character from a parsed regular expression character set, e.g. '[a-z]', or '\\s'.
+
+    :param items: The parsed items of the character set.
+    :param rng: A random number generator.
+    :return: A random character in the character set; negated character sets use the characters in `SAMPLE_CHARS`.
+
+    """
+    chars, negate = set(), False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_constants.RANGE:
+            chars.update(chr(c) for c in range(av[0], av[1] + 1))
+        elif op is sre_constants.CATEGORY:
+            chars.update(CATEGORY_CHARS.get(av, ""))
+    return rng.choice(sorted(set(SAMPLE_CHARS) - chars if negate else chars))
+
+
+def _sample_items(items: List[Tuple[Any, Any]], rng: random.Random, max_repeat: int) -> str:
+    """Sample a random text string matched by parsed regular expression items. See `sample_regex` for further details.
+
+    :param items: The parsed items of a regular expression.
+    :param rng: A random number generator.
+    :param max_repeat: The maximum number of extra repeats of a repeated item, above its minimum number of repeats.
+    :return: A random text string matched by `items`.
+
+    """
+    out = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            out.append(chr(av))
+        elif op in (sre_constants.NOT_LITERAL, sre_constants.ANY):
+            out.append(rng.choice([c for c in SAMPLE_CHARS if op is sre_constants.ANY or ord(c) != av]))
+        elif op is sre_constants.IN:
+            out.append(_sample_char_set(av, rng))
+        elif op is sre_constants.SUBPATTERN:
+            out.append(_sample_items(av[-1], rng, max_repeat))
+        elif op is sre_constants.BRANCH:
+            out.append(_sample_items(rng.choice(av[1]), rng, max_repeat))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            out.extend(_sample_items(av[2], rng, max_repeat)
+                       for _ in range(rng.randint(av[0], min(av[1], av[0] + max_repeat))))
+    return "".join(out)
+
+
+def sample_regex(pattern: str, rng: random.Random, max_repeat: int = 2) -> str:
+    """Sample a random text string matched by a regular expression.
+
+    Only the parts of regular expression syntax used in `regex_for_theme.yaml` are supported, i.e. literal characters,
+    character sets and classes, wildcards, groups, alternations, and repeats; anchors, and other zero-width assertions,
+    are skipped.
+
+    :param pattern: A regular expression pattern.
+    :param rng: A random number generator.
+    :param max_repeat: Default: 2. The maximum number of extra repeats of a repeated part of `pattern`, above its
+        minimum number of repeats.
+    :return: A random text string searched by `pattern`.
+
+    """
+    return _sample_items(sre_parse.parse(pattern), rng, max_repeat)
+
+
+def _make_comment(rng: random.Random, theme_patterns: List[str], pii_rate: float, non_english_rate: float,
+                  short_comment_rate: float) -> str:
+    """Make a random synthetic comment. See `generate_survey_rows` for further details.
+
+    :param rng: A random number generator.
+    :param theme_patterns: A list of the regular expression patterns of each theme.
+    :param pii_rate: The fraction of comments with a PII placeholder.
+    :param non_english_rate: The fraction of non-English comments.
+    :param short_comment_rate: The fraction of short comments, which are often repeated word for word.
+    :return: A synthetic comment.
+
+    """
+
+    # Return a non-English, or short comment, if required
+    p = rng.random()
+    if p < non_english_rate:
+        return rng.choice(NON_ENGLISH_COMMENTS)
+    if p < non_english_rate + short_comment_rate:
+        return rng.choice(SHORT_COMMENTS)
+
+    # Otherwise, create a log-normally distributed number of sentences; most sentences mention a theme, using a phrase
+    # sampled from its regular expression
+    sentences = []
+    for _ in range(max(1, int(rng.lognormvariate(SENTENCES_MU, SENTENCES_SIGMA)))):
+        phrase = " ".join(sample_regex(rng.choice(theme_patterns), rng).split()) if rng.random() < 0.8 else \
+            rng.choice(GENERIC_OBJECTS)
+        sentences.append(f"{rng.choice(OPENERS)} {phrase}{rng.choice(ENDINGS)}.")
+
+    # Insert a sentence with a PII placeholder at a random position, if required
+    if rng.random() < pii_rate:
+        sentences.insert(rng.randint(0, len(sentences)), PII_SENTENCES[rng.choice(PII_FILTERED)])
+    return " ".join(sentences)
+
+
+def generate_survey_rows(n_rows: Optional[int] = None, seed: int = 42, duplicate_rate: float = 0.05,
+                         pii_rate: float = 0.1, non_english_rate: float = 0.02,
+                         short_comment_rate: float = 0.05) -> Iterator[Dict[str, Any]]:
+    """Lazily generate realistic synthetic survey rows, with the columns used by `create_dataset`.
+
+    Each comment is built from sentences mentioning the themes in `regex_for_theme.yaml`, where each theme phrase is
+    sampled from the theme's regular expression. The number of sentences per comment is log-normally distributed, so
+    some comments are longer than the 4,000 character threshold of `preprocess_filter_comment_text`. Some comments
+    have PII placeholders, e.g. '[PERSON_NAME]', are not in English, or are short comments, e.g. 'Nothing', that are
+    repeated word for word. The same `seed` always generates the same rows.
+
+    :param n_rows: Default: None. The number of rows to generate. If None, rows are generated without limit.
+    :param seed: Default: 42. The seed of the random number generator.
+    :param duplicate_rate: Default: 0.05. The fraction of rows that are a copy of a recent row, including its
+        `primary_key`, as happens with overlapping survey exports.
+    :param pii_rate: Default: 0.1. The fraction of comments with a PII placeholder.
+    :param non_english_rate: Default: 0.02. The fraction of non-English comments.
+    :param short_comment_rate: Default: 0.05. The fraction of short comments, which are often repeated word for word.
+    :return: An iterator of dictionaries, one per row, with the keys in `SURVEY_COLUMNS`.
+
+    """
+
+    # Initialise a random number generator, the theme regular expressions, the pool of recent rows to duplicate, and
+    # the next primary key
+    rng = random.Random(seed)
+    theme_patterns = list(DICT_THEMES.values())
+    pool, primary_key = [], 0
+
+    # Generate `n_rows` rows, or rows without limit if `n_rows` is None; each row is either a copy of a random recent
+    # row, or a new row with the next primary key
+    for _ in range(n_rows) if n_rows is not None else count():
+        if pool and rng.random() < duplicate_rate:
+            yield dict(rng.choice(pool))
+            continue
+        row = {"primary_key": primary_key, "intents_clientID": rng.randrange(10 ** 9),
+               "session_id": f"{rng.randrange(10 ** 18)}-{rng.randrange(10 ** 9)}",
+               "Q3": _make_comment(rng, theme_patterns, pii_rate, non_english_rate, short_comment_rate)}
+        primary_key += 1
+
+        # Keep the new row in the pool of recent rows, replacing a random row once the pool is full
+        if len(pool) < DUPLICATE_POOL_SIZE:
+            pool.append(row)
+        else:
+            pool[rng.randrange(DUPLICATE_POOL_SIZE)] = row
+        yield dict(row)
+
+
+def write_survey_file(survey_filename: str, n_rows: Optional[int] = None, chunksize: int = 100000,
+                      **kwargs: Any) -> None:
+    """Stream synthetic survey rows to a CSV file, in chunks, so memory use does not grow with the number of rows.
+
+    Each chunk is appended to the CSV file as soon as it is generated, so if `n_rows` is None, the CSV file keeps
+    growing until the process is stopped.
+
+    :param survey_filename: A file path for the CSV file of survey data. This is overwritten if it exists.
+    :param n_rows: Default: None. The number of rows to write. If None, rows are written without limit.
+    :param chunksize: Default: 100000. The number of rows held in memory, and written, at a time.
+    :param kwargs: Keyword arguments passed to `generate_survey_rows`, e.g. `seed`, or `duplicate_rate`.
+    :return: None. Writes a CSV file with the columns in `SURVEY_COLUMNS` to `survey_filename`.
+
+    """
+
+    # Write the header, and then append each chunk of rows without a header
+    pd.DataFrame(columns=SURVEY_COLUMNS).to_csv(survey_filename, index=False)
+    rows = generate_survey_rows(n_rows, **kwargs)
+    for i, chunk in enumerate(iter(lambda: list(islice(rows, chunksize)), [])):
+        pd.DataFrame(chunk, columns=SURVEY_COLUMNS).to_csv(survey_filename, mode="a", header=False, index=False)
+        logger.info(f"Written {i * chunksize + len(chunk)}{'' if n_rows is None else f' of {n_rows}'} rows to: "
+                    f"{survey_filename}")
+
+
+if __name__ == "__main__":
+    # Get environment variables
+    DATA_DIR = os.getenv("DIR_DATA")
+
+    # Set up the logging configuration, keeping the module logger, which already exists
+    log_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logging.conf")
+    logging.config.fileConfig(log_file_path, disable_existing_loggers=False)
+
+    parser = argparse.ArgumentParser(description="Generate synthetic survey data for load testing the feedback tool "
+                                                 "data pipeline.")
+    parser.add_argument("--n-rows", "-n", type=int, default=None,
+                        help="Number of rows of survey data to generate. If not given, rows are generated, and "
+                             "written, until the process is stopped.")
+    parser.add_argument("--filename", "-f", default="synthetic_survey",
+                        help="Survey data filename, without the '.csv' extension, which is saved in /data.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random number generator.")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05,
+                        help="Fraction of rows that are a copy of a recent row, including its primary key.")
+    parser.add_argument("--pii-rate", type=float, default=0.1,
+                        help="Fraction of comments with a personally identifiable information placeholder.")
+    parser.add_argument("--non-english-rate", type=float, default=0.02, help="Fraction of non-English comments.")
+    parser.add_argument("--short-comment-rate", type=float, default=0.05,
+                        help="Fraction of short comments, which are often repeated word for word.")
+    parser.add_argument("--chunksize", type=int, default=100000,
+                        help="Number of rows held in memory, and written, at a time.")
+
+    args = parser.parse_args()
+
+    write_survey_file(os.path.join(DATA_DIR, f"{args.filename}.csv"), args.n_rows, chunksize=args.chunksize,
+                      seed=args.seed, duplicate_rate=args.duplicate_rate, pii_rate=args.pii_rate,
+                      non_english_rate=args.non_english_rate, short_comment_rate=args.short_comment_rate)
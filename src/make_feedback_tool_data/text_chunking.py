@@ -1,17 +1,67 @@
+from functools import lru_cache
 from nltk import RegexpParser
 from src.make_feedback_tool_data.chunk import Chunk
-from typing import List, Optional, Tuple, Union
+from src.make_feedback_tool_data.compiled_chunker import CompiledChunker
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import hashlib
 import logging.config
 import nltk.tree
 import os
+import pickle
 
 # Define a file path to the regular expressions grammar file
 FIlE_GRAMMAR = os.path.join(os.getenv("DIR_SRC_MAKE_FEEDBACK_TOOL_DATA"), "grammar.txt")
 
+# Define the available chunking engines for `ChunkParser`
+CHUNK_ENGINES = ("nltk", "compiled")
+
+# Define a module-level cache of chunking engine objects, keyed by the grammar hash, and the engine name, so that each
+# process only builds each grammar once, however many `ChunkParser` objects it initialises
+_PARSER_CACHE: Dict[Tuple[str, str], Union[RegexpParser, CompiledChunker]] = {}
+
+
+def grammar_hash(grammar: str) -> str:
+    """Hash a grammar string.
+
+    :param grammar: A string of grammar regular expression patterns.
+    :return: The SHA-256 hexadecimal digest of `grammar`.
+
+    """
+    return hashlib.sha256(grammar.encode("utf-8")).hexdigest()
+
+
+def _get_chunking_engine(grammar: str, engine: str) -> Union[RegexpParser, CompiledChunker]:
+    """Get the chunking engine object for a grammar from the module-level cache, building it if it is not cached.
+
+    :param grammar: A string of grammar regular expression patterns.
+    :param engine: The chunking engine, either 'nltk', or 'compiled'.
+    :return: A nltk.RegexpParser object if `engine` is 'nltk', otherwise a `CompiledChunker` object.
+
+    """
+    key = (grammar_hash(grammar), engine)
+    if key not in _PARSER_CACHE:
+        _PARSER_CACHE[key] = RegexpParser(grammar) if engine == "nltk" else CompiledChunker(grammar)
+    return _PARSER_CACHE[key]
+
+
+@lru_cache(maxsize=None)
+def _group_label_pairs(label_pairs: FrozenSet[Tuple[str, str]]) -> Dict[str, FrozenSet[str]]:
+    """Group label pairs by their first label.
+
+    :param label_pairs: A frozenset of two-element tuples of grammar chunk labels.
+    :return: A dictionary where each key is a first label in `label_pairs`, and each value is a frozenset of the
+        second labels paired with it.
+
+    """
+    grouped = {}
+    for first, second in label_pairs:
+        grouped.setdefault(first, set()).add(second)
+    return {k: frozenset(v) for k, v in grouped.items()}
+
 
 class ChunkParser:
 
-    def __init__(self, grammar_filename: Optional[str] = None) -> None:
+    def __init__(self, grammar_filename: Optional[str] = None, engine: str = "nltk") -> None:
         """Helper class to chunk part-of-speech tagged text using grammar regular expressions.
 
         The default grammar regular expressions file is defined by the `FILE_GRAMMAR` variable in
@@ -24,10 +74,21 @@ class ChunkParser:
             usable by the `grammar` argument of the nltk.chunk.regexp.RegexpParser class. For each grammar type,
             each pattern should be listed on a separate line, and in descending order of priority (highest first). If
             None, it will use the default regular expression file.
+        :param engine: Default: 'nltk'. The chunking engine, either 'nltk', or 'compiled'. The 'nltk' engine uses the
+            nltk.chunk.regexp.RegexpParser class, which applies each rule as a regular expression over a string of the
+            POS tags. The 'compiled' engine uses the `src.make_feedback_tool_data.compiled_chunker.CompiledChunker`
+            class, which compiles the grammar once over single-character tags, and gives the same chunks faster; it
+            only supports chunk rules, e.g. '{<DT>?<NN.*>+}'.
+        :raise ValueError: If `engine` is not in `CHUNK_ENGINES`.
 
         """
         self.logger = logging.getLogger(__name__)
 
+        # Check `engine` is valid
+        if engine not in CHUNK_ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'; expected one of: {', '.join(CHUNK_ENGINES)}")
+        self.engine = engine
+
         # If `grammar_filename` is None, use the default file path
         if not grammar_filename:
             grammar_filename = FIlE_GRAMMAR
@@ -35,9 +96,66 @@ class ChunkParser:
         # Load the regular expressions from `grammar_filename`
         self.grammar = self._load_grammar_from_file(grammar_filename)
 
-        # Initialise a nltk.RegexpParser object using `self.grammar`
-        self.logger.info("Initializing parser...")
-        self.parser = RegexpParser(self.grammar)
+        # Get a nltk.RegexpParser object, or a `CompiledChunker` object, for `self.grammar`; this is only built once
+        # per process for each grammar, and engine
+        self.logger.info(f"Initializing parser with the {engine} engine...")
+        self.parser = _get_chunking_engine(self.grammar, engine)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Pickle the grammar, and engine name; the `CompiledChunker` object is also pickled, so it is not compiled
+        # again when unpickled. The nltk.RegexpParser object is rebuilt from the grammar instead
+        return {"grammar": self.grammar, "engine": self.engine,
+                "parser": self.parser if self.engine == "compiled" else None}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # Restore the grammar, and engine name, and get the chunking engine object from the module-level cache; if a
+        # pickled `CompiledChunker` object is not already cached, add it to the cache
+        self.logger = logging.getLogger(__name__)
+        self.grammar, self.engine = state["grammar"], state["engine"]
+        if state["parser"] is not None:
+            _PARSER_CACHE.setdefault((grammar_hash(self.grammar), self.engine), state["parser"])
+        self.parser = _get_chunking_engine(self.grammar, self.engine)
+
+    @classmethod
+    def from_cache(cls, path: str, grammar_filename: Optional[str] = None, engine: str = "nltk") -> "ChunkParser":
+        """Load a `ChunkParser` object from a cache file, or create one, and save it to the cache file.
+
+        The cache file is a pickled `ChunkParser` object. It is only used if its grammar, and engine, are the same as
+        `grammar_filename`, and `engine`; otherwise, a new `ChunkParser` object is created, and overwrites the cache
+        file. For the 'compiled' engine, the compiled grammar is stored in the cache file, so it is reused across runs;
+        for the 'nltk' engine, only the grammar is stored. Only load cache files from a trusted source.
+
+        :param path: A file path to the cache file. This is created if it does not exist.
+        :param grammar_filename: Default: None. A path string to file containing regular expression grammar patterns.
+            If None, it will use the default regular expression file. See `ChunkParser` for further details.
+        :param engine: Default: 'nltk'. The chunking engine, either 'nltk', or 'compiled'. See `ChunkParser` for
+            further details.
+        :return: A `ChunkParser` object for `grammar_filename`, and `engine`.
+
+        """
+        logger = logging.getLogger(__name__)
+
+        # Read the grammar, and try to load the cached `ChunkParser` object; an unreadable cache file is ignored
+        with open(grammar_filename or FIlE_GRAMMAR, "r") as f:
+            grammar = "".join(f.readlines())
+        if os.path.isfile(path):
+            try:
+                with open(path, "rb") as f:
+                    cached = pickle.load(f)
+                if isinstance(cached, cls) and cached.engine == engine and \
+                        grammar_hash(cached.grammar) == grammar_hash(grammar):
+                    logger.info(f"Loaded parser from cache: {path}")
+                    return cached
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+                logger.warning(f"Ignoring unreadable parser cache {path}: {e}")
+
+        # Otherwise, create a new `ChunkParser` object, and save it to the cache file, replacing any existing file
+        parser = cls(grammar_filename, engine)
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(parser, f)
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"Saved parser to cache: {path}")
+        return parser
 
     def _load_grammar_from_file(self, grammar_filename: str) -> str:
         """Load grammar regular expression patterns from a file.
@@ -117,9 +235,7 @@ class ChunkParser:
                 # Replace the last element of `merged` with a new `Chunk` object that uses the same `label`
                 # attribute, but merges the `tokens` and `indices` attributes of the previous and current `chunk`.
                 # This helps reduce the number of grammar chunks returned, by collapsing identical `label`s together
-                merged[-1] = Chunk(chunk.label,
-                                   merged[-1].tokens + chunk.tokens,
-                                   merged[-1].indices + chunk.indices)
+                merged[-1] = merged[-1].merge(chunk)
             else:
                 merged.append(chunk)
 
@@ -128,6 +244,45 @@ class ChunkParser:
 
         return merged
 
+    def iter_phrase(self, sentences: Iterable[List[Tuple[str, str, str]]], merge_inplace: bool = False) \
+            -> Iterator[List[Chunk]]:
+        """Lazily extract phrases for each grammar chunk of part-of-speech (POS) tagged sentences, one at a time.
+
+        Each sentence is only chunked, and merged, when the next sentence is requested, so only the chunks of one
+        sentence are held at a time. See `ChunkParser.extract_phrase` for further details.
+
+        :param sentences: An iterable of list of tuples, where the inner list represents sentences. The three-element
+            tuples in each sentence list are a token, its POS tag, and its lemma.
+        :param merge_inplace: Default: False. If True, adjacent, identically-labelled grammar `Chunk` objects in each
+            sentence are merged together, unless the are 'prep_noun'. See `ChunkParser._merge_adjacent_chunks` for
+            further information. If False, no merging is performed.
+        :return: An iterator of lists of `Chunk` objects, where each list represents a separate sentence in
+            `sentences`, in order.
+
+        """
+
+        # Iterate over `sentences` and, for each `sentence`, chunk it, and, if `merge_inplace` is True, merge adjacent,
+        # identically-labelled grammar chunks before yielding it
+        for sentence in sentences:
+            chunks = self._chunk_text(sentence)
+            yield self._merge_adjacent_chunks(chunks) if merge_inplace else chunks
+
+    def iter_phrase_pairs(self, sentences: Iterable[List[Tuple[str, str, str]]],
+                          label_pairs: FrozenSet[Tuple[str, str]]) -> Iterator[Tuple[Chunk, Chunk]]:
+        """Lazily get sequential pairs of merged grammar chunks in each sentence, where the pair of labels is allowed.
+
+        Equivalent to `ChunkParser.filter_pairs(ChunkParser.extract_phrase(sentences, merge_inplace=True),
+        label_pairs)`, but each sentence is only chunked once the pairs of the previous sentence have been used.
+
+        :param sentences: An iterable of list of tuples, where the inner list represents sentences. The three-element
+            tuples in each sentence list are a token, its POS tag, and its lemma.
+        :param label_pairs: A frozenset of two-element tuples of the allowed (first, second) grammar chunk labels.
+        :return: An iterator of two-element tuples of sequential, merged `Chunk` objects in the same sentence, whose
+            labels are in `label_pairs`, in order.
+
+        """
+        return self.filter_pairs(self.iter_phrase(sentences, merge_inplace=True), label_pairs)
+
     def extract_phrase(self, sentences: List[List[Tuple[str, str, str]]], merge_inplace: bool = False) \
             -> List[List[Chunk]]:
         """Extract phrases for each grammar chunk of a part-of-speech (POS) tagged sentence.
@@ -143,16 +298,31 @@ class ChunkParser:
 
         """
 
-        # Initialise a storage variable
-        chunks = []
+        return list(self.iter_phrase(sentences, merge_inplace))
 
-        # Iterate over `sentences` and, for each `sentence`, chunk it, and append to `chunks`
-        for sentence in sentences:
-            chunks.append(self._chunk_text(sentence))
-
-        # If `merge_inplace` is True, merge adjacent, identically-labelled grammar chunks. Otherwise, return the
-        # `chunks` unmodified
-        if merge_inplace:
-            return [self._merge_adjacent_chunks(chunk) for chunk in chunks]
-        else:
-            return chunks
+    @staticmethod
+    def filter_pairs(sentences: Iterable[Sequence[Chunk]], label_pairs: FrozenSet[Tuple[str, str]]) \
+            -> Iterator[Tuple[Chunk, Chunk]]:
+        """Lazily get sequential pairs of grammar chunks in each sentence, where the pair of labels is allowed.
+
+        Equivalent to filtering `PreProcess.compute_combinations(sentences, 2)` for pairs whose labels are in
+        `label_pairs`, but pairs are only created if their labels are allowed.
+
+        :param sentences: An iterable of lists of `Chunk` objects, as returned by `ChunkParser.extract_phrase`, or
+            `ChunkParser.iter_phrase`, where each list represents a separate sentence. Each sentence is only read
+            once the pairs of the previous sentence have been used.
+        :param label_pairs: A frozenset of two-element tuples of the allowed (first, second) grammar chunk labels.
+        :return: An iterator of two-element tuples of sequential `Chunk` objects in the same sentence, whose labels
+            are in `label_pairs`, in order.
+
+        """
+
+        # Get the allowed second labels for each first label, which is cached for each `label_pairs`
+        second_labels = _group_label_pairs(label_pairs)
+
+        # Iterate over each sequential pair of chunks in each sentence, only yielding pairs whose labels are allowed
+        for chunks in sentences:
+            for i in range(len(chunks) - 1):
+                allowed = second_labels.get(chunks[i].label)
+                if allowed and chunks[i + 1].label in allowed:
+                    yield chunks[i], chunks[i + 1]
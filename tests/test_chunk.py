@@ -1,13 +1,22 @@
-from src.make_feedback_tool_data.chunk import Chunk
+from src.make_feedback_tool_data.chunk import (
+    Chunk,
+    PENN_TREEBANK_TAGS,
+    POS_TAG_ADJECTIVE,
+    POS_TAG_CARDINAL,
+    POS_TAG_FLAGS,
+    POS_TAG_NOUN,
+    POS_TAG_VERB
+)
 import inspect
 import pytest
+import re
 
 
-# Compile a list of the attribute, and instance method names in the `Chunk` class
-args_chunk_member_names = ["text", "lemma", "tagable_words", "important_word", "important_lemma"]
+# Compile a list of the property, and instance method names in the `Chunk` class
+args_chunk_member_names = ["text", "lemma", "tagable_words", "important_word", "important_lemma", "span", "merge"]
 
 # Define a list of method names in `Chunk`
-args_chunk_method_names = ["tagable_words"]
+args_chunk_method_names = ["tagable_words", "merge"]
 
 
 @pytest.mark.parametrize("test_method_name", args_chunk_method_names)
@@ -19,8 +28,9 @@ def test_methods_in_members(test_method_name):
 def test_chunk_has_members():
     """Test that Chunk has all the member objects in args_chunk_member_names."""
 
-    # Get the member objects of the `Chunk` class
-    test_output = [m[0] for m in inspect.getmembers(Chunk, inspect.isroutine) if not m[0].startswith("__")]
+    # Get the member objects of the `Chunk` class, excluding slots
+    test_output = [m[0] for m in inspect.getmembers(Chunk, lambda m: inspect.isroutine(m) or isinstance(m, property))
+                   if not m[0].startswith("_")]
 
     # Assert that all the member objects exist
     assert set(test_output) == set(args_chunk_member_names)
@@ -36,9 +46,21 @@ args_inputs = [
      [5, 6, 7, 8, 9])
 ]
 
-# Define the instance methods of `Chunk` that are called when `Chunk` is initialised; this is all of
-# `args_chunk_member_names` excluding those in `args_chunk_method_names`
-args_init_call_members = [a for a in args_chunk_member_names if a not in args_chunk_method_names]
+# Define the properties of `Chunk` that are computed lazily; this is all of `args_chunk_member_names` excluding those
+# in `args_chunk_method_names`
+args_lazy_members = [a for a in args_chunk_member_names if a not in args_chunk_method_names]
+
+
+class IterationCountingList(list):
+    """A list that counts the number of times it is iterated over."""
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.iterations = 0
+
+    def __iter__(self):
+        self.iterations += 1
+        return super().__iter__()
 
 
 @pytest.mark.parametrize("test_input_label, test_input_tokens, test_input_indices", args_inputs)
@@ -53,18 +75,25 @@ class TestChunkInitialisation:
         except Exception as e:
             pytest.fail(f"Raised exception {type(e)}:\n{str(e)}")
 
-    @pytest.mark.parametrize("test_attribute", args_init_call_members)
-    def test_calls_attributes(self, mocker, test_input_label, test_input_tokens, test_input_indices, test_attribute):
-        """Test that Chunk, when initialised, calls various attributes."""
+    def test_has_no_instance_dict(self, test_input_label, test_input_tokens, test_input_indices):
+        """Test that Chunk uses slots, and so has no instance __dict__."""
+        assert not hasattr(Chunk(test_input_label, test_input_tokens, test_input_indices), "__dict__")
 
-        # Patch the attribute of the `Chunk` class object
-        patch_member = mocker.patch.object(Chunk, test_attribute)
+    @pytest.mark.parametrize("test_attribute", args_lazy_members)
+    def test_computes_attributes_once_when_accessed(self, test_input_label, test_input_tokens,
+                                                    test_input_indices, test_attribute):
+        """Test that Chunk does not iterate over its tokens until a property is accessed, and then only once."""
 
-        # Invoke the `Chunk` class
-        _ = Chunk(test_input_label, test_input_tokens, test_input_indices)
+        # Initialise a `Chunk` object with tokens that count how many times they are iterated over, and assert they
+        # are not iterated over
+        test_input_tokens = IterationCountingList(test_input_tokens)
+        test_object = Chunk(test_input_label, test_input_tokens, test_input_indices)
+        assert test_input_tokens.iterations == 0
 
-        # Assert that `test_attribute` has been called once correctly with no arguments
-        patch_member.assert_called_once_with()
+        # Access `test_attribute` twice, and assert the tokens are only iterated over once
+        _ = getattr(test_object, test_attribute)
+        _ = getattr(test_object, test_attribute)
+        assert test_input_tokens.iterations == 1
 
 
 # Define the expected `text` attribute output for `args_input`
@@ -82,10 +111,15 @@ test_expected_important_word = ["Signed", "advice", "ongoing COVID 19 outbreak"]
 # Define the expected `important_lemma` attribute output for `args_input`
 test_expected_important_lemma = ["sign", "advice", "ongoing COVID 19 outbreak"]
 
-# Zip the member object names with their respective expected outputs
+# Define the expected `span` attribute output for `args_input`; the tokens have no character offsets
+test_expected_span = [None, None, None]
+
+# Zip the member object names with their respective expected outputs; `merge` is last in `args_chunk_member_names`,
+# so is excluded, and tested by `test_merge_returns_correctly` instead
 test_member_object_expected = zip(args_chunk_member_names,
                                   [test_expected_text, test_expected_lemma, test_expected_tagable_words,
-                                   test_expected_important_word, test_expected_important_lemma])
+                                   test_expected_important_word, test_expected_important_lemma,
+                                   test_expected_span])
 
 # Populate the test cases for the `test_member_returns_correctly` pytest - this will be a five-element tuple. The
 # first element is the member of the `Chunk` class, the second- to fourth-elements will be the input arguments (label,
@@ -102,8 +136,84 @@ def test_member_returns_correctly(test_obj_member, test_input_label, test_input_
     # Initialise a Chunk object
     test_object = Chunk(test_input_label, test_input_tokens, test_input_indices)
 
-    # Check if `test_obj_member` is a method; if so call the method and check it, otherwise check the attribute
+    # Check if `test_obj_member` is a method; if so call the method and check it, otherwise check the property
     if test_obj_member in args_chunk_method_names:
         assert getattr(test_object, test_obj_member)() == test_expected
     else:
         assert getattr(test_object, test_obj_member) == test_expected
+
+
+# Test cases for the `test_span_returns_correctly` pytest; the original sentence is 'Signed up for advice due to the
+# ongoing COVID 19 outbreak', and each token has its character offset in the sentence as a fourth element
+args_span_returns_correctly = [
+    ([("Signed", "VBN", "sign", 0), ("up", "RP", "up", 7), ("for", "IN", "for", 10)], (0, 13)),
+    ([("advice", "NN", "advice", 14)], (14, 20)),
+    ([("the", "DT", "the", 28), ("COVID", "NNP", "COVID", 40), ("outbreak", "NN", "outbreak", 49)], (28, 57)),
+    ([("Signed", "VBN", "sign", 0), ("up", "RP", "up")], None),
+    ([], None)
+]
+
+
+@pytest.mark.parametrize("test_input_tokens, test_expected", args_span_returns_correctly)
+def test_span_returns_correctly(test_input_tokens, test_expected):
+    """Test the span attribute returns the character span of the tokens, or None if any have no character offset."""
+    assert Chunk("label", test_input_tokens, list(range(len(test_input_tokens)))).span == test_expected
+
+
+# Test cases for the `test_merge_returns_correctly` pytest; each is a pair of token lists for the chunks to merge,
+# including tokens without important words, and tokens with, and without, character offsets
+args_merge_tokens = [
+    ([("Signed", "VBN", "sign"), ("up", "RP", "up")], [("for", "IN", "for")]),
+    ([("for", "IN", "for")], [("advice", "NN", "advice")]),
+    ([("advice", "NN", "advice")], [("for", "IN", "for")]),
+    ([("Signed", "VBN", "sign", 0), ("up", "RP", "up", 7)], [("for", "IN", "for", 10)]),
+    ([("Signed", "VBN", "sign", 0)], [("up", "RP", "up")])
+]
+
+
+@pytest.mark.parametrize("test_input_left_tokens, test_input_right_tokens", args_merge_tokens)
+@pytest.mark.parametrize("test_input_computed", [False, True])
+def test_merge_returns_correctly(test_input_left_tokens, test_input_right_tokens, test_input_computed):
+    """Test the merge method returns the same chunk, and properties, as a chunk of the combined tokens."""
+
+    # Initialise the chunks to merge; the right-hand indices follow on from the left-hand indices
+    test_input_left = Chunk("verb", test_input_left_tokens, list(range(len(test_input_left_tokens))))
+    test_input_right = Chunk("noun", test_input_right_tokens,
+                             list(range(len(test_input_left_tokens),
+                                        len(test_input_left_tokens) + len(test_input_right_tokens))))
+
+    # If `test_input_computed` is True, compute the properties of both chunks before merging them
+    if test_input_computed:
+        for chunk in (test_input_left, test_input_right):
+            _ = [getattr(chunk, m) for m in args_lazy_members]
+
+    # Define the expected chunk as a chunk of the combined tokens, and indices, with the left-hand label
+    test_expected = Chunk("verb", test_input_left_tokens + test_input_right_tokens,
+                          test_input_left.indices + test_input_right.indices)
+
+    # Merge the chunks, and assert the chunk, and all its properties, are as expected
+    test_output = test_input_left.merge(test_input_right)
+    assert test_output == test_expected
+    for test_member in args_lazy_members:
+        assert getattr(test_output, test_member) == getattr(test_expected, test_member)
+
+
+@pytest.mark.parametrize("test_input", [*PENN_TREEBANK_TAGS, "NNX", "FOO", ""])
+def test_pos_tag_flags_matches_regular_expressions(test_input):
+    """Test the POS_TAG_FLAGS lookup table gives the same classes as searching for the class substrings in the tag."""
+
+    # Define the expected class flags, using a regular expression search for each class
+    test_expected = {POS_TAG_NOUN: bool(re.search("NN", test_input)), POS_TAG_VERB: bool(re.search("VB", test_input)),
+                     POS_TAG_ADJECTIVE: bool(re.search("JJ", test_input)),
+                     POS_TAG_CARDINAL: bool(re.search("CD", test_input))}
+
+    # Assert each class flag is set in the lookup table as expected
+    assert {f: bool(POS_TAG_FLAGS[test_input] & f) for f in test_expected} == test_expected
+
+
+def test_pos_tag_flags_is_read_only():
+    """Test the POS_TAG_FLAGS lookup table cannot be modified, and does not grow with tags outside the table."""
+    with pytest.raises(TypeError):
+        POS_TAG_FLAGS["NN"] = 0
+    _ = POS_TAG_FLAGS["FOO"]
+    assert "FOO" not in POS_TAG_FLAGS
@@ -0,0 +1,74 @@
+from nltk import RegexpParser
+from src.make_feedback_tool_data.chunk import PENN_TREEBANK_TAGS
+from src.make_feedback_tool_data.compiled_chunker import CompiledChunker
+from src.make_feedback_tool_data.text_chunking import FIlE_GRAMMAR
+import pytest
+import random
+
+# Load the `FIlE_GRAMMAR` file
+with open(FIlE_GRAMMAR, "r") as f:
+    file_grammar_regex_patterns = "".join(f.readlines())
+
+# Define the grammars for the `test_parse_same_as_regexpparser` pytest; the third grammar has a rule that can chunk
+# over a chunk from an earlier stage, and a tag pattern matching no tags
+args_grammars = [
+    file_grammar_regex_patterns,
+    "pronoun:\n{<DT><IN><PRP>}\n{<IN>?<PRP>}\nnoun_verb:\n{<IN>?<JJ.*>*<NN.*>+<HYPH>?<VBD|VBN|VBG><NN.*>*}",
+    "verb:\n  {<VB.*>}  # a comment\n\nprep_noun:\n{<IN><CD><.*>}\n{<ZZ>}\nrb:\n{<RB>+}\n"
+    "punct:\n{<-RRB->|<-LRB->|<,>|<.>}"
+]
+
+# Define the POS tags used to generate sentences for the `test_parse_same_as_regexpparser` pytest; mostly common tags,
+# but also all the Penn Treebank tags, and a tag outside the Penn Treebank
+args_common_tags = ["NN", "NNS", "NNP", "VB", "VBD", "VBN", "VBG", "IN", "TO", "DT", "JJ", "PRP", "PRP$", "RB", "CD",
+                    "CC", "MD", "RP", "WRB", "WP", ",", ".", "HYPH", "EX", "POS", "PDT", "WDT", "-LRB-", "-RRB-"]
+args_all_tags = [*PENN_TREEBANK_TAGS, "FOO"]
+
+
+def make_sentence(rng: random.Random) -> list:
+    """Make a random POS tagged sentence, with one (token, tag, lemma) tuple per token."""
+    return [(f"word{i}", rng.choice(args_common_tags if rng.random() < 0.9 else args_all_tags), f"lemma{i}")
+            for i in range(rng.randint(1, 25))]
+
+
+@pytest.mark.parametrize("test_input_grammar", args_grammars)
+def test_parse_same_as_regexpparser(test_input_grammar):
+    """Test that CompiledChunker.parse returns the same trees as nltk.RegexpParser.parse."""
+
+    # Initialise both parsers, and generate random sentences
+    rng = random.Random(42)
+    test_input = [make_sentence(rng) for _ in range(500)]
+    test_expected_parser = RegexpParser(test_input_grammar)
+    test_output_parser = CompiledChunker(test_input_grammar)
+
+    # Assert each sentence is chunked in the same way
+    for sentence in test_input:
+        assert test_output_parser.parse(sentence) == test_expected_parser.parse(sentence)
+
+
+def test_parse_empty_sentence_returns_empty_tree():
+    """Test that CompiledChunker.parse returns an empty tree for an empty sentence."""
+    assert CompiledChunker(file_grammar_regex_patterns).parse([]) == RegexpParser(file_grammar_regex_patterns).parse([])
+
+
+def test_parse_chunks_over_earlier_chunks():
+    """Test that CompiledChunker.parse chunks over a chunk from an earlier stage in the same way as RegexpParser."""
+    test_input = [("in", "IN", "in"), ("5", "CD", "5"), ("going", "VBG", "go")]
+    test_output = CompiledChunker(args_grammars[2]).parse(test_input)
+    assert test_output == RegexpParser(args_grammars[2]).parse(test_input)
+    assert test_output[0].label() == "prep_noun" and test_output[0][2].label() == "verb"
+
+
+def test_parse_recompiles_for_new_tags():
+    """Test that CompiledChunker.parse chunks a tag not seen before, when a tag pattern matches it."""
+    test_input_parser = CompiledChunker("noun:\n{<NN.*>+}")
+    assert test_input_parser.parse([("a", "NNX", "a"), ("b", "NN", "b")]) == \
+        RegexpParser("noun:\n{<NN.*>+}").parse([("a", "NNX", "a"), ("b", "NN", "b")])
+
+
+@pytest.mark.parametrize("test_input_grammar", ["{<NN>}", "noun:\n}<NN>{", "noun:\n<DT>{}<NN>", "noun:\n{<NN>{2}}",
+                                                "noun:\n{<NN>.}"])
+def test_raises_for_unsupported_grammar(test_input_grammar):
+    """Test that CompiledChunker raises a ValueError for rules without a stage, or rules that are not supported."""
+    with pytest.raises(ValueError):
+        _ = CompiledChunker(test_input_grammar)
@@ -1,21 +1,37 @@
-from ast import literal_eval
 from datetime import timedelta
 from faker import Faker
 from src.make_feedback_tool_data.make_data_for_feedback_tool import (
+    PHRASE_MENTION_LABEL_PAIRS,
+    POS_TAG_ARROW_TYPE,
+    VECTORISE_PII_MIN_ROWS,
     create_dataset,
     create_phrase_level_columns,
     drop_duplicate_rows,
+    drop_processed_rows,
     extract_phrase_mentions,
+    is_valid_checkpoint,
+    load_intermediate_df,
     preprocess_filter_comment_text,
     save_intermediate_df
 )
-from src.make_feedback_tool_data.preprocess import PreProcess
+from src.make_feedback_tool_data import make_data_for_feedback_tool
+from src.make_feedback_tool_data.preprocess import FIND_NEEDLE_ENGINES, PreProcess
+from src.make_feedback_tool_data.primary_key_store import PrimaryKeyStore
+from src.make_feedback_tool_data.stage_profiler import StageProfiler
+from src.make_feedback_tool_data.text_chunking import ChunkParser
 from pandas.testing import assert_frame_equal
+from typing import Any, List, Optional, Tuple
+import glob
+import json
 import numpy as np
+import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 import random
 import re
+import tracemalloc
 
 # Set the random seed
 random.seed(42)
@@ -52,9 +68,9 @@ def patch_preprocess_pii_regex(mocker):
 
 
 @pytest.fixture
-def patch_preprocess_detect_language(mocker):
-    """Patch the detect_language method of the PreProcess class"""
-    return mocker.patch.object(PreProcess, "detect_language")
+def patch_preprocess_detect_language_batch(mocker):
+    """Patch the detect_language_batch method of the PreProcess class, so that every text is in English."""
+    return mocker.patch.object(PreProcess, "detect_language_batch", side_effect=lambda x: ["en"] * len(x))
 
 
 @pytest.mark.parametrize("test_input_threshold", [*range(60, 110, 10)])
@@ -63,8 +79,9 @@ class TestPreProcessFilterCommentText:
     def test_returns_correctly(self, patch_preprocess_pii_regex, test_input_threshold):
         """Test that the preprocess_filter_comment_text function returns the correct output."""
 
-        # Define the expected output
-        test_expected = DF_EXAMPLE_PRE_PROCESSED.query(f"Q3_pii_removed.str.len() < {test_input_threshold}")
+        # Define the expected output; the `language` column is categorical
+        test_expected = DF_EXAMPLE_PRE_PROCESSED.query(f"Q3_pii_removed.str.len() < {test_input_threshold}") \
+            .astype({"language": "category"})
 
         # Call the `preprocess_filter_comment_text` function
         test_output = preprocess_filter_comment_text(DF_EXAMPLE_RAW, test_input_threshold)
@@ -72,8 +89,38 @@ class TestPreProcessFilterCommentText:
         # Assert the same columns exist in both
         assert set(test_output.columns) == set(test_expected.columns)
 
-        # Assert the output is as expected
-        assert_frame_equal(test_output, test_expected)
+        # Assert the output is as expected; the categories of the `language` column also include the languages of the
+        # filtered out rows, so only the values are compared
+        assert_frame_equal(test_output, test_expected, check_categorical=False)
+
+    def test_vectorised_returns_correctly(self, mocker, patch_preprocess_pii_regex, test_input_threshold):
+        """Test the vectorised PII removal path returns the same output, without calling replace_pii_regex."""
+
+        # Patch the `replace_pii_regex_batch` method of the `PreProcess` class with `EXAMPLE_PII_REGEX`
+        patch_batch = mocker.patch.object(PreProcess, "replace_pii_regex_batch",
+                                          side_effect=lambda s: s.str.replace(EXAMPLE_PII_REGEX, "", regex=True))
+
+        # Call the `preprocess_filter_comment_text` function with, and without, the vectorised path
+        test_output = preprocess_filter_comment_text(DF_EXAMPLE_RAW, test_input_threshold, vectorise_min_rows=0)
+        patch_batch.assert_called_once()
+        patch_preprocess_pii_regex.assert_not_called()
+
+        # Assert the output is the same as the per-row path
+        assert_frame_equal(test_output, preprocess_filter_comment_text(DF_EXAMPLE_RAW, test_input_threshold))
+
+    @pytest.mark.parametrize("test_input_n_rows", [VECTORISE_PII_MIN_ROWS - 1, VECTORISE_PII_MIN_ROWS])
+    def test_drops_missing_text(self, patch_preprocess_detect_language_batch, test_input_threshold,
+                                test_input_n_rows):
+        """Test rows with missing text are dropped either side of the vectorised PII removal threshold."""
+
+        # Define a pandas DataFrame with `test_input_n_rows` rows, where every third row has missing text
+        test_input = pd.DataFrame({"primary_key": range(test_input_n_rows),
+                                   "Q3": [np.nan if i % 3 == 0 else f"Comment {i}" for i in range(test_input_n_rows)]})
+
+        # Call the `preprocess_filter_comment_text` function, and assert only the rows without missing text remain
+        test_output = preprocess_filter_comment_text(test_input, test_input_threshold)
+        assert_frame_equal(test_output[["primary_key", "Q3"]], test_input.dropna(subset=["Q3"]))
+        assert test_output["Q3_pii_removed"].tolist() == test_output["Q3"].tolist()
 
     def test_preprocess_replace_pii_regex_call_count(self, patch_preprocess_pii_regex, test_input_threshold):
         """Test that preprocess_filter_comment_text calls PreProcess.replace_pii_regex the correct number of times."""
@@ -94,25 +141,10 @@ class TestPreProcessFilterCommentText:
         # Assert that `PreProcess.replace_pii_regex` is called with the correct arguments
         assert patch_preprocess_pii_regex.call_args_list == [mocker.call(v) for v in DF_EXAMPLE_RAW["Q3"]]
 
-    def test_preprocess_detect_language_call_count(self, patch_preprocess_pii_regex, patch_preprocess_detect_language,
-                                                   test_input_threshold):
-        """Test that preprocess_filter_comment_text calls PreProcess.detect_language the correct number of times."""
-
-        # Call the `preprocess_filter_comment_text` function
-        _ = preprocess_filter_comment_text(DF_EXAMPLE_RAW, test_input_threshold)
-
-        # Get the expected call count
-        test_expected = DF_EXAMPLE_RAW \
-            .assign(Q3_pii_removed=DF_EXAMPLE_RAW["Q3"].str.replace(EXAMPLE_PII_REGEX, "")) \
-            .query(f"Q3_pii_removed.str.len() < {test_input_threshold}") \
-            .shape[0]
-
-        # Assert that `PreProcess.replace_pii_regex` is called the correct number of times
-        assert patch_preprocess_detect_language.call_count == test_expected
-
-    def test_preprocess_detect_language_called_correctly(self, mocker, patch_preprocess_pii_regex,
-                                                         patch_preprocess_detect_language, test_input_threshold):
-        """Test that preprocess_filter_comment_text calls PreProcess.detect_language with the correct arguments."""
+    def test_preprocess_detect_language_batch_called_correctly(self, patch_preprocess_pii_regex,
+                                                               patch_preprocess_detect_language_batch,
+                                                               test_input_threshold):
+        """Test that preprocess_filter_comment_text calls PreProcess.detect_language_batch once correctly."""
 
         # Call the `preprocess_filter_comment_text` function
         _ = preprocess_filter_comment_text(DF_EXAMPLE_RAW, test_input_threshold)
@@ -124,8 +156,9 @@ class TestPreProcessFilterCommentText:
             .Q3_pii_removed \
             .to_list()
 
-        # Assert that `PreProcess.detect_language` is called with the correct arguments
-        assert patch_preprocess_detect_language.call_args_list == [mocker.call(v) for v in text_expected_values]
+        # Assert that `PreProcess.detect_language_batch` is called once with the correct arguments
+        patch_preprocess_detect_language_batch.assert_called_once()
+        assert patch_preprocess_detect_language_batch.call_args[0][0].to_list() == text_expected_values
 
 
 # Define input arguments for the `TestSaveIntermediateDf` test class; the first text is 'I am going to go and test to
@@ -205,32 +238,53 @@ def temp_folder(tmpdir_factory):
     return tmpdir_factory.mktemp("temp")
 
 
-@pytest.mark.parametrize("test_input_cache_pos_filename", ["foo.csv", "bar.csv"])
+@pytest.fixture
+def patch_pyarrow_parquet_write_table(mocker):
+    """Patch the pyarrow.parquet.write_table function."""
+    return mocker.patch("src.make_feedback_tool_data.make_data_for_feedback_tool.pq.write_table")
+
+
+@pytest.mark.parametrize("test_input_cache_pos_filename", ["foo.parquet", "bar.parquet"])
 class TestSaveIntermediateDf:
 
     @pytest.mark.parametrize("test_input_df", [a[0] for a in args_save_intermediate_df])
-    def test_calls_to_csv_correctly(self, patch_pandas_dataframe_to_csv, test_input_df, test_input_cache_pos_filename):
-        """Test save_intermediate_df calls pandas.DataFrame.to_csv correctly."""
+    def test_calls_write_table_correctly(self, patch_pyarrow_parquet_write_table, test_input_df,
+                                         test_input_cache_pos_filename):
+        """Test save_intermediate_df calls pyarrow.parquet.write_table correctly."""
 
         # Call the `save_intermediate_df` function
         save_intermediate_df(test_input_df, test_input_cache_pos_filename)
 
-        # Assert `pandas.DataFrame.to_csv` is called with the correct arguments
-        patch_pandas_dataframe_to_csv.assert_called_once_with(test_input_cache_pos_filename, index=False)
+        # Assert `pyarrow.parquet.write_table` is called once with the correct file path
+        patch_pyarrow_parquet_write_table.assert_called_once()
+        assert patch_pyarrow_parquet_write_table.call_args[0][1] == test_input_cache_pos_filename
+
+    @pytest.mark.parametrize("test_input_df", [a[0] for a in args_save_intermediate_df])
+    def test_stores_nested_columns_natively(self, temp_folder, test_input_df, test_input_cache_pos_filename):
+        """Test save_intermediate_df stores the nested columns as Arrow list and struct types, not strings."""
+
+        # Define the file path for the checkpoint, and call the `save_intermediate_df` function
+        test_input_file_path = temp_folder.join(test_input_cache_pos_filename)
+        save_intermediate_df(test_input_df, test_input_file_path)
+
+        # Assert the nested columns in the checkpoint have the expected Arrow types
+        test_output_schema = pq.read_schema(str(test_input_file_path))
+        assert test_output_schema.field("pos_tag").type == POS_TAG_ARROW_TYPE
+        assert test_output_schema.field("lemmas").type == pa.list_(pa.string())
+        assert test_output_schema.field("words").type == pa.list_(pa.string())
 
     @pytest.mark.parametrize("test_input_df, test_expected_df", args_save_intermediate_df)
     def test_returns_correctly(self, temp_folder, test_input_df, test_input_cache_pos_filename, test_expected_df):
-        """Test the outputted CSV from save_intermediate_df is correct."""
+        """Test the checkpoint from save_intermediate_df is read back correctly by load_intermediate_df."""
 
-        # Define the file path for the CSV
+        # Define the file path for the checkpoint
         test_input_file_path = temp_folder.join(test_input_cache_pos_filename)
 
         # Call the `save_intermediate_df` function
         save_intermediate_df(test_input_df, test_input_file_path)
 
-        # Assert the CSV output is correct; need to apply `ast.literal_eval` element-wise, as the CSV will contain
-        # strings of the lists, rather than the lists themselves
-        assert_frame_equal(pd.read_csv(test_input_file_path).applymap(literal_eval), test_expected_df)
+        # Assert the checkpoint is read back correctly, including the POS tags as lists of tuples
+        assert_frame_equal(load_intermediate_df(test_input_file_path), test_expected_df)
 
 
 # Define the example feedback that would result in `args_save_intermediate_df_inputs`
@@ -253,16 +307,38 @@ args_extract_phrase_mentions_integration = [
 
 
 @pytest.fixture
-def patch_chunkparser_extract_phrase(mocker):
-    """Patch both the ChunkParser class, and its extract_phrase method, but only return the latter."""
+def patch_chunkparser_iter_phrase_pairs(mocker):
+    """Patch both the ChunkParser class, and its iter_phrase_pairs method, but only return the latter."""
     patch_chunkparser = mocker.patch("src.make_feedback_tool_data.make_data_for_feedback_tool.ChunkParser")
-    return patch_chunkparser.return_value.extract_phrase
+    return patch_chunkparser.return_value.iter_phrase_pairs
 
 
-@pytest.fixture
-def patch_preprocess(mocker):
-    """Patch the PreProcess class."""
-    return mocker.patch("src.make_feedback_tool_data.make_data_for_feedback_tool.PreProcess")
+@pytest.mark.parametrize("test_input_n_jobs", [2, 3, -1])
+def test_extract_phrase_mentions_n_jobs_returns_same_as_serial(test_input_n_jobs):
+    """Test extract_phrase_mentions returns the same output in the same order, whatever the value of n_jobs."""
+
+    # Combine all the example inputs, so that there is more than one row per process
+    test_input = pd.concat([*args_extract_phrase_mentions_integration] * 2, ignore_index=True)
+
+    # Assert the parallel output is the same as the serial output
+    assert_frame_equal(extract_phrase_mentions(test_input, n_jobs=test_input_n_jobs),
+                       extract_phrase_mentions(test_input))
+
+
+def test_extract_phrase_mentions_extracts_distinct_rows_once(mocker):
+    """Test extract_phrase_mentions only extracts phrase mentions once for each distinct row, in order."""
+
+    # Combine all the example inputs twice, so that each row is duplicated
+    test_input = pd.concat([*args_extract_phrase_mentions_integration] * 2, ignore_index=True)
+
+    # Spy on the `_extract_comment_phrase_mentions` function, and call `extract_phrase_mentions`
+    spy_extract = mocker.spy(make_data_for_feedback_tool, "_extract_comment_phrase_mentions")
+    test_output = extract_phrase_mentions(test_input)
+
+    # Assert only the distinct rows are extracted, and the output is the same as extracting each input separately
+    assert spy_extract.call_count == len(args_extract_phrase_mentions_integration)
+    assert_frame_equal(test_output, pd.concat([extract_phrase_mentions(d) for d in
+                                               args_extract_phrase_mentions_integration] * 2, ignore_index=True))
 
 
 @pytest.mark.parametrize("test_input_df", args_extract_phrase_mentions_integration)
@@ -281,37 +357,59 @@ class TestExtractPhraseMentionsIntegration:
         # Assert `ChunkParser` is called once with the correct arguments
         patch_chunkparser.assert_called_once_with(test_input_grammar_filename)
 
-    def test_calls_extract_phrase(self, mocker, patch_chunkparser_extract_phrase, test_input_df,
-                                  test_input_grammar_filename):
-        """Test extract_phrase_mentions calls ChunkParser.extract_phrase correctly."""
+    def test_calls_iter_phrase_pairs(self, mocker, patch_chunkparser_iter_phrase_pairs, test_input_df,
+                                     test_input_grammar_filename):
+        """Test extract_phrase_mentions calls ChunkParser.iter_phrase_pairs correctly."""
 
         # Call the `extract_phrase_mentions` function
         _ = extract_phrase_mentions(test_input_df, test_input_grammar_filename)
 
-        # Assert `ChunkParser.extract_phrase` is called the correct number of times
-        assert patch_chunkparser_extract_phrase.call_count == len(test_input_df)
+        # Assert `ChunkParser.iter_phrase_pairs` is called the correct number of times
+        assert patch_chunkparser_iter_phrase_pairs.call_count == len(test_input_df)
 
-        # Assert `ChunkParser.extract_phrase` is called with the correct arguments
+        # Assert `ChunkParser.iter_phrase_pairs` is called with the correct arguments, and the default label pairs
         for v in test_input_df["pos_tag"].values:
-            assert patch_chunkparser_extract_phrase.call_args_list == [mocker.call(v, merge_inplace=True)]
+            assert patch_chunkparser_iter_phrase_pairs.call_args_list == [mocker.call(v, PHRASE_MENTION_LABEL_PAIRS)]
 
-    def test_calls_preprocess_compute_combinations_correctly(self, mocker, patch_chunkparser_extract_phrase,
-                                                             patch_preprocess, test_input_df,
-                                                             test_input_grammar_filename):
-        """Test extract_phrase_mentions calls PreProcess.compute_combinations correctly."""
 
-        # Call the `extract_phrase_mentions` function
-        _ = extract_phrase_mentions(test_input_df, test_input_grammar_filename)
+@pytest.mark.parametrize("test_input_n_jobs", [1, 2])
+def test_extract_phrase_mentions_label_pairs_returns_correctly(test_input_n_jobs):
+    """Test extract_phrase_mentions only extracts phrase mentions with label pairs in label_pairs."""
 
-        # Assert `PreProcess.compute_combinations` is called the correct number of times
-        assert patch_preprocess.compute_combinations.call_count == len(test_input_df)
+    # Combine all the example inputs, and define the label pairs to extract
+    test_input = pd.concat(args_extract_phrase_mentions_integration, ignore_index=True)
+    test_input_label_pairs = frozenset({("verb", "noun")})
+
+    # Define the expected output, which is the default output filtered for `test_input_label_pairs`
+    test_expected = extract_phrase_mentions(test_input)
+    test_expected["themed_phrase_mentions"] = test_expected["themed_phrase_mentions"].map(
+        lambda x: [m for m in x if m["key"] in test_input_label_pairs]
+    )
+
+    # Assert the output is as expected, and at least one phrase mention is removed
+    test_output = extract_phrase_mentions(test_input, n_jobs=test_input_n_jobs, label_pairs=test_input_label_pairs)
+    assert_frame_equal(test_output, test_expected)
+    assert test_output["themed_phrase_mentions"].map(len).sum() < \
+        extract_phrase_mentions(test_input)["themed_phrase_mentions"].map(len).sum()
 
-        # Define the expected call argument for each iteration - this will be the return value from calling
-        # `ChunkParser.extract_phrase`
-        test_expected = [mocker.call(patch_chunkparser_extract_phrase.return_value, 2)]
 
-        # Assert `ChunkParser.extract_phrase` is called with the correct arguments
-        assert patch_preprocess.compute_combinations.call_args_list == test_expected * len(test_input_df)
+@pytest.mark.parametrize("test_input_n_jobs", [1, 2])
+def test_extract_phrase_mentions_parser_returns_correctly(mocker, test_input_n_jobs):
+    """Test extract_phrase_mentions uses parser, if given, instead of initialising a ChunkParser class."""
+
+    # Combine all the example inputs, and initialise a compiled chunk parser
+    test_input = pd.concat(args_extract_phrase_mentions_integration, ignore_index=True)
+    test_input_parser = ChunkParser(engine="compiled")
+    test_expected = extract_phrase_mentions(test_input)
+
+    # Patch the `ChunkParser` class, and call the `extract_phrase_mentions` function with `test_input_parser`
+    patch_chunkparser = mocker.patch("src.make_feedback_tool_data.make_data_for_feedback_tool.ChunkParser")
+    test_output = extract_phrase_mentions(test_input, "hello.txt", n_jobs=test_input_n_jobs,
+                                          parser=test_input_parser)
+
+    # Assert `ChunkParser` is not called, and the output is the same as using the default chunk parser
+    patch_chunkparser.assert_not_called()
+    assert_frame_equal(test_output, test_expected)
 
 
 # Define the expected call arguments for `regex_group_verbs`
@@ -436,8 +534,8 @@ class TestExtractPhraseMentionsIntegrationComboSection:
         # Assert that the `PreProcess.find_needle` method is called the correct number of times
         assert patch_find_needle.call_count == len(test_expected)
 
-        # Assert the call arguments for the `PreProcess.find_needle` method are correct
-        assert patch_find_needle.call_args_list == [mocker.call(*e) for e in test_expected]
+        # Assert the call arguments for the `PreProcess.find_needle` method are correct, using the default engine
+        assert patch_find_needle.call_args_list == [mocker.call(*e, engine="difflib") for e in test_expected]
 
 
 # Define the expected values of the `test_extract_phrase_mentions_returns_correctly` test
@@ -535,6 +633,148 @@ def test_function_returns_correctly(test_func, test_input, test_expected):
     assert_frame_equal(test_func(test_input), test_expected)
 
 
+@pytest.mark.parametrize("test_input_processed_keys, test_expected_primary_keys", [
+    ([], [0, 1, 1, 2]),
+    ([1], [0, 2]),
+    ([3, "a"], [0, 1, 1, 2]),
+    ([0, 1, 2], []),
+])
+def test_drop_processed_rows_returns_correctly(test_input_processed_keys, test_expected_primary_keys):
+    """Test drop_processed_rows drops only rows whose primary key is in the store, and resets the index."""
+    test_input = pd.DataFrame({"primary_key": [0, 1, 1, 2], "Q3": ["a", "b", "c", "d"]})
+    with PrimaryKeyStore() as test_processed_keys:
+        test_processed_keys.add_many(test_input_processed_keys)
+        test_output = drop_processed_rows(test_input, test_processed_keys)
+    assert test_output["primary_key"].tolist() == test_expected_primary_keys
+    assert test_output.index.tolist() == list(range(len(test_expected_primary_keys)))
+
+
+@pytest.mark.parametrize("test_input_primary_keys, test_input_processed_keys, test_expected_primary_keys", [
+    ([0.0, 1.0, np.nan, 2.0], ["0", "1", None], [2.0]),
+    (["0", "1", None, "2"], [0, 1.0, np.nan], ["2"]),
+    ([0, 1, 1, 2], ["1", "2.5"], [0, 2]),
+    (["a", "1", "1.5"], [1.5, "a"], ["1"]),
+])
+def test_drop_processed_rows_matches_keys_across_data_types(test_input_primary_keys, test_input_processed_keys,
+                                                            test_expected_primary_keys):
+    """Test drop_processed_rows matches primary keys processed by a previous run, even if the primary keys were read
+    as a different data type, and treats all missing primary keys as the same primary key."""
+    test_input = pd.DataFrame({"primary_key": test_input_primary_keys})
+    with PrimaryKeyStore() as test_processed_keys:
+        test_processed_keys.add_many(test_input_processed_keys)
+        test_output = drop_processed_rows(test_input, test_processed_keys)
+    assert test_output["primary_key"].tolist() == test_expected_primary_keys
+
+
+def add_char_offsets(text: str, pos_tag: List[List[Tuple[str, str, str]]]) -> List[List[Tuple[Any, ...]]]:
+    """Add the character offset of each token in `text` as a fourth element of its POS tag."""
+
+    # Initialise a storage variable, and search for each token after the end of the previous one
+    position = 0
+    out = []
+    for sentence in pos_tag:
+        out.append([])
+        for token in sentence:
+            position = text.find(token[0], position)
+            out[-1].append((*token, position))
+            position += len(token[0])
+    return out
+
+
+# Define the test cases for the `test_extract_phrase_mentions_char_offsets_returns_correctly` test, where the POS tags
+# have character offsets in the `Q3_pii_removed` column; the expected outputs are the same as fuzzy matching
+args_extract_phrase_mentions_char_offsets_returns_correctly = [
+    (i.assign(Q3_pii_removed=i["Q3_edit"], pos_tag=[add_char_offsets(t, p) for t, p in zip(i["Q3_edit"],
+                                                                                           i["pos_tag"])]), e)
+    for i, e in zip(args_extract_phrase_mentions_integration, args_extract_phrase_mentions_returns_correctly_expected)
+]
+
+
+@pytest.mark.parametrize("test_input, test_expected", args_extract_phrase_mentions_char_offsets_returns_correctly)
+def test_extract_phrase_mentions_char_offsets_returns_correctly(mocker, test_input, test_expected):
+    """Test extract_phrase_mentions slices exact phrases using character offsets, without fuzzy matching."""
+
+    # Patch the `PreProcess.find_needle` method, and assert the output is the same as fuzzy matching
+    patch_find_needle = mocker.patch.object(PreProcess, "find_needle")
+    assert_frame_equal(extract_phrase_mentions(test_input), test_input.assign(themed_phrase_mentions=test_expected))
+    patch_find_needle.assert_not_called()
+
+
+def test_extract_phrase_mentions_char_offsets_falls_back_to_find_needle(mocker):
+    """Test extract_phrase_mentions fuzzy matches exact phrases if there is no tagged text for the character offsets."""
+
+    # Get a test case with character offsets, and drop the `Q3_pii_removed` column
+    test_input, test_expected = args_extract_phrase_mentions_char_offsets_returns_correctly[0]
+    test_input = test_input.drop(columns="Q3_pii_removed")
+
+    # Spy on the `PreProcess.find_needle` method, and assert the output is still the same
+    spy_find_needle = mocker.spy(PreProcess, "find_needle")
+    assert_frame_equal(extract_phrase_mentions(test_input), test_input.assign(themed_phrase_mentions=test_expected))
+    assert spy_find_needle.call_count > 0
+
+
+def test_extract_phrase_mentions_char_offsets_with_pii_placeholder():
+    """Test extract_phrase_mentions returns exact phrases found in the comment, if a PII placeholder inside a phrase
+    was removed from the tagged text, so its character offsets do not match the comment."""
+
+    # Define a comment with a PII placeholder, its tagged text with the placeholder removed, and the POS tags of the
+    # tagged text with character offsets
+    test_tagged_text = "I want to apply for  renewal urgently."
+    test_pos_tag = [[("I", "PRP", "-PRON-"), ("want", "VBP", "want"), ("to", "TO", "to"), ("apply", "VB", "apply"),
+                     ("for", "IN", "for"), ("renewal", "NN", "renewal"), ("urgently", "RB", "urgently"),
+                     (".", ".", ".")]]
+    test_input = pd.DataFrame({"Q3_edit": ["I want to apply for PASSPORT renewal urgently."],
+                               "pos_tag": [add_char_offsets(test_tagged_text, test_pos_tag)],
+                               "Q3_pii_removed": [test_tagged_text]})
+
+    # Assert there are phrase mentions, and each exact phrase is in the comment
+    test_output = extract_phrase_mentions(test_input)["themed_phrase_mentions"].iloc[0]
+    assert test_output
+    for phrase_mention in test_output:
+        assert " ".join(phrase_mention["exact_phrase"]) in test_input["Q3_edit"].iloc[0].lower()
+
+
+@pytest.mark.parametrize("test_input_needle_engine", FIND_NEEDLE_ENGINES)
+def test_extract_phrase_mentions_uses_needle_engine(mocker, test_input_needle_engine):
+    """Test extract_phrase_mentions fuzzy matches exact phrases with the needle engine, in the main process, and in
+    each worker process."""
+    test_input = pd.concat(args_extract_phrase_mentions_integration, ignore_index=True)
+
+    # Spy on the `PreProcess.find_needle` method, and assert every call uses the needle engine
+    spy_find_needle = mocker.spy(PreProcess, "find_needle")
+    test_output = extract_phrase_mentions(test_input, needle_engine=test_input_needle_engine)
+    assert spy_find_needle.call_count > 0
+    assert all(c.kwargs["engine"] == test_input_needle_engine for c in spy_find_needle.call_args_list)
+
+    # Set up a worker process in this process, so its calls can be spied on, and assert it uses the same needle engine
+    spy_find_needle.reset_mock()
+    make_data_for_feedback_tool._init_phrase_mentions_worker(ChunkParser(), PHRASE_MENTION_LABEL_PAIRS,
+                                                             test_input_needle_engine)
+    test_rows = test_input[["Q3_edit", "pos_tag"]].assign(Q3_pii_removed=None).values
+    assert make_data_for_feedback_tool._extract_shard_phrase_mentions(test_rows) == \
+        test_output["themed_phrase_mentions"].tolist()
+    assert all(c.kwargs["engine"] == test_input_needle_engine for c in spy_find_needle.call_args_list)
+    make_data_for_feedback_tool._init_phrase_mentions_worker(None, PHRASE_MENTION_LABEL_PAIRS)
+
+
+def test_extract_phrase_mentions_raises_for_unknown_needle_engine():
+    """Test extract_phrase_mentions raises a ValueError for an unknown needle engine."""
+    with pytest.raises(ValueError):
+        extract_phrase_mentions(args_extract_phrase_mentions_integration[0], needle_engine="unknown")
+
+
+def test_save_intermediate_df_char_offsets_round_trip(temp_folder):
+    """Test POS tags with character offsets are restored as four-element tuples from the checkpoint."""
+
+    # Add character offsets to the POS tags of the last test case, and save it to a checkpoint
+    test_input = args_extract_phrase_mentions_char_offsets_returns_correctly[-1][0]
+    test_cache_pos_filename = temp_folder.join("char_offsets.parquet")
+    save_intermediate_df(test_input, test_cache_pos_filename)
+
+    # Assert the POS tags loaded from the checkpoint are the same as the input
+    assert load_intermediate_df(test_cache_pos_filename)["pos_tag"].to_list() == test_input["pos_tag"].to_list()
+
+
 # TODO: amend test cases for `create_dataset` to also test the regular expressions processing in the function
 
 # Set the Faker seed, and instantiate a Faker class sent to GB domain
@@ -763,8 +1003,9 @@ def resource_create_dataset_integration(mocker, temp_survey_file, temp_cache_pos
 
     # Define a list of function names from `src.make_feedback_tool_data.make_data_for_feedback_tool` that need to be
     # patched
-    patch_function_names = ["drop_duplicate_rows", "preprocess_filter_comment_text", "PreProcess.part_of_speech_tag",
-                            "extract_phrase_mentions", "create_phrase_level_columns"]
+    patch_function_names = ["drop_duplicate_rows", "preprocess_filter_comment_text",
+                            "PreProcess.part_of_speech_tag_batch", "extract_phrase_mentions",
+                            "create_phrase_level_columns"]
 
     # Initialise a storing variable
     patch_dict = {}
@@ -782,10 +1023,17 @@ def resource_create_dataset_integration(mocker, temp_survey_file, temp_cache_pos
             "patch_pandas_dataframe_to_csv": patch_pandas_dataframe_to_csv, **patch_dict}
 
 
+def create_checkpoint_df(survey_filename: str) -> pd.DataFrame:
+    """Create a pandas DataFrame with the columns required to resume `create_dataset` from a checkpoint."""
+    df = pd.read_csv(survey_filename).drop_duplicates(subset=["primary_key"]).reset_index(drop=True)
+    return df.assign(Q3_pii_removed=df["Q3"], language="en", is_en=True, pos_tag=[[]] * len(df),
+                     Q3_edit=df["Q3"].fillna(""))
+
+
 # Define test file names for the `TestCreateDataset` test class
 args_create_dataset_integration_filenames = [
-    ("hello.csv", "world.csv", "hello_world.csv"),
-    ("foo.csv", "bar.csv", "foobar.csv")
+    ("hello.csv", "world.parquet", "hello_world.csv"),
+    ("foo.csv", "bar.parquet", "foobar.csv")
 ]
 
 
@@ -803,7 +1051,7 @@ class TestCreateDataset:
 
         # Assert `pandas.read_csv` is called once with the correct arguments
         resource_create_dataset_integration["patch_pandas_read_csv"].assert_called_once_with(
-            resource_create_dataset_integration["temp_survey_file"]
+            resource_create_dataset_integration["temp_survey_file"], dtype={"primary_key": str}
         )
 
     def test_drop_duplicate_rows_called_once_correctly(self, resource_create_dataset_integration):
@@ -827,8 +1075,8 @@ class TestCreateDataset:
         assert len(test_output_args) == 1
         assert not test_output_kwargs
 
-        # Assert the argument is as expected
-        assert_frame_equal(test_output_args[0], EXAMPLE_SURVEY_DF)
+        # Assert the argument is as expected, with the primary keys read as strings
+        assert_frame_equal(test_output_args[0], EXAMPLE_SURVEY_DF.astype({"primary_key": str}))
 
     def test_preprocess_filter_comment_text_called_once_correctly(self, resource_create_dataset_integration):
         """Test preprocess_filter_comment_text is called once by create_dataset correctly."""
@@ -843,31 +1091,120 @@ class TestCreateDataset:
             resource_create_dataset_integration["patch_drop_duplicate_rows"].return_value
         )
 
-    def test_preprocess_part_of_speech_tag_called_correctly(self, mocker, resource_create_dataset_integration):
-        """Test PreProcess.part_of_speech_tag method is called by create_dataset correctly."""
+    def test_preprocess_part_of_speech_tag_batch_called_once_correctly(self, resource_create_dataset_integration):
+        """Test PreProcess.part_of_speech_tag_batch method is called once by create_dataset correctly."""
 
         # Set the return value of the `preprocess_filter_comment_text` patch
         resource_create_dataset_integration["patch_preprocess_filter_comment_text"].return_value = \
             preprocess_filter_comment_text(drop_duplicate_rows(EXAMPLE_SURVEY_DF.copy(deep=True)))
 
+        # Define the function patch under test, and set its return value to an empty list of POS tags per row
+        test_function_patch = resource_create_dataset_integration["patch_preprocess_part_of_speech_tag_batch"]
+        test_function_patch.return_value = [[]] * len(EXAMPLE_SURVEY_POST_PREPROCESS_DF)
+
         # Call the `create_dataset` function using the default grammar file
         create_dataset(resource_create_dataset_integration["temp_survey_file"], None,
                        resource_create_dataset_integration["temp_cache_pos_file"],
                        resource_create_dataset_integration["temp_output_file"])
 
-        # Define the function patch under test
-        test_function_patch = resource_create_dataset_integration["patch_preprocess_part_of_speech_tag"]
+        # Assert that the `PreProcess.part_of_speech_tag_batch` method was called once
+        test_function_patch.assert_called_once()
+
+        # Get the call arguments from the first and only call
+        test_output_args, test_output_kwargs = test_function_patch.call_args_list[0]
+
+        # Assert the texts passed are the PII-removed English comments, and the batching keyword arguments are the
+        # `create_dataset` defaults
+        assert test_output_args[0].to_list() == \
+            EXAMPLE_SURVEY_POST_PREPROCESS_DF.query("is_en")["Q3_pii_removed"].to_list()
+        assert test_output_kwargs == {"batch_size": 1000, "n_process": 1, "profile": "pos", "char_offsets": False}
+
+    def test_part_of_speech_tag_batch_tags_distinct_texts_once(self, resource_create_dataset_integration):
+        """Test create_dataset only tags each distinct text once, and broadcasts the POS tags back to all rows."""
+
+        # Set the return value of the `preprocess_filter_comment_text` patch to have every comment twice
+        test_partial_output = preprocess_filter_comment_text(drop_duplicate_rows(EXAMPLE_SURVEY_DF.copy(deep=True)))
+        test_partial_output = pd.concat([test_partial_output] * 2, ignore_index=True)
+        resource_create_dataset_integration["patch_preprocess_filter_comment_text"].return_value = test_partial_output
 
-        # Assert that the `PreProcess.part_of_speech_tag` method was called the correct number of times
-        assert test_function_patch.call_count == len(EXAMPLE_SURVEY_POST_PREPROCESS_DF.query("is_en"))
+        # Set a side effect of the `PreProcess.part_of_speech_tag_batch` method to return its input texts
+        test_function_patch = resource_create_dataset_integration["patch_preprocess_part_of_speech_tag_batch"]
+        test_function_patch.side_effect = lambda x, **kwargs: x.to_list()
 
-        # Define the expected call arguments of the `PreProcess.part_of_speech_tag` method
-        test_expected_call_args_list = [
-            mocker.call(v) for v in EXAMPLE_SURVEY_POST_PREPROCESS_DF.query("is_en")["Q3_pii_removed"].values
-        ]
+        # Call the `create_dataset` function using the default grammar file
+        create_dataset(resource_create_dataset_integration["temp_survey_file"], None,
+                       resource_create_dataset_integration["temp_cache_pos_file"],
+                       resource_create_dataset_integration["temp_output_file"])
+
+        # Assert the distinct texts are tagged once, and every row gets the POS tags of its text
+        test_expected = test_partial_output["Q3_pii_removed"].where(test_partial_output["is_en"], "")
+        assert test_function_patch.call_args[0][0].to_list() == test_expected.drop_duplicates().to_list()
+        test_output = resource_create_dataset_integration["patch_extract_phrase_mentions"].call_args[0][0]
+        assert test_output["pos_tag"].to_list() == test_expected.to_list()
 
-        # Assert that the `PreProcess.part_of_speech_tag` method was called correctly
-        assert test_function_patch.call_args_list == test_expected_call_args_list
+    def test_pos_tag_cache_used_if_pos_cache_filename(self, mocker, temp_folder, resource_create_dataset_integration):
+        """Test create_dataset tags using PosTagCache, rather than PreProcess, if pos_cache_filename is given."""
+
+        # Set the return value of the `preprocess_filter_comment_text` patch
+        resource_create_dataset_integration["patch_preprocess_filter_comment_text"].return_value = \
+            preprocess_filter_comment_text(drop_duplicate_rows(EXAMPLE_SURVEY_DF.copy(deep=True)))
+
+        # Patch the `PosTagCache` class, and set the return value of its `part_of_speech_tag_batch` method
+        patch_pos_tag_cache = mocker.patch("src.make_feedback_tool_data.make_data_for_feedback_tool.PosTagCache")
+        test_cache = patch_pos_tag_cache.return_value.__enter__.return_value
+        test_cache.part_of_speech_tag_batch.return_value = [[]] * len(EXAMPLE_SURVEY_POST_PREPROCESS_DF)
+
+        # Call the `create_dataset` function using the default grammar file, and a POS tag cache
+        test_pos_cache_filename = temp_folder.join("pos_tag_cache.sqlite")
+        create_dataset(resource_create_dataset_integration["temp_survey_file"], None,
+                       resource_create_dataset_integration["temp_cache_pos_file"],
+                       resource_create_dataset_integration["temp_output_file"],
+                       pos_cache_filename=test_pos_cache_filename)
+
+        # Assert the cache is opened with the default spaCy profile, without character offsets, and used instead of
+        # `PreProcess`
+        patch_pos_tag_cache.assert_called_once_with(test_pos_cache_filename, "pos", False)
+        test_cache.part_of_speech_tag_batch.assert_called_once()
+        resource_create_dataset_integration["patch_preprocess_part_of_speech_tag_batch"].assert_not_called()
+
+        # Assert the texts passed are the PII-removed English comments
+        test_output_args, test_output_kwargs = test_cache.part_of_speech_tag_batch.call_args_list[0]
+        assert test_output_args[0].to_list() == \
+            EXAMPLE_SURVEY_POST_PREPROCESS_DF.query("is_en")["Q3_pii_removed"].to_list()
+        assert test_output_kwargs == {"batch_size": 1000, "n_process": 1}
+
+    def test_resume_from_cache_skips_preprocessing(self, resource_create_dataset_integration):
+        """Test create_dataset resumes from a valid checkpoint, skipping the steps up to part-of-speech tagging."""
+
+        # Save a valid checkpoint for the survey file, using the unpatched `save_intermediate_df` function
+        test_checkpoint_df = create_checkpoint_df(resource_create_dataset_integration["temp_survey_file"])
+        save_intermediate_df(test_checkpoint_df, resource_create_dataset_integration["temp_cache_pos_file"])
+
+        # Call the `create_dataset` function using the default grammar file, resuming from the checkpoint
+        create_dataset(resource_create_dataset_integration["temp_survey_file"], None,
+                       resource_create_dataset_integration["temp_cache_pos_file"],
+                       resource_create_dataset_integration["temp_output_file"], resume_from_cache=True)
+
+        # Assert the de-duplication, pre-processing, and tagging steps are skipped
+        for n in ["drop_duplicate_rows", "preprocess_filter_comment_text", "preprocess_part_of_speech_tag_batch"]:
+            resource_create_dataset_integration[f"patch_{n}"].assert_not_called()
+
+        # Assert `extract_phrase_mentions` is called once with the checkpoint data
+        test_function_patch = resource_create_dataset_integration["patch_extract_phrase_mentions"]
+        test_function_patch.assert_called_once()
+        assert_frame_equal(test_function_patch.call_args[0][0], test_checkpoint_df)
+
+    def test_resume_from_cache_without_checkpoint(self, resource_create_dataset_integration):
+        """Test create_dataset processes the survey file from scratch if there is no valid checkpoint to resume."""
+
+        # Call the `create_dataset` function using the default grammar file, resuming from a non-existent checkpoint
+        create_dataset(resource_create_dataset_integration["temp_survey_file"], None,
+                       resource_create_dataset_integration["temp_cache_pos_file"],
+                       resource_create_dataset_integration["temp_output_file"], resume_from_cache=True)
+
+        # Assert the survey file is processed from the start
+        resource_create_dataset_integration["patch_drop_duplicate_rows"].assert_called_once()
+        resource_create_dataset_integration["patch_preprocess_filter_comment_text"].assert_called_once()
 
     def test_extract_phrase_mentions_called_once_correctly(self, resource_create_dataset_integration):
         """Test extract_phrase_mentions is called once by create_dataset correctly."""
@@ -877,8 +1214,9 @@ class TestCreateDataset:
         test_partial_output = preprocess_filter_comment_text(drop_duplicate_rows(EXAMPLE_SURVEY_DF.copy(deep=True)))
         resource_create_dataset_integration["patch_preprocess_filter_comment_text"].return_value = test_partial_output
 
-        # Set a side effect of the `PreProcess.part_of_speech_tag` method
-        resource_create_dataset_integration["patch_preprocess_part_of_speech_tag"].side_effect = lambda x: x
+        # Set a side effect of the `PreProcess.part_of_speech_tag_batch` method
+        resource_create_dataset_integration["patch_preprocess_part_of_speech_tag_batch"].side_effect = \
+            lambda x, **kwargs: x.to_list()
 
         # Call the `create_dataset` function using the default grammar file
         create_dataset(resource_create_dataset_integration["temp_survey_file"], None,
@@ -894,9 +1232,11 @@ class TestCreateDataset:
         # Get the actual call arguments of the first, and only call to `extract_phrase_mentions`
         test_output_args, test_output_kwargs = test_function_patch.call_args_list[0]
 
-        # Assert that there is only two arguments, and no keyword arguments
+        # Assert that there is only two arguments, the `n_jobs` keyword argument is the `create_dataset` default, the
+        # phrase mentions are added in place, and the chunk parser initialised by `create_dataset` is used
         assert len(test_output_args) == 2
-        assert not test_output_kwargs
+        assert isinstance(test_output_kwargs.pop("parser"), ChunkParser)
+        assert test_output_kwargs == {"n_jobs": 1, "inplace": True, "needle_engine": "difflib"}
 
         # Define the expected column `Q3_edit` of the first call argument of the `extract_phrase_mentions` function
         test_expected_q3_edit = test_partial_output["Q3"].replace(np.nan, "") \
@@ -904,7 +1244,7 @@ class TestCreateDataset:
 
         # Define the expected first call argument of the `extract_phrase_mentions` function
         test_expected_arg1 = test_partial_output.assign(
-            pos_tag=test_partial_output["Q3_pii_removed"].where(test_partial_output["is_en"], []),
+            pos_tag=test_partial_output["Q3_pii_removed"].where(test_partial_output["is_en"], ""),
             Q3_edit=test_expected_q3_edit
         )
 
@@ -913,6 +1253,27 @@ class TestCreateDataset:
         assert_frame_equal(test_output_args[0], test_expected_arg1)
         assert test_output_args[1] is None
 
+    @pytest.mark.parametrize("test_input_chunk_engine", ["nltk", "compiled"])
+    def test_parser_cache_used_correctly(self, tmp_path, resource_create_dataset_integration,
+                                         test_input_chunk_engine):
+        """Test create_dataset loads the chunk parser from the parser cache file, and passes it on, if given."""
+
+        # Call the `create_dataset` function with a parser cache file twice, as two separate runs would
+        test_input_cache = str(tmp_path.joinpath("parser.pickle"))
+        for _ in range(2):
+            create_dataset(resource_create_dataset_integration["temp_survey_file"], None,
+                           resource_create_dataset_integration["temp_cache_pos_file"],
+                           resource_create_dataset_integration["temp_output_file"],
+                           chunk_engine=test_input_chunk_engine, parser_cache_filename=test_input_cache)
+
+        # Assert the parser cache file is created, and each call to `extract_phrase_mentions` uses a chunk parser with
+        # the correct engine
+        assert os.path.isfile(test_input_cache)
+        test_function_patch = resource_create_dataset_integration["patch_extract_phrase_mentions"]
+        assert test_function_patch.call_count == 2
+        for _, test_output_kwargs in test_function_patch.call_args_list:
+            assert test_output_kwargs["parser"].engine == test_input_chunk_engine
+
     def test_save_intermediate_df_called_once_correctly(self, resource_create_dataset_integration):
         """Test save_intermediate_df is called once by create_dataset correctly."""
 
@@ -959,3 +1320,372 @@ class TestCreateDataset:
 
         # Get the actual CSV output from `create_dataset`, and assert it is as expected
         assert_frame_equal(pd.read_csv(temp_output_file), EXAMPLE_SURVEY_DF_OUTPUT)
+
+
+# Define the maximum peak memory allocated by `_process_survey_data`, as a multiple of the size of its input
+MAX_PEAK_MEMORY_RATIO = 3
+
+
+def test_process_survey_data_peak_memory_within_bound(mocker):
+    """Test that the peak memory allocated by _process_survey_data is within a bound of its input size."""
+
+    # Scale up `EXAMPLE_SURVEY_DF` with unique primary keys, so that the size of the input outweighs fixed overheads
+    test_input = pd.concat([EXAMPLE_SURVEY_DF] * 500, ignore_index=True)
+    test_input = drop_duplicate_rows(test_input.assign(primary_key=range(len(test_input))))
+    test_input_size = test_input.memory_usage(deep=True).sum()
+
+    # Patch the part-of-speech tagging and language detection, so only the memory allocated by the pipeline is measured
+    mocker.patch.object(PreProcess, "part_of_speech_tag_batch", side_effect=lambda x, **kwargs: [[]] * len(x))
+    mocker.patch.object(PreProcess, "detect_language_batch", side_effect=lambda x: ["en"] * len(x))
+
+    # Trace the memory allocated by Python whilst processing `test_input`; peak process RSS cannot be reset between
+    # tests, so `tracemalloc` is used instead
+    tracemalloc.start()
+    try:
+        _ = make_data_for_feedback_tool._process_survey_data(test_input, None, 1000, 1, "pos", None, 1)
+        _, test_output_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Assert that the peak memory allocated is within `MAX_PEAK_MEMORY_RATIO` times the size of `test_input`
+    assert test_output_peak < MAX_PEAK_MEMORY_RATIO * test_input_size
+
+
+@pytest.fixture
+def temp_checkpoint_files(temp_folder):
+    """Create a test survey file, and a valid checkpoint for it, within a temporary folder."""
+
+    # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file
+    temp_survey_filepath = str(temp_folder.join("survey.csv"))
+    EXAMPLE_SURVEY_DF.copy(deep=True).to_csv(temp_survey_filepath, index=False)
+
+    # Write a checkpoint for the survey file, and make sure it is newer than the survey file
+    temp_checkpoint_filepath = str(temp_folder.join("survey_cache.parquet"))
+    save_intermediate_df(create_checkpoint_df(temp_survey_filepath), temp_checkpoint_filepath)
+    os.utime(temp_checkpoint_filepath, (os.path.getmtime(temp_survey_filepath) + 1, ) * 2)
+
+    return temp_survey_filepath, temp_checkpoint_filepath
+
+
+class TestIsValidCheckpoint:
+
+    def test_valid_checkpoint(self, temp_checkpoint_files):
+        """Test is_valid_checkpoint returns True for a checkpoint saved by save_intermediate_df."""
+        assert is_valid_checkpoint(temp_checkpoint_files[1], temp_checkpoint_files[0])
+
+    def test_missing_checkpoint(self, temp_folder, temp_checkpoint_files):
+        """Test is_valid_checkpoint returns False if the checkpoint does not exist."""
+        assert not is_valid_checkpoint(str(temp_folder.join("missing.parquet")), temp_checkpoint_files[0])
+
+    def test_checkpoint_older_than_survey_file(self, temp_checkpoint_files):
+        """Test is_valid_checkpoint returns False if the survey file has changed since the checkpoint was saved."""
+        os.utime(temp_checkpoint_files[0], (os.path.getmtime(temp_checkpoint_files[1]) + 1, ) * 2)
+        assert not is_valid_checkpoint(temp_checkpoint_files[1], temp_checkpoint_files[0])
+
+    def test_unreadable_checkpoint(self, temp_checkpoint_files):
+        """Test is_valid_checkpoint returns False if the checkpoint is not a Parquet file."""
+        with open(temp_checkpoint_files[1], "w") as f:
+            f.write("primary_key,Q3\n")
+        os.utime(temp_checkpoint_files[1], (os.path.getmtime(temp_checkpoint_files[0]) + 1, ) * 2)
+        assert not is_valid_checkpoint(temp_checkpoint_files[1], temp_checkpoint_files[0])
+
+    def test_chunk_checkpoint_directory(self, temp_checkpoint_files):
+        """Test is_valid_checkpoint returns False for a directory of chunk checkpoints, which cannot be resumed."""
+        os.remove(temp_checkpoint_files[1])
+        os.makedirs(temp_checkpoint_files[1])
+        save_intermediate_df(create_checkpoint_df(temp_checkpoint_files[0]),
+                             os.path.join(temp_checkpoint_files[1], "part-00000.parquet"))
+        os.utime(temp_checkpoint_files[1], (os.path.getmtime(temp_checkpoint_files[0]) + 1, ) * 2)
+        assert not is_valid_checkpoint(temp_checkpoint_files[1], temp_checkpoint_files[0])
+
+    @pytest.mark.parametrize("test_input_column", ["Q3", "is_en", "Q3_edit"])
+    def test_checkpoint_missing_columns(self, temp_checkpoint_files, test_input_column):
+        """Test is_valid_checkpoint returns False if the checkpoint is missing a column needed to resume."""
+        save_intermediate_df(create_checkpoint_df(temp_checkpoint_files[0]).drop(columns=test_input_column),
+                             temp_checkpoint_files[1])
+        os.utime(temp_checkpoint_files[1], (os.path.getmtime(temp_checkpoint_files[0]) + 1, ) * 2)
+        assert not is_valid_checkpoint(temp_checkpoint_files[1], temp_checkpoint_files[0])
+
+
+@pytest.fixture
+def patch_create_dataset_chunked(mocker):
+    """Patch language detection, part-of-speech tagging, and phrase extraction with deterministic functions."""
+    mocker.patch.object(PreProcess, "detect_language", return_value="en")
+    mocker.patch.object(PreProcess, "part_of_speech_tag_batch", side_effect=lambda x, **kwargs: [[]] * len(x))
+    mocker.patch("src.make_feedback_tool_data.make_data_for_feedback_tool.extract_phrase_mentions",
+                 side_effect=lambda df, _, **kwargs: df.assign(themed_phrase_mentions=[
+                     [{"chunked_phrase": ("c", t), "exact_phrase": ("e", t), "generic_phrase": ("g", t),
+                       "key": ("verb", "noun")}] for t in df["Q3_edit"]
+                 ]))
+
+
+@pytest.mark.usefixtures("patch_create_dataset_chunked")
+@pytest.mark.parametrize("test_input_chunksize", [1, 2, 5, 1000])
+class TestCreateDatasetChunked:
+
+    def test_returns_same_output_as_unchunked(self, temp_folder, test_input_chunksize):
+        """Test create_dataset returns the same output whether or not the survey data is processed in chunks."""
+
+        # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file
+        test_survey_file = str(temp_folder.join("survey.csv"))
+        EXAMPLE_SURVEY_DF.copy(deep=True).to_csv(test_survey_file, index=False)
+
+        # Call the `create_dataset` function with, and without, chunks
+        create_dataset(test_survey_file, None, str(temp_folder.join("cache.parquet")),
+                       str(temp_folder.join("output.csv")))
+        create_dataset(test_survey_file, None, str(temp_folder.join("cache_chunked.parquet")),
+                       str(temp_folder.join("output_chunked.csv")), chunksize=test_input_chunksize)
+
+        # Assert the outputs are the same, and duplicate primary keys across chunks are dropped
+        test_output = pd.read_csv(temp_folder.join("output_chunked.csv"))
+        assert_frame_equal(test_output, pd.read_csv(temp_folder.join("output.csv")))
+        assert test_output["primary_key"].is_unique
+
+    def test_returns_same_output_as_unchunked_for_missing_and_mixed_keys(self, temp_folder, test_input_chunksize):
+        """Test create_dataset drops the same duplicate rows with or without chunks, if primary keys are missing, or
+        are read as different data types in different chunks."""
+
+        # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file, with missing primary keys, and primary keys that are
+        # read as integers, floats, or strings, depending on the other primary keys in the same chunk
+        test_survey_file = str(temp_folder.join("survey_keys.csv"))
+        EXAMPLE_SURVEY_DF.assign(primary_key=[1, None, "a", "1", None, 2]).to_csv(test_survey_file, index=False)
+
+        # Call the `create_dataset` function with, and without, chunks
+        create_dataset(test_survey_file, None, str(temp_folder.join("cache_keys.parquet")),
+                       str(temp_folder.join("output_keys.csv")))
+        create_dataset(test_survey_file, None, str(temp_folder.join("cache_keys_chunked.parquet")),
+                       str(temp_folder.join("output_keys_chunked.csv")), chunksize=test_input_chunksize)
+
+        # Assert the outputs are the same, and one row is kept for each primary key, including missing primary keys
+        test_output = pd.read_csv(temp_folder.join("output_keys_chunked.csv"), dtype={"primary_key": str})
+        assert_frame_equal(test_output,
+                           pd.read_csv(temp_folder.join("output_keys.csv"), dtype={"primary_key": str}))
+        assert test_output["primary_key"].tolist() == ["1", np.nan, "a", "2"]
+
+    def test_raises_with_resume_from_cache(self, temp_folder, test_input_chunksize):
+        """Test create_dataset raises a ValueError if resuming from a checkpoint whilst processing in chunks."""
+        with pytest.raises(ValueError):
+            create_dataset(str(temp_folder.join("survey.csv")), None, str(temp_folder.join("cache.parquet")),
+                           str(temp_folder.join("output.csv")), chunksize=test_input_chunksize,
+                           resume_from_cache=True)
+
+    def test_saves_checkpoint_per_chunk(self, temp_folder, test_input_chunksize):
+        """Test create_dataset saves one checkpoint per chunk, which together contain all the de-duplicated rows."""
+
+        # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file, and create an old checkpoint file in its place
+        test_survey_file = str(temp_folder.join("survey.csv"))
+        EXAMPLE_SURVEY_DF.copy(deep=True).to_csv(test_survey_file, index=False)
+        test_cache_pos_file = str(temp_folder.join("cache.parquet"))
+        with open(test_cache_pos_file, "w") as f:
+            f.write("old checkpoint")
+
+        # Call the `create_dataset` function with chunks
+        create_dataset(test_survey_file, None, test_cache_pos_file, str(temp_folder.join("output.csv")),
+                       chunksize=test_input_chunksize)
+
+        # Assert there is one checkpoint per chunk, and the checkpoints contain all the de-duplicated rows
+        test_parts = sorted(os.listdir(test_cache_pos_file))
+        assert len(test_parts) == -(-len(EXAMPLE_SURVEY_DF) // test_input_chunksize)
+        test_output = pd.concat([load_intermediate_df(os.path.join(test_cache_pos_file, p)) for p in test_parts])
+        assert sorted(test_output["primary_key"]) == sorted(EXAMPLE_SURVEY_DF["primary_key"].astype(str).unique())
+
+    @pytest.mark.parametrize("test_input_resume_from_cache", [False, True])
+    def test_replaces_chunk_checkpoints_if_not_chunked(self, temp_folder, test_input_chunksize,
+                                                       test_input_resume_from_cache):
+        """Test create_dataset replaces the directory of chunk checkpoints of a chunked run with a checkpoint file, if
+        a later run with the same checkpoint file path is not chunked, whether or not it resumes from the checkpoint."""
+
+        # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file
+        test_survey_file = str(temp_folder.join("survey_rechunk.csv"))
+        EXAMPLE_SURVEY_DF.copy(deep=True).to_csv(test_survey_file, index=False)
+        test_cache_pos_file = str(temp_folder.join(f"cache_rechunk_{test_input_resume_from_cache}.parquet"))
+
+        # Call the `create_dataset` function with chunks, and then without chunks, with the same checkpoint file path
+        create_dataset(test_survey_file, None, test_cache_pos_file, str(temp_folder.join("output_rechunk.csv")),
+                       chunksize=test_input_chunksize)
+        assert os.path.isdir(test_cache_pos_file)
+        create_dataset(test_survey_file, None, test_cache_pos_file, str(temp_folder.join("output_unchunked.csv")),
+                       resume_from_cache=test_input_resume_from_cache)
+
+        # Assert the checkpoint is now a file, and the outputs are the same
+        assert os.path.isfile(test_cache_pos_file)
+        assert_frame_equal(pd.read_csv(temp_folder.join("output_unchunked.csv")),
+                           pd.read_csv(temp_folder.join("output_rechunk.csv")))
+
+    def test_writes_run_report(self, temp_folder, test_input_chunksize):
+        """Test create_dataset writes a run report next to the output file, with the rows in and out of each stage."""
+
+        # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file
+        test_survey_file = str(temp_folder.join("survey_report.csv"))
+        EXAMPLE_SURVEY_DF.copy(deep=True).to_csv(test_survey_file, index=False)
+
+        # Call the `create_dataset` function with chunks
+        create_dataset(test_survey_file, None, str(temp_folder.join("cache_report.parquet")),
+                       str(temp_folder.join("output_report.csv")), chunksize=test_input_chunksize)
+
+        # Assert the run report is written, with the expected stages, and rows read and de-duplicated
+        with open(temp_folder.join("output_report_run_report.json")) as f:
+            test_output = json.load(f)
+        test_stages = {s["name"]: s for s in test_output["stages"]}
+        assert test_output["chunksize"] == test_input_chunksize
+        assert list(test_stages) == ["initialise_chunk_parser", "read_csv", "drop_duplicate_rows",
+                                     "preprocess_filter_comment_text", "part_of_speech_tag", "pre_process_text",
+                                     "extract_phrase_mentions", "save_intermediate_df", "create_phrase_level_columns",
+                                     "write_csv"]
+        assert test_stages["read_csv"]["rows_out"] == len(EXAMPLE_SURVEY_DF)
+        assert test_stages["drop_duplicate_rows"]["rows_out"] == EXAMPLE_SURVEY_DF["primary_key"].nunique()
+        assert all(s["wall_time"] >= 0 for s in test_output["stages"])
+
+    def test_run_report_failure_is_logged(self, mocker, temp_folder, test_input_chunksize):
+        """Test create_dataset only logs a failure to write the run report, so it never replaces another exception."""
+        patch_write_report = mocker.patch(
+            "src.make_feedback_tool_data.make_data_for_feedback_tool.RunMetrics.write_report",
+            side_effect=RuntimeError("report failed")
+        )
+
+        # Assert an exception raised whilst processing is raised, rather than the run report failure
+        with pytest.raises(FileNotFoundError):
+            create_dataset(str(temp_folder.join("missing_survey.csv")), None,
+                           str(temp_folder.join("cache_missing.parquet")), str(temp_folder.join("output_missing.csv")),
+                           chunksize=test_input_chunksize)
+        patch_write_report.assert_called_once()
+
+        # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file, and assert the output is still written if only the run
+        # report fails
+        test_survey_file = str(temp_folder.join("survey_report_failure.csv"))
+        EXAMPLE_SURVEY_DF.copy(deep=True).to_csv(test_survey_file, index=False)
+        create_dataset(test_survey_file, None, str(temp_folder.join("cache_report_failure.parquet")),
+                       str(temp_folder.join("output_report_failure.csv")), chunksize=test_input_chunksize)
+        assert os.path.isfile(temp_folder.join("output_report_failure.csv"))
+
+    def test_profiles_each_stage(self, temp_folder, test_input_chunksize):
+        """Test create_dataset profiles each stage separately, if a StageProfiler is given."""
+
+        # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file
+        test_survey_file = str(temp_folder.join("survey_profile.csv"))
+        EXAMPLE_SURVEY_DF.copy(deep=True).to_csv(test_survey_file, index=False)
+
+        # Call the `create_dataset` function with chunks, and a `StageProfiler`
+        test_profiler = StageProfiler()
+        create_dataset(test_survey_file, None, str(temp_folder.join("cache_profile.parquet")),
+                       str(temp_folder.join("output_profile.csv")), chunksize=test_input_chunksize,
+                       profiler=test_profiler)
+
+        # Assert each stage in the run report is profiled, and `drop_duplicate_rows` is only called in its own stage
+        with open(temp_folder.join("output_profile_run_report.json")) as f:
+            assert list(test_profiler.profiles) == [s["name"] for s in json.load(f)["stages"]]
+        for name in test_profiler.profiles:
+            assert any(f[2] == "drop_duplicate_rows" for f in test_profiler.function_stats(name)) == \
+                (name == "drop_duplicate_rows")
+
+
+@pytest.mark.parametrize("test_input_chunksize", [None, 2])
+@pytest.mark.parametrize("test_input_needle_engine", FIND_NEEDLE_ENGINES)
+def test_create_dataset_uses_needle_engine(mocker, temp_folder, test_input_chunksize, test_input_needle_engine):
+    """Test create_dataset fuzzy matches exact phrases with the needle engine, end to end."""
+
+    # Patch language detection, and part-of-speech tagging, so every comment is English, and is tagged as the same
+    # sentence
+    test_pos_tag = [[("I", "PRP", "-PRON-"), ("want", "VBP", "want"), ("to", "TO", "to"), ("apply", "VB", "apply"),
+                     ("for", "IN", "for"), ("a", "DT", "a"), ("grant", "NN", "grant"), (".", ".", ".")]]
+    mocker.patch.object(PreProcess, "detect_language", return_value="en")
+    mocker.patch.object(PreProcess, "part_of_speech_tag_batch", side_effect=lambda x, **kwargs: [test_pos_tag] * len(x))
+
+    # Write a copy of `EXAMPLE_SURVEY_DF` to a survey file, and call the `create_dataset` function
+    test_survey_file = str(temp_folder.join("survey_needle.csv"))
+    EXAMPLE_SURVEY_DF.copy(deep=True).to_csv(test_survey_file, index=False)
+    spy_find_needle = mocker.spy(PreProcess, "find_needle")
+    create_dataset(test_survey_file, None, str(temp_folder.join(f"cache_needle_{test_input_chunksize}.parquet")),
+                   str(temp_folder.join("output_needle.csv")), chunksize=test_input_chunksize,
+                   needle_engine=test_input_needle_engine)
+
+    # Assert every exact phrase is fuzzy matched with the needle engine, and the engine is in the run report
+    assert spy_find_needle.call_count > 0
+    assert all(c.kwargs["engine"] == test_input_needle_engine for c in spy_find_needle.call_args_list)
+    with open(temp_folder.join("output_needle_run_report.json")) as f:
+        assert json.load(f)["needle_engine"] == test_input_needle_engine
+
+
+@pytest.mark.usefixtures("patch_create_dataset_chunked")
+@pytest.mark.parametrize("test_input_chunksize", [None, 2, 1000])
+class TestCreateDatasetIncremental:
+
+    @staticmethod
+    def run_incremental(temp_folder: Any, survey_df: pd.DataFrame, chunksize: Optional[int]) -> List[str]:
+        """Run create_dataset incrementally on a survey file of survey_df, and return the sorted partition files."""
+        test_survey_file = str(temp_folder.join("survey.csv"))
+        survey_df.to_csv(test_survey_file, index=False)
+        create_dataset(test_survey_file, None, str(temp_folder.join("cache.parquet")),
+                       str(temp_folder.join("output")), chunksize=chunksize,
+                       manifest_filename=str(temp_folder.join("manifest.sqlite")))
+        return sorted(glob.glob(str(temp_folder.join("output", "part-*.csv"))))
+
+    def test_processes_only_new_rows(self, tmpdir, test_input_chunksize):
+        """Test create_dataset only processes rows not processed by previous runs, saving them to a new partition."""
+
+        # Run incrementally on the first rows, and then all the rows, of `EXAMPLE_SURVEY_DF`
+        test_survey_df = EXAMPLE_SURVEY_DF.copy(deep=True)
+        self.run_incremental(tmpdir, test_survey_df.iloc[:2], test_input_chunksize)
+        test_output = self.run_incremental(tmpdir, test_survey_df, test_input_chunksize)
+
+        # Assert there are two partitions, and together they are the same as the output of a non-incremental run
+        create_dataset(str(tmpdir.join("survey.csv")), None, str(tmpdir.join("cache_all.parquet")),
+                       str(tmpdir.join("output_all.csv")), chunksize=test_input_chunksize)
+        assert len(test_output) == 2
+        assert_frame_equal(pd.concat([pd.read_csv(f) for f in test_output], ignore_index=True),
+                           pd.read_csv(tmpdir.join("output_all.csv")))
+
+        # Assert a run with no new rows saves no partition, and each run writes a run report
+        assert self.run_incremental(tmpdir, test_survey_df, test_input_chunksize) == test_output
+        assert len(glob.glob(str(tmpdir.join("output", "part-*_run_report.json")))) == 3
+        assert not glob.glob(str(tmpdir.join("output", "*.inprogress")))
+
+    @pytest.mark.parametrize("test_input_primary_keys, test_expected_primary_keys", [
+        ([1, 2, 3, None, 4, 5], ["", "4", "5"]),
+        ([1, 2, 3, "a", None, 4], ["a", "", "4"]),
+    ])
+    def test_matches_keys_across_runs_with_different_data_types(self, tmpdir, test_input_chunksize,
+                                                                test_input_primary_keys, test_expected_primary_keys):
+        """Test create_dataset does not process rows again if a later survey file has primary keys that would be
+        inferred as a different data type, e.g. floats once some primary keys are missing, or strings once some
+        primary keys are not numbers."""
+
+        # Run incrementally on survey data with only integer primary keys, and then with the same primary keys, and
+        # new primary keys; the primary keys are written to the survey file without any decimal places
+        self.run_incremental(tmpdir, EXAMPLE_SURVEY_DF.assign(primary_key=[1, 2, 3, 4, 5, 6]).iloc[:3],
+                             test_input_chunksize)
+        test_survey_df = EXAMPLE_SURVEY_DF.assign(primary_key=pd.Series(test_input_primary_keys, dtype=object))
+        test_output = self.run_incremental(tmpdir, test_survey_df, test_input_chunksize)
+
+        # Assert the second partition only has the new rows, and a third run of the same rows processes no rows
+        assert len(test_output) == 2
+        assert pd.read_csv(test_output[1], dtype=str, keep_default_na=False)["primary_key"].tolist() == \
+            test_expected_primary_keys
+        assert self.run_incremental(tmpdir, test_survey_df, test_input_chunksize) == test_output
+
+    def test_failed_run_is_processed_again(self, tmpdir, mocker, test_input_chunksize):
+        """Test create_dataset saves no partition or manifest keys for a failed run, so the next run processes it."""
+
+        # Run incrementally, failing when saving the outputs
+        test_survey_df = EXAMPLE_SURVEY_DF.copy(deep=True)
+        test_patch = mocker.patch(
+            "src.make_feedback_tool_data.make_data_for_feedback_tool.create_phrase_level_columns",
+            side_effect=RuntimeError
+        )
+        with pytest.raises(RuntimeError):
+            self.run_incremental(tmpdir, test_survey_df, test_input_chunksize)
+        with PrimaryKeyStore(str(tmpdir.join("manifest.sqlite"))) as test_manifest:
+            assert len(test_manifest) == 0
+
+        # Assert the next run, which does not fail, processes all the rows
+        test_patch.side_effect = create_phrase_level_columns
+        test_output = self.run_incremental(tmpdir, test_survey_df, test_input_chunksize)
+        assert len(test_output) == 1
+        assert sorted(pd.read_csv(test_output[0])["primary_key"]) == sorted(test_survey_df["primary_key"].unique())
+
+    def test_raises_with_resume_from_cache(self, tmpdir, test_input_chunksize):
+        """Test create_dataset raises a ValueError if run incrementally with resume_from_cache."""
+        with pytest.raises(ValueError):
+            create_dataset(str(tmpdir.join("survey.csv")), None, str(tmpdir.join("cache.parquet")),
+                           str(tmpdir.join("output")), chunksize=test_input_chunksize, resume_from_cache=True,
+                           manifest_filename=str(tmpdir.join("manifest.sqlite")))
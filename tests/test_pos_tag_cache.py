@@ -0,0 +1,119 @@
+from src.make_feedback_tool_data.pos_tag_cache import PosTagCache, package_version
+from src.make_feedback_tool_data.preprocess import PreProcess
+import pytest
+import sys
+
+# Define example texts, including a duplicate and an empty string, for part-of-speech (POS) tagging
+EXAMPLE_TEXTS = ["Hello world.", "This is a test. It has two sentences.", "Hello world.", ""]
+
+
+def fake_part_of_speech_tag_batch(texts, **kwargs):
+    """Create deterministic fake POS tags, with one (text, tag, lemma) tuple per word, for each text."""
+    return [[[(w, "NN", w.lower()) for w in text.split()]] if text else [] for text in texts]
+
+
+@pytest.fixture
+def patch_package_version(mocker):
+    """Patch the package_version function, so the spaCy model, and spaCy, have fixed versions."""
+    test_versions = {"en_core_web_sm": "1.0.0", "spacy": "3.0.0"}
+    patch_function = mocker.patch("src.make_feedback_tool_data.pos_tag_cache.package_version",
+                                  side_effect=lambda p: test_versions[p])
+    patch_function.versions = test_versions
+    return patch_function
+
+
+@pytest.fixture
+def patch_part_of_speech_tag_batch(mocker):
+    """Patch the part_of_speech_tag_batch method of the PreProcess class with fake_part_of_speech_tag_batch."""
+    return mocker.patch.object(PreProcess, "part_of_speech_tag_batch", side_effect=fake_part_of_speech_tag_batch)
+
+
+@pytest.fixture
+def temp_cache_filename(tmp_path):
+    """Create a file path for a temporary POS tag cache."""
+    return str(tmp_path.joinpath("pos_tag_cache.sqlite"))
+
+
+@pytest.mark.usefixtures("patch_package_version")
+class TestPosTagCache:
+
+    def test_returns_correctly(self, patch_part_of_speech_tag_batch, temp_cache_filename):
+        """Test the part_of_speech_tag_batch method returns the same output as PreProcess, in order."""
+        with PosTagCache(temp_cache_filename) as test_cache:
+            assert test_cache.part_of_speech_tag_batch(EXAMPLE_TEXTS) == fake_part_of_speech_tag_batch(EXAMPLE_TEXTS)
+
+    def test_tags_distinct_texts_once(self, patch_part_of_speech_tag_batch, temp_cache_filename):
+        """Test the part_of_speech_tag_batch method only tags each distinct text once."""
+        with PosTagCache(temp_cache_filename) as test_cache:
+            _ = test_cache.part_of_speech_tag_batch(EXAMPLE_TEXTS, batch_size=10, n_process=2)
+
+        # Assert PreProcess.part_of_speech_tag_batch was called once with the distinct texts
+        patch_part_of_speech_tag_batch.assert_called_once()
+        test_output_args, test_output_kwargs = patch_part_of_speech_tag_batch.call_args_list[0]
+        assert list(test_output_args[0]) == list(dict.fromkeys(EXAMPLE_TEXTS))
+        assert test_output_kwargs == {"batch_size": 10, "n_process": 2, "profile": "pos", "char_offsets": False}
+
+    def test_reuses_cache_across_instances(self, patch_part_of_speech_tag_batch, temp_cache_filename):
+        """Test a new PosTagCache instance on the same file only tags texts not already in the cache."""
+        with PosTagCache(temp_cache_filename) as test_cache:
+            _ = test_cache.part_of_speech_tag_batch(EXAMPLE_TEXTS[:2])
+        patch_part_of_speech_tag_batch.reset_mock()
+
+        # Re-open the cache, and assert only the new text is tagged, and cached POS tags are tuples
+        with PosTagCache(temp_cache_filename) as test_cache:
+            test_output = test_cache.part_of_speech_tag_batch(EXAMPLE_TEXTS)
+        assert list(patch_part_of_speech_tag_batch.call_args_list[0][0][0]) == [""]
+        assert test_output == fake_part_of_speech_tag_batch(EXAMPLE_TEXTS)
+
+    def test_cache_hit_does_not_call_preprocess(self, patch_part_of_speech_tag_batch, temp_cache_filename):
+        """Test the part_of_speech_tag_batch method does not tag anything if all texts are cached."""
+        with PosTagCache(temp_cache_filename) as test_cache:
+            _ = test_cache.part_of_speech_tag_batch(EXAMPLE_TEXTS)
+            patch_part_of_speech_tag_batch.reset_mock()
+            _ = test_cache.part_of_speech_tag_batch(EXAMPLE_TEXTS)
+        patch_part_of_speech_tag_batch.assert_not_called()
+
+    @pytest.mark.parametrize("test_input_versions, test_input_profile, test_input_char_offsets", [
+        ({"en_core_web_sm": "2.0.0"}, "pos", False),
+        ({"spacy": "3.1.0"}, "pos", False),
+        ({}, "full", False),
+        ({}, "pos", True)
+    ])
+    def test_model_change_invalidates_cache(self, patch_package_version, patch_part_of_speech_tag_batch,
+                                            temp_cache_filename, test_input_versions, test_input_profile,
+                                            test_input_char_offsets):
+        """Test changing the model or spaCy version, profile, or character offsets flag does not return cached tags."""
+        with PosTagCache(temp_cache_filename) as test_cache:
+            _ = test_cache.part_of_speech_tag_batch(EXAMPLE_TEXTS)
+        patch_part_of_speech_tag_batch.reset_mock()
+
+        # Change the package versions, and re-open the cache with `test_input_profile`, and `test_input_char_offsets`
+        patch_package_version.versions.update(test_input_versions)
+        with PosTagCache(temp_cache_filename, test_input_profile, test_input_char_offsets) as test_cache:
+            _ = test_cache.part_of_speech_tag_batch(EXAMPLE_TEXTS)
+        assert list(patch_part_of_speech_tag_batch.call_args_list[0][0][0]) == list(dict.fromkeys(EXAMPLE_TEXTS))
+
+    def test_model_signature_does_not_load_spacy_model(self, mocker, temp_cache_filename):
+        """Test the model_signature property reads package versions without loading the spaCy model."""
+        patch_spacy_load = mocker.patch("spacy.load")
+        with PosTagCache(temp_cache_filename, "full", True) as test_cache:
+            assert test_cache.model_signature == "en_core_web_sm==1.0.0:spacy==3.0.0:full:offsets"
+        patch_spacy_load.assert_not_called()
+
+    def test_get_many_interns_pos_tags(self, temp_cache_filename):
+        """Test the get_many method returns interned POS tags."""
+        with PosTagCache(temp_cache_filename) as test_cache:
+            test_cache.set_many({"a": [[("Hello", "UH", "hello")]]})
+            assert test_cache.get_many(["a"])["a"][0][0][1] is sys.intern("UH")
+
+    def test_get_many_omits_missing_keys(self, temp_cache_filename):
+        """Test the get_many method only returns keys in the cache."""
+        with PosTagCache(temp_cache_filename) as test_cache:
+            test_cache.set_many({"a": [[("Hello", "UH", "hello")]]})
+            assert test_cache.get_many(["a", "b"]) == {"a": [[("Hello", "UH", "hello")]]}
+
+
+@pytest.mark.parametrize("test_input, test_expected", [("pytest", pytest.__version__), ("not_a_package_xyz", "")])
+def test_package_version_returns_correctly(test_input, test_expected):
+    """Test package_version returns the installed version of a package, or an empty string if not installed."""
+    assert package_version(test_input) == test_expected
@@ -1,5 +1,9 @@
 from src.make_feedback_tool_data.preprocess import PreProcess
-from src.make_feedback_tool_data.preprocess import PII_FILTERED
+from src.make_feedback_tool_data.preprocess import FIND_NEEDLE_ENGINES, LANGUAGE_ERROR, PII_FILTERED, SPACY_PROFILES
+from src.make_feedback_tool_data.preprocess import LANGUAGE_MIN_LETTERS, LANGUAGE_UNDETERMINED
+from src.make_feedback_tool_data.preprocess import load_spacy_model
+from polyglot.detect import Detector
+import pandas as pd
 import pytest
 
 
@@ -102,6 +106,14 @@ args_method_returns_correctly_find_needle = [
      {"told register as a vulnerable person": "told to register as a vulnerable person"})
 ]
 
+# Test cases for the `test_method_returns_correctly` pytest on the `sentence_offsets` static method
+args_method_returns_correctly_sentence_offsets = [
+    ("", [], []),
+    ("This is a single sentence.", ["This is a single sentence."], [0]),
+    ("Hello? World!", ["Hello?", "World!"], [0, 7]),
+    ("One.  Two. One.", ["One.", "Two.", "One."], [0, 6, 11])
+]
+
 # Compile the test cases for the `test_method_returns_correctly` pytest alongside the methods for testing. For each
 # test case, the tuple comprises the `PreProcess` method (first element of the tuple), all the input arguments (at
 # least one element), and the expected argument (last element). This lets the `test_method_returns_correctly` pytest
@@ -114,7 +126,8 @@ args_test_method_returns_correctly = [
     *[(PreProcess.compute_combinations, a[:-1], a[-1]) for a in args_method_returns_correctly_compute_combinations],
     *[(PreProcess.get_user_group, a[:-1], a[-1]) for a in args_method_returns_correctly_get_user_group],
     *[(PreProcess.resolve_function, a[:-1], a[-1]) for a in args_method_returns_correctly_resolve_function],
-    *[(PreProcess.find_needle, a[:-1], a[-1]) for a in args_method_returns_correctly_find_needle]
+    *[(PreProcess.find_needle, a[:-1], a[-1]) for a in args_method_returns_correctly_find_needle],
+    *[(PreProcess.sentence_offsets, a[:-1], a[-1]) for a in args_method_returns_correctly_sentence_offsets]
 ]
 
 
@@ -142,6 +155,91 @@ def test_part_of_speech_tag_calls_split_sentences(mocker, test_input):
     patch_split_sentences.assert_called_once_with(test_input)
 
 
+@pytest.mark.parametrize("test_input_batch_size", [1, 2, 1000])
+def test_part_of_speech_tag_batch_returns_correctly(test_input_batch_size):
+    """Test the part_of_speech_tag_batch class method returns the same output as part_of_speech_tag."""
+
+    # Define the input texts, and the expected outputs
+    test_input = [a[0] for a in args_method_returns_correctly_part_of_speech_tag]
+    test_expected = [a[-1] for a in args_method_returns_correctly_part_of_speech_tag]
+
+    # Assert the batched output is identical to the per-text output
+    assert PreProcess.part_of_speech_tag_batch(test_input, batch_size=test_input_batch_size) == test_expected
+
+
+@pytest.mark.parametrize("test_input", args_part_of_speech_tag_calls_split_sentences)
+def test_part_of_speech_tag_char_offsets_returns_correctly(test_input):
+    """Test the part_of_speech_tag class method adds the character offset of each token in the text, if required."""
+
+    # Get the POS tags with, and without, character offsets, and the batched POS tags with character offsets
+    test_output = PreProcess.part_of_speech_tag(test_input, char_offsets=True)
+    test_expected = PreProcess.part_of_speech_tag(test_input)
+    assert PreProcess.part_of_speech_tag_batch([test_input], char_offsets=True) == [test_output]
+
+    # Assert the first three elements are unchanged, and the fourth element locates the token in `test_input`
+    assert [[t[:3] for t in s] for s in test_output] == test_expected
+    assert all(test_input[t[3]:t[3] + len(t[0])] == t[0] for s in test_output for t in s)
+
+
+def test_part_of_speech_tag_batch_calls_split_sentences(mocker):
+    """Test the part_of_speech_tag_batch class method calls the split_sentences static method for each text."""
+
+    # Patch the `split_sentences` static method
+    patch_split_sentences = mocker.patch.object(PreProcess, "split_sentences", return_value=[])
+
+    # Define the input texts
+    test_input = [a[0] for a in args_method_returns_correctly_part_of_speech_tag]
+
+    # Call the `part_of_speech_tag_batch` class method
+    _ = PreProcess.part_of_speech_tag_batch(test_input)
+
+    # Assert `patch_split_sentences` was called with the correct arguments
+    assert patch_split_sentences.call_args_list == [mocker.call(t) for t in test_input]
+
+
+def test_replace_pii_regex_batch_returns_correctly():
+    """Test the replace_pii_regex_batch static method returns the same output as replace_pii_regex, in order."""
+    test_input = pd.Series([a[0] for a in args_method_returns_correctly_replace_pii_regex])
+    assert PreProcess.replace_pii_regex_batch(test_input).to_list() == \
+        [a[-1] for a in args_method_returns_correctly_replace_pii_regex]
+
+
+def test_load_spacy_model_raises_for_unknown_profile():
+    """Test load_spacy_model raises a ValueError if the profile is not in SPACY_PROFILES."""
+    with pytest.raises(ValueError):
+        load_spacy_model("unknown")
+
+
+@pytest.mark.parametrize("test_input_profile", SPACY_PROFILES)
+def test_load_spacy_model_disables_components(mocker, test_input_profile):
+    """Test load_spacy_model only loads the spaCy pipeline components needed by the profile."""
+
+    # Patch `spacy.load`, and clear any previously loaded models
+    patch_spacy_load = mocker.patch("src.make_feedback_tool_data.preprocess.spacy.load")
+    load_spacy_model.cache_clear()
+
+    # Load the model twice, and assert `spacy.load` is only called once with the disabled components
+    _ = load_spacy_model(test_input_profile)
+    _ = load_spacy_model(test_input_profile)
+    patch_spacy_load.assert_called_once_with("en_core_web_sm", disable=list(SPACY_PROFILES[test_input_profile]))
+
+    # Clear the patched models
+    load_spacy_model.cache_clear()
+
+
+@pytest.mark.parametrize("test_input_engine", FIND_NEEDLE_ENGINES)
+@pytest.mark.parametrize("test_input_needle, test_input_hay, test_expected", args_method_returns_correctly_find_needle)
+def test_find_needle_engine_returns_correctly(test_input_needle, test_input_hay, test_expected, test_input_engine):
+    """Test the find_needle static method returns correctly for each engine."""
+    assert PreProcess.find_needle(test_input_needle, test_input_hay, engine=test_input_engine) == test_expected
+
+
+def test_find_needle_raises_for_unknown_engine():
+    """Test the find_needle static method raises a ValueError if the engine is not in FIND_NEEDLE_ENGINES."""
+    with pytest.raises(ValueError):
+        PreProcess.find_needle("needle", "hay", engine="unknown")
+
+
 # Test cases for the `test_detect_language_returns_error_string` pytest
 args_test_detect_language_returns_error_string = [
     123905234091,
@@ -161,6 +259,49 @@ def test_detect_language_returns_error_string(test_input):
         pytest.fail(f"Raised exception {type(e)}:\n{str(e)}")
 
 
+def test_detect_language_batch_returns_correctly():
+    """Test the detect_language_batch static method returns the same output as detect_language, in order."""
+
+    # Define the input texts, including duplicates, and texts without any letters
+    test_input = [a[0] for a in args_method_returns_correctly_detect_language] * 2 + ["123", "!!!", " "]
+
+    # Assert the batched output is identical to the per-text output
+    assert PreProcess.detect_language_batch(test_input) == [PreProcess.detect_language(t) for t in test_input]
+
+
+def test_detect_language_batch_detects_distinct_texts_with_letters_once(mocker):
+    """Test the detect_language_batch static method only detects each distinct text with letters once."""
+
+    # Spy on the `polyglot` `Detector` class
+    spy_detector = mocker.patch("src.make_feedback_tool_data.preprocess.Detector", wraps=Detector)
+
+    # Call the `detect_language_batch` static method with duplicated texts, and texts without any letters
+    _ = PreProcess.detect_language_batch(["Hello world.", "", "-", "123", "Hello world.", "Bonjour le monde."])
+
+    # Assert `Detector` was only called for the distinct texts with letters
+    assert spy_detector.call_args_list == [mocker.call("Hello world.", quiet=True),
+                                           mocker.call("Bonjour le monde.", quiet=True)]
+
+
+@pytest.mark.parametrize("test_input", ["ok", "no", "n/a", "Yes.", "Hi!", "ok 123"])
+def test_detect_language_batch_returns_undetermined_for_short_texts(mocker, test_input):
+    """Test the detect_language_batch static method returns 'un' for texts with too few letters, without detection."""
+
+    # Patch the `polyglot` `Detector` class
+    patch_detector = mocker.patch("src.make_feedback_tool_data.preprocess.Detector")
+
+    # Assert the text has fewer than `LANGUAGE_MIN_LETTERS` letters, is undetermined, and `Detector` was not called
+    assert sum(c.isalpha() for c in test_input) < LANGUAGE_MIN_LETTERS
+    assert PreProcess.detect_language_batch([test_input]) == [LANGUAGE_UNDETERMINED]
+    patch_detector.assert_not_called()
+
+
+@pytest.mark.parametrize("test_input", [123905234091, None])
+def test_detect_language_batch_returns_error_code(test_input):
+    """Test the detect_language_batch static method returns the error code if an exception is raised."""
+    assert PreProcess.detect_language_batch([test_input]) == [LANGUAGE_ERROR]
+
+
 # Test cases for the `test_resolve_function_calls_get_user_group_correctly` pytest; this is based off the
 # `args_method_returns_correctly_resolve_function` test cases
 args_resolve_function_calls_get_user_group_correctly = [a[0] for a in args_method_returns_correctly_resolve_function]
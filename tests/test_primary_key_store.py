@@ -0,0 +1,96 @@
+from src.make_feedback_tool_data.primary_key_store import MISSING_KEY, PrimaryKeyStore, canonical_keys
+import numpy as np
+import os
+import pandas as pd
+import pytest
+
+# Define example primary keys with duplicates, alongside which keys are the first occurrence
+EXAMPLE_KEYS = [
+    ([1, 2, 2, 3, 1], [True, True, False, True, False]),
+    (["a", "b", "a", "c"], [True, True, False, True]),
+    (pd.Series([10, 20, 30]), [True, True, True]),
+    ([], [])
+]
+
+
+@pytest.mark.parametrize("test_input, test_expected", EXAMPLE_KEYS)
+def test_mark_new_returns_correctly(test_input, test_expected):
+    """Test the mark_new method flags the first occurrence of each key not already in the store."""
+    with PrimaryKeyStore() as test_store:
+        assert test_store.mark_new(test_input).tolist() == test_expected
+        assert len(test_store) == sum(test_expected)
+
+
+@pytest.mark.parametrize("test_input, test_expected", EXAMPLE_KEYS)
+def test_mark_new_drops_keys_seen_in_previous_calls(test_input, test_expected):
+    """Test the mark_new method does not flag keys added in a previous call."""
+    with PrimaryKeyStore() as test_store:
+        _ = test_store.mark_new(test_input)
+        assert not test_store.mark_new(test_input).any()
+
+
+def test_mark_new_more_keys_than_sqlite_variables():
+    """Test the mark_new method works with more keys than can be queried in a single SQLite statement."""
+    with PrimaryKeyStore() as test_store:
+        assert test_store.mark_new(range(0, 5000, 2)).all()
+        assert test_store.mark_new(range(5000)).tolist() == [i % 2 == 1 for i in range(5000)]
+
+
+def test_temporary_store_deleted_on_close():
+    """Test a temporary store is deleted when closed."""
+    with PrimaryKeyStore() as test_store:
+        assert os.path.isfile(test_store.store_filename)
+    assert not os.path.isfile(test_store.store_filename)
+
+
+def test_persistent_store_kept_on_close(tmp_path):
+    """Test a store with a file name is kept when closed, and its keys are available when re-opened."""
+    test_store_filename = str(tmp_path.joinpath("keys.sqlite"))
+    with PrimaryKeyStore(test_store_filename) as test_store:
+        _ = test_store.mark_new([1, 2])
+    with PrimaryKeyStore(test_store_filename) as test_store:
+        assert test_store.mark_new([2, 3]).tolist() == [False, True]
+
+
+@pytest.mark.parametrize("test_input, test_expected", [
+    ([1, 1.0, "1", np.int64(1), np.float64(1.0)], ["1"] * 5),
+    ([1.5, "a", "1.0"], ["1.5", "a", "1.0"]),
+    ([np.nan, None, pd.NA, float("nan")], [MISSING_KEY] * 4),
+])
+def test_canonical_keys_returns_correctly(test_input, test_expected):
+    """Test canonical_keys returns the same string for the same key, whatever its type, and for all missing keys."""
+    assert canonical_keys(test_input) == test_expected
+
+
+@pytest.mark.parametrize("test_input", [
+    pd.Series([1.0, np.nan, np.nan, 2.0, np.nan]),
+    pd.Series(["1", None, "a", None, "a"]),
+    pd.Series([None, None]),
+])
+def test_mark_new_matches_pandas_duplicated(test_input):
+    """Test the mark_new method flags the same first occurrences as pandas, including missing keys."""
+    with PrimaryKeyStore() as test_store:
+        assert test_store.mark_new(test_input).tolist() == (~test_input.duplicated()).tolist()
+
+
+@pytest.mark.parametrize("test_input_first, test_input_second, test_expected", [
+    (pd.Series([1, 2]), pd.Series(["1", "3"]), [False, True]),
+    (pd.Series([1.0, np.nan]), pd.Series([1, None, "2"]), [False, False, True]),
+    (pd.Series(["a", "2"]), pd.Series([2.0, np.nan]), [False, True]),
+])
+def test_mark_new_matches_keys_across_data_types(test_input_first, test_input_second, test_expected):
+    """Test the mark_new method matches keys seen in previous calls, even if read as a different data type."""
+    with PrimaryKeyStore() as test_store:
+        _ = test_store.mark_new(test_input_first)
+        assert test_store.mark_new(test_input_second).tolist() == test_expected
+
+
+def test_update_adds_keys_of_other_store():
+    """Test the update method adds all the keys of another store, ignoring keys already in the store."""
+    with PrimaryKeyStore() as test_store, PrimaryKeyStore() as test_other_store:
+        test_store.add_many([1, "a"])
+        test_other_store.add_many(["a", 2, 3])
+        test_store.update(test_other_store)
+        assert len(test_store) == 4
+        assert test_store.contains_many([1, 2, 3, "a", "b"]) == {1, 2, 3, "a"}
+        assert len(test_other_store) == 3
@@ -1,10 +1,19 @@
 from src.make_feedback_tool_data.regex_categorisation import (
+    DICT_GROUP_VERBS as MODULE_DICT_GROUP_VERBS,
+    DICT_THEMES as MODULE_DICT_THEMES,
+    GROUP_VERBS_CATEGORISER,
+    REGEX_CATEGORISER_ENGINES,
+    THEME_CATEGORISER,
+    RegexCategoriser,
+    get_regex_categoriser,
     regex_category_identification,
+    required_literals,
     regex_group_verbs,
     regex_for_theme
 )
 import os
 import pytest
+import re
 import yaml
 
 # Get the folder path to the `data` folder, and the name of the expected YAML files
@@ -127,3 +136,162 @@ class TestGroupVerbsIdentification:
         patch_regex_category_identification.assert_called_once_with(
             test_input_text, test_input_dict_group_verb if test_input_dict_group_verb else DICT_GROUP_VERBS
         )
+
+
+def reference_category_identification(text, dict_category):
+    """Reference implementation of regex_category_identification, searching for each raw pattern in turn."""
+    for k, v in dict_category.items():
+        if re.search(v, text, re.IGNORECASE):
+            return k
+    return "unknown"
+
+
+# Define example texts for the `TestRegexCategoriser` test class, covering matches for every theme and verb grouping,
+# and texts without any matches
+args_regex_categoriser_texts = [
+    "foobar", "hello", "foo", "random", "stats", "I need to pay bills", "", "FOOOOBAR and hello",
+    "find out about the furlough scheme", "apply for universal credit", "book a driving test", "report a death",
+    "information about coronavirus symptoms", "self-employment income support grant", "School closures",
+]
+
+
+# Define an example regular expression dictionary with overlapping matches, back-references, and non-ASCII characters
+example_dict_regex_overlapping = {
+    "first": r"bcd",
+    "second": r"\bab",
+    "third": r"abc",
+    "backreference": r"(d)\1",
+    "non_ascii": r"caf\u00e9|stra\u00dfe",
+    "character_class": r"[x-z]{3}",
+    "prefix": r"deliv(er)?",
+    "longer": r"delivery",
+    "suffix": r"lots",
+    "overlapping": r"slots?"
+}
+
+# Define example texts for `example_dict_regex_overlapping`, including non-ASCII texts that match ASCII literals when
+# ignoring case
+args_regex_categoriser_texts_overlapping = ["abcd", "abc", "ab", "a bcd", "abcdd", "dd", "xyz", "CAF\u00c9",
+                                            "\u212abc", "\u017ftrasse", "Stra\u00dfe", "ABCD",
+                                            "delivery", "deliver", "deliv", "slots", "slot", "lots", "deliveryslots"]
+
+
+def reference_category_identification_all(text, dict_category):
+    """Reference implementation to find every matching category, searching for each raw pattern in turn."""
+    return [k for k, v in dict_category.items() if re.search(v, text, re.IGNORECASE)]
+
+
+@pytest.mark.parametrize("test_input_engine", REGEX_CATEGORISER_ENGINES)
+@pytest.mark.parametrize("test_input_dict_category, test_input_texts", [
+    (example_dict_regex, args_regex_categoriser_texts),
+    (DICT_THEMES, args_regex_categoriser_texts),
+    (DICT_GROUP_VERBS, args_regex_categoriser_texts),
+    ({}, args_regex_categoriser_texts),
+    (example_dict_regex_overlapping, args_regex_categoriser_texts_overlapping)
+])
+class TestRegexCategoriserEngines:
+
+    def test_categorise_returns_same_as_reference(self, test_input_dict_category, test_input_texts,
+                                                  test_input_engine):
+        """Test RegexCategoriser.categorise returns the same categories as searching each raw pattern in turn."""
+        test_categoriser = RegexCategoriser(test_input_dict_category, test_input_engine)
+        for text in test_input_texts:
+            assert test_categoriser.categorise(text) == \
+                reference_category_identification(text, test_input_dict_category)
+
+    def test_categorise_all_returns_same_as_reference(self, test_input_dict_category, test_input_texts,
+                                                      test_input_engine):
+        """Test RegexCategoriser.categorise_all returns every matching category in priority order."""
+        test_categoriser = RegexCategoriser(test_input_dict_category, test_input_engine)
+        for text in test_input_texts:
+            assert test_categoriser.categorise_all(text) == \
+                reference_category_identification_all(text, test_input_dict_category)
+
+    @pytest.mark.parametrize("test_input_return_all", [False, True])
+    def test_categorise_many_returns_correctly(self, test_input_dict_category, test_input_texts, test_input_engine,
+                                               test_input_return_all):
+        """Test RegexCategoriser.categorise_many returns the categories of each text in order, including duplicates."""
+        test_input = [*test_input_texts, *reversed(test_input_texts)]
+        test_func = reference_category_identification_all if test_input_return_all else \
+            reference_category_identification
+        assert RegexCategoriser(test_input_dict_category, test_input_engine).categorise_many(
+            test_input, return_all=test_input_return_all
+        ) == [test_func(t, test_input_dict_category) for t in test_input]
+
+
+@pytest.mark.parametrize("test_input_pattern, test_expected", [
+    (r"vulnerable", {"vulnerable"}),
+    (r"(deliver(y|(ies)))|(slot)", {"deliver", "slot"}),
+    (r"self\s?(-|\s)\s?employ", {"employ"}),
+    (r"(f)[o]{2,}bar", {"bar"}),
+    (r"(hell)o?", {"hell"}),
+    (r"Covid", {"covid"}),
+    (r"(^|\s)visa($|\s)", {"visa"}),
+    (r"(a)+b", {"a"}),
+    (r"[abc]+", None),
+    (r"(abc)|[xyz]", None),
+    (r"caf\u00e9", None),
+])
+def test_required_literals(test_input_pattern, test_expected):
+    """Test required_literals returns the lowercase literal strings, where one must be in any match."""
+    assert required_literals(test_input_pattern) == (frozenset(test_expected) if test_expected else None)
+
+
+def test_regex_categoriser_raises_for_unknown_engine():
+    """Test RegexCategoriser raises a ValueError for an unknown engine."""
+    with pytest.raises(ValueError):
+        _ = RegexCategoriser(example_dict_regex, "unknown_engine")
+
+
+def _raise_runtime_error(pattern):
+    """Raise a RuntimeError, as `required_literals` might if the private regular expression parser changes."""
+    raise RuntimeError(f"Cannot parse {pattern}")
+
+
+@pytest.mark.parametrize("test_input_side_effect", [
+    _raise_runtime_error,
+    lambda p: frozenset(),
+    lambda p: required_literals(p) if len(p) % 2 else _raise_runtime_error(p),
+    lambda p: required_literals(p) if len(p) % 2 else frozenset()
+])
+@pytest.mark.parametrize("test_input_dict_category, test_input_texts", [
+    (DICT_THEMES, args_regex_categoriser_texts),
+    (DICT_GROUP_VERBS, args_regex_categoriser_texts),
+    (example_dict_regex_overlapping, args_regex_categoriser_texts_overlapping)
+])
+def test_regex_categoriser_falls_back_if_required_literals_fails(mocker, test_input_dict_category, test_input_texts,
+                                                                 test_input_side_effect):
+    """Test RegexCategoriser always searches patterns where required_literals raises, or returns no literal strings."""
+
+    # Patch `required_literals` to fail for all, or some, of the patterns
+    mocker.patch("src.make_feedback_tool_data.regex_categorisation.required_literals",
+                 side_effect=test_input_side_effect)
+
+    # Assert the 'multi' engine still returns the same categories as searching each raw pattern in turn
+    test_categoriser = RegexCategoriser(test_input_dict_category, "multi")
+    for text in test_input_texts:
+        assert test_categoriser.categorise(text) == reference_category_identification(text, test_input_dict_category)
+        assert test_categoriser.categorise_all(text) == \
+            reference_category_identification_all(text, test_input_dict_category)
+
+
+@pytest.mark.parametrize("test_input_dict_category", [example_dict_regex, DICT_THEMES, DICT_GROUP_VERBS, {}])
+class TestRegexCategoriser:
+
+    def test_get_regex_categoriser_cached(self, test_input_dict_category):
+        """Test get_regex_categoriser only builds one RegexCategoriser for dictionaries with the same items."""
+        assert get_regex_categoriser(test_input_dict_category) is \
+            get_regex_categoriser(dict(test_input_dict_category))
+        assert get_regex_categoriser(test_input_dict_category) is not \
+            get_regex_categoriser({**test_input_dict_category, "new_category": "new"})
+
+
+@pytest.mark.parametrize("test_input_dict_category, test_expected", [
+    (MODULE_DICT_THEMES, THEME_CATEGORISER),
+    (MODULE_DICT_GROUP_VERBS, GROUP_VERBS_CATEGORISER),
+    (DICT_THEMES, THEME_CATEGORISER),
+    (DICT_GROUP_VERBS, GROUP_VERBS_CATEGORISER),
+])
+def test_get_regex_categoriser_returns_prebuilt(test_input_dict_category, test_expected):
+    """Test get_regex_categoriser returns the prebuilt RegexCategoriser for the theme, and group verbs, dictionaries."""
+    assert get_regex_categoriser(test_input_dict_category) is test_expected
@@ -0,0 +1,130 @@
+from src.make_feedback_tool_data.run_metrics import RunMetrics, StageMetrics, current_rss_mib, peak_rss_mib
+import json
+import pytest
+import time
+import tracemalloc
+
+
+def test_peak_rss_mib_returns_correctly():
+    """Test peak_rss_mib returns a positive number of MiB."""
+    assert peak_rss_mib() > 0
+
+
+def test_current_rss_mib_returns_correctly():
+    """Test current_rss_mib returns a positive number of MiB."""
+    test_output = current_rss_mib()
+    if test_output is None:
+        pytest.skip("The current RSS cannot be measured on this platform")
+    assert test_output > 0
+
+
+class TestStageMetrics:
+
+    def test_records_times_and_rows(self):
+        """Test StageMetrics records the wall time, CPU time, rows in and out, and rows per second of a stage."""
+        with StageMetrics("stage", rows_in=10) as test_output:
+            time.sleep(0.01)
+            test_output.rows_out = 5
+
+        # Assert the wall time includes the sleep, but the CPU time does not, and the rows per second are correct
+        assert test_output.wall_time >= 0.01
+        assert 0 <= test_output.cpu_time < test_output.wall_time
+        assert test_output.rows_per_sec == pytest.approx(10 / test_output.wall_time)
+        assert test_output.peak_rss_increase_mib >= 0
+        assert test_output.to_dict()["rows_out"] == 5
+
+    def test_records_change_in_current_rss(self):
+        """Test StageMetrics records the change in the current RSS, which is negative if a stage frees memory."""
+        if current_rss_mib() is None:
+            pytest.skip("The current RSS cannot be measured on this platform")
+
+        # Allocate, and write to, 64 MiB of memory in one stage, and free it in another
+        with StageMetrics("allocate") as test_allocate:
+            test_allocation = b"x" * 64 * 2 ** 20
+        with StageMetrics("free") as test_free:
+            del test_allocation
+
+        # Assert the current RSS goes up by about 64 MiB, and then down again
+        assert test_allocate.rss_delta_mib > 32
+        assert test_free.rss_delta_mib < -32
+
+    @pytest.mark.parametrize("test_input_rows_in", [None, 0])
+    def test_rows_per_sec_without_rows_in(self, test_input_rows_in):
+        """Test StageMetrics rows_per_sec is None without rows in, and 0 for no rows in."""
+        with StageMetrics("stage", rows_in=test_input_rows_in) as test_output:
+            pass
+        assert test_output.rows_per_sec == (None if test_input_rows_in is None else 0)
+
+    @pytest.mark.parametrize("test_input_tracing", [False, True])
+    def test_records_top_allocators(self, test_input_tracing):
+        """Test StageMetrics records the top memory allocators, and only stops tracing if it started tracing."""
+        if test_input_tracing:
+            tracemalloc.start()
+        try:
+            with StageMetrics("stage", top_allocators=2) as test_output:
+                test_allocation = [bytearray(2 ** 20) for _ in range(4)]  # noqa: F841
+
+            # Assert the largest memory allocation is in this file, and tracing is only still on if already on
+            assert 1 <= len(test_output.allocators) <= 2
+            assert test_output.allocators[0]["location"].startswith(__file__)
+            assert test_output.allocators[0]["size_diff_kib"] >= 4 * 2 ** 10
+            assert tracemalloc.is_tracing() == test_input_tracing
+        finally:
+            tracemalloc.stop()
+
+
+class TestRunMetrics:
+
+    def test_iter_stage_returns_correctly(self):
+        """Test RunMetrics.iter_stage returns every item, and records one stage call per item."""
+        test_metrics = RunMetrics()
+        test_output = list(test_metrics.iter_stage("read", iter([[1, 2], [3], []])))
+        assert test_output == [[1, 2], [3], []]
+        assert [s.rows_out for s in test_metrics.stages] == [2, 1, 0]
+
+    def test_summary_returns_correctly(self):
+        """Test RunMetrics.summary combines the calls of each stage, in the order each stage was first called."""
+        test_metrics = RunMetrics()
+        for rows_in in [4, 6]:
+            with test_metrics.stage("a", rows_in) as stage:
+                stage.rows_out = rows_in // 2
+            with test_metrics.stage("b") as stage:
+                stage.rows_out = rows_in
+
+        # Assert the calls, wall times, and rows of each stage are combined
+        test_output = test_metrics.summary()
+        assert [s["name"] for s in test_output] == ["a", "b"]
+        assert [s["calls"] for s in test_output] == [2, 2]
+        assert test_output[0]["wall_time"] == pytest.approx(sum(s.wall_time for s in test_metrics.stages[::2]))
+        assert (test_output[0]["rows_in"], test_output[0]["rows_out"]) == (10, 5)
+        assert (test_output[1]["rows_in"], test_output[1]["rows_out"]) == (None, 10)
+        assert test_output[1]["rows_per_sec"] is None
+
+    def test_summary_combines_allocators(self):
+        """Test RunMetrics.summary sums the top memory allocators of each stage by source line."""
+        test_metrics = RunMetrics(top_allocators=1)
+        for _ in range(2):
+            with test_metrics.stage("a"):
+                test_allocation = bytearray(2 ** 20)  # noqa: F841
+            del test_allocation
+
+        # Assert the allocators are combined into one source line
+        test_output = test_metrics.summary()[0]["allocators"]
+        assert len(test_output) == 1
+        assert test_output[0]["size_diff_kib"] == pytest.approx(sum(s.allocators[0]["size_diff_kib"]
+                                                                    for s in test_metrics.stages))
+
+    def test_write_report_returns_correctly(self, tmp_path):
+        """Test RunMetrics.write_report writes a JSON run report with the run information and combined stages."""
+        test_metrics = RunMetrics()
+        with test_metrics.stage("a", 3) as stage:
+            stage.rows_out = 3
+
+        # Write the run report, and assert it is as expected
+        test_input_filename = tmp_path.joinpath("report.json")
+        test_metrics.write_report(str(test_input_filename), survey_filename="survey.csv", chunksize=None)
+        test_output = json.loads(test_input_filename.read_text())
+        assert test_output["survey_filename"] == "survey.csv"
+        assert test_output["chunksize"] is None
+        assert test_output["wall_time"] >= test_output["stages"][0]["wall_time"]
+        assert test_output["stages"] == test_metrics.summary()
@@ -0,0 +1,106 @@
+from src.make_feedback_tool_data.run_metrics import RunMetrics
+from src.make_feedback_tool_data.stage_profiler import SamplingProfiler, StageProfiler
+import json
+import pstats
+import pytest
+import time
+
+
+def busy_wait(seconds: float) -> None:
+    """Busy-wait for a number of seconds, so a sampling profiler samples this function."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampling_profiler_samples_calling_thread():
+    """Test SamplingProfiler samples the call stack of the calling thread, from the outermost function inwards."""
+    test_profiler = SamplingProfiler(interval=0.001)
+    test_profiler.enable()
+    busy_wait(0.2)
+    test_profiler.disable()
+
+    # Assert there are samples, and most of them have `busy_wait`, called from this test, near the innermost function
+    assert sum(test_profiler.samples.values()) > 0
+    test_output = sum(c for s, c in test_profiler.samples.items()
+                      if "busy_wait" in [f[2] for f in s[-3:]] and s[0][2] != "busy_wait")
+    assert test_output >= 0.5 * sum(test_profiler.samples.values())
+
+
+def test_stage_profiler_raises_for_invalid_profiler():
+    """Test StageProfiler raises a ValueError for an invalid profiler."""
+    with pytest.raises(ValueError):
+        StageProfiler("pyspy")
+
+
+def test_stage_profiler_raises_for_nested_stages():
+    """Test StageProfiler raises a RuntimeError if a stage is profiled whilst another stage is profiled."""
+    test_profiler = StageProfiler()
+    test_profiler.enable("a")
+    try:
+        with pytest.raises(RuntimeError):
+            test_profiler.enable("b")
+    finally:
+        test_profiler.disable()
+
+
+@pytest.mark.parametrize("test_input_profiler", ["cprofile", "sampling"])
+class TestStageProfiler:
+
+    def test_profiles_each_stage_separately(self, test_input_profiler):
+        """Test StageProfiler profiles each stage measured by RunMetrics separately, combining calls of each stage."""
+        test_profiler = StageProfiler(test_input_profiler, interval=0.001)
+        test_metrics = RunMetrics(profiler=test_profiler)
+        for _ in range(2):
+            with test_metrics.stage("busy"):
+                busy_wait(0.1)
+            with test_metrics.stage("idle"):
+                pass
+
+        # Assert there is one profile per stage, and `busy_wait` has the most self time only in the 'busy' stage
+        assert list(test_profiler.profiles) == ["busy", "idle"]
+        test_output = test_profiler.top_functions("busy", 3)
+        assert test_output[0]["function"].endswith("(busy_wait)")
+        assert test_output[0]["self_time"] > 0
+        assert not any(r["function"].endswith("(busy_wait)") for r in test_profiler.top_functions("idle"))
+
+    def test_format_top_functions_returns_correctly(self, test_input_profiler):
+        """Test StageProfiler.format_top_functions returns a table of at most n functions for each stage."""
+        test_profiler = StageProfiler(test_input_profiler, interval=0.001)
+        for name in ["a", "b"]:
+            test_profiler.enable(name)
+            busy_wait(0.05)
+            test_profiler.disable()
+
+        # Assert the table has a title and header per stage, and at most 2 functions per stage
+        test_output = test_profiler.format_top_functions(2).splitlines()
+        assert [line for line in test_output if line.startswith("Stage ")] == ["Stage a:", "Stage b:"]
+        assert 4 < len(test_output) <= 8
+        assert "busy_wait" in test_output[2]
+
+    def test_write_returns_correctly(self, tmp_path, test_input_profiler):
+        """Test StageProfiler.write saves pstats files, or a speedscope file, for the profiled stages."""
+        test_profiler = StageProfiler(test_input_profiler, interval=0.001)
+        for name in ["read csv", "busy"]:
+            test_profiler.enable(name)
+            busy_wait(0.05)
+            test_profiler.disable()
+        test_output = test_profiler.write(str(tmp_path.joinpath("profile")))
+
+        # Assert a pstats file per stage, with file-name-safe names, can be read by `pstats`
+        if test_input_profiler == "cprofile":
+            assert [p.split("/")[-1] for p in test_output] == ["read_csv.pstats", "busy.pstats"]
+            for p in test_output:
+                assert any(f[2] == "busy_wait" for f in pstats.Stats(p).stats)
+            return
+
+        # Otherwise, assert one speedscope file has a sampled profile per stage, with valid frame indexes
+        assert [p.split("/")[-1] for p in test_output] == ["profile.speedscope.json"]
+        with open(test_output[0]) as f:
+            test_speedscope = json.load(f)
+        assert [p["name"] for p in test_speedscope["profiles"]] == ["read csv", "busy"]
+        for p in test_speedscope["profiles"]:
+            assert p["type"] == "sampled"
+            assert len(p["samples"]) == len(p["weights"])
+            assert p["endValue"] == pytest.approx(sum(p["weights"]))
+            assert all(0 <= i < len(test_speedscope["shared"]["frames"]) for s in p["samples"] for i in s)
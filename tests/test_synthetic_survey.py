@@ -0,0 +1,131 @@
+from src.make_feedback_tool_data.preprocess import PII_REGEX, PreProcess
+from src.make_feedback_tool_data.regex_categorisation import DICT_THEMES
+from src.make_feedback_tool_data.synthetic_survey import (
+    NON_ENGLISH_COMMENTS,
+    SURVEY_COLUMNS,
+    generate_survey_rows,
+    sample_regex,
+    write_survey_file
+)
+from itertools import islice
+from pathlib import Path
+import pandas as pd
+import pytest
+import random
+import re
+import subprocess
+import sys
+
+# Generate example synthetic survey rows with the default arguments
+EXAMPLE_ROWS = pd.DataFrame(generate_survey_rows(5000))
+
+# Define a script that imports `synthetic_survey`, and generates rows, with the natural language processing (NLP)
+# packages blocked. The package `__init__` imports the whole pipeline, so the package is stubbed to import the module
+# on its own
+SCRIPT_WITHOUT_NLP_PACKAGES = """
+import sys, types
+for name in ("icu", "nltk", "polyglot", "spacy"):
+    sys.modules[name] = None
+package = types.ModuleType("src.make_feedback_tool_data")
+package.__path__ = ["src/make_feedback_tool_data"]
+sys.modules["src.make_feedback_tool_data"] = package
+from src.make_feedback_tool_data.synthetic_survey import generate_survey_rows
+assert len(list(generate_survey_rows(100, seed=0))) == 100
+assert "src.make_feedback_tool_data.preprocess" not in sys.modules
+"""
+
+
+@pytest.mark.parametrize("test_input_theme, test_input_pattern", DICT_THEMES.items())
+def test_sample_regex_returns_correctly(test_input_theme, test_input_pattern):
+    """Test sample_regex returns text strings matched by each theme regular expression."""
+    rng = random.Random(test_input_theme)
+    for _ in range(50):
+        assert re.search(test_input_pattern, sample_regex(test_input_pattern, rng))
+
+
+@pytest.mark.parametrize("test_input_pattern", [r"[^a-z]", r"\d{2,4}", r"a.c", r"(x|y)+z*", r"[^q]\s[A-C]?"])
+def test_sample_regex_returns_correctly_for_other_syntax(test_input_pattern):
+    """Test sample_regex returns text strings fully matched by regular expressions with other syntax."""
+    rng = random.Random(42)
+    for _ in range(50):
+        assert re.fullmatch(test_input_pattern, sample_regex(test_input_pattern, rng))
+
+
+@pytest.mark.parametrize("test_input_seed", [0, 42])
+def test_generate_survey_rows_is_deterministic(test_input_seed):
+    """Test generate_survey_rows generates the same rows for the same seed, and different rows otherwise."""
+    test_output = list(generate_survey_rows(500, seed=test_input_seed))
+    assert test_output == list(generate_survey_rows(500, seed=test_input_seed))
+    assert test_output != list(generate_survey_rows(500, seed=test_input_seed + 1))
+
+
+def test_generate_survey_rows_without_limit():
+    """Test generate_survey_rows generates rows without limit if n_rows is None, which start with the same rows."""
+    test_output = list(islice(generate_survey_rows(seed=7), 6000))
+    assert len(test_output) == 6000
+    assert test_output[:1000] == list(generate_survey_rows(1000, seed=7))
+
+
+def test_generate_survey_rows_columns():
+    """Test generate_survey_rows generates rows with the survey data columns used by create_dataset."""
+    assert EXAMPLE_ROWS.columns.tolist() == SURVEY_COLUMNS
+    assert EXAMPLE_ROWS["Q3"].map(lambda x: isinstance(x, str) and len(x) > 0).all()
+
+
+@pytest.mark.parametrize("test_input_duplicate_rate", [0, 0.05, 0.3])
+def test_generate_survey_rows_duplicate_rate(test_input_duplicate_rate):
+    """Test generate_survey_rows duplicates about duplicate_rate of the rows, along with their primary key."""
+    test_output = pd.DataFrame(generate_survey_rows(5000, duplicate_rate=test_input_duplicate_rate))
+    assert test_output.duplicated("primary_key").mean() == pytest.approx(test_input_duplicate_rate, abs=0.02)
+    assert test_output.duplicated("primary_key").sum() == test_output.duplicated().sum()
+
+
+def test_generate_survey_rows_pii_non_english_and_long_comments():
+    """Test generate_survey_rows generates comments with PII placeholders, non-English, and overly long comments."""
+
+    # Assert a tenth of comments have PII placeholders, which are all removed by `PreProcess.replace_pii_regex`
+    has_pii = EXAMPLE_ROWS["Q3"].str.contains(PII_REGEX)
+    assert has_pii.mean() == pytest.approx(0.1, abs=0.03)
+    assert not EXAMPLE_ROWS["Q3"].map(PreProcess.replace_pii_regex).str.contains(r"\[[A-Z_]+\]").any()
+
+    # Assert there are non-English comments, and a few comments longer than the 4,000 character threshold
+    assert EXAMPLE_ROWS["Q3"].isin(NON_ENGLISH_COMMENTS).mean() == pytest.approx(0.02, abs=0.01)
+    assert any(len(r["Q3"]) >= 4000 for r in generate_survey_rows(20000))
+
+
+@pytest.mark.parametrize("test_input_n_rows, test_input_chunksize", [(0, 10), (25, 10), (30, 10), (100, 1000)])
+def test_write_survey_file_returns_correctly(tmp_path, test_input_n_rows, test_input_chunksize):
+    """Test write_survey_file writes the same rows as generate_survey_rows, whatever the chunk size."""
+    test_input_filename = str(tmp_path.joinpath("survey.csv"))
+    write_survey_file(test_input_filename, test_input_n_rows, chunksize=test_input_chunksize, seed=3)
+
+    # Assert the CSV file has the survey data columns, and the same rows as `generate_survey_rows`
+    test_output = pd.read_csv(test_input_filename, keep_default_na=False, dtype={"Q3": str})
+    test_expected = pd.DataFrame(generate_survey_rows(test_input_n_rows, seed=3), columns=SURVEY_COLUMNS)
+    assert test_output.columns.tolist() == SURVEY_COLUMNS
+    assert test_output.values.tolist() == test_expected.values.tolist()
+
+
+def test_write_survey_file_without_limit(mocker, tmp_path):
+    """Test write_survey_file streams rows generated without limit, in chunks, if n_rows is not given."""
+    test_input_filename = str(tmp_path.joinpath("survey.csv"))
+
+    # Patch `generate_survey_rows`, so that the rows generated without limit stop after 25 rows
+    patch_generate_survey_rows = mocker.patch(
+        "src.make_feedback_tool_data.synthetic_survey.generate_survey_rows",
+        side_effect=lambda n_rows, **kwargs: islice(generate_survey_rows(n_rows, **kwargs), 25)
+    )
+    write_survey_file(test_input_filename, chunksize=10, seed=3)
+
+    # Assert rows are generated without limit, and the CSV file has the same rows as `generate_survey_rows`
+    patch_generate_survey_rows.assert_called_once_with(None, seed=3)
+    test_output = pd.read_csv(test_input_filename, keep_default_na=False, dtype={"Q3": str})
+    test_expected = pd.DataFrame(islice(generate_survey_rows(seed=3), 25), columns=SURVEY_COLUMNS)
+    assert test_output.values.tolist() == test_expected.values.tolist()
+
+
+def test_synthetic_survey_runs_without_nlp_packages():
+    """Test synthetic_survey generates rows without importing preprocess, or the NLP packages it depends on."""
+    test_output = subprocess.run([sys.executable, "-c", SCRIPT_WITHOUT_NLP_PACKAGES], cwd=Path(__file__).parents[1],
+                                 capture_output=True, text=True)
+    assert test_output.returncode == 0, test_output.stderr
@@ -1,10 +1,15 @@
 from src.make_feedback_tool_data.chunk import Chunk
-from src.make_feedback_tool_data.text_chunking import ChunkParser, FIlE_GRAMMAR
+from src.make_feedback_tool_data.preprocess import PreProcess
+from src.make_feedback_tool_data.text_chunking import CHUNK_ENGINES, ChunkParser, FIlE_GRAMMAR
+from src.make_feedback_tool_data import text_chunking
 import inspect
+import os
+import pickle
 import pytest
 
 # Compile a list of the attribute, and instance and static method names in the `ChunkParser` class
-args_chunkparser_member_names = ["_load_grammar_from_file", "_chunk_text", "_merge_adjacent_chunks", "extract_phrase"]
+args_chunkparser_member_names = ["_load_grammar_from_file", "_chunk_text", "_merge_adjacent_chunks", "extract_phrase",
+                                 "filter_pairs", "from_cache", "iter_phrase", "iter_phrase_pairs"]
 
 # Define a list of method names in `ChunkParser`
 args_chunkparser_method_names = [a for a in args_chunkparser_member_names if a not in ["_load_grammar_from_file"]]
@@ -54,8 +59,8 @@ class TestChunkParserInitialisation:
     def test_calls_attributes(self, mocker, test_input_filename, test_attribute):
         """Test that ChunkParser, when initialised, calls various attributes."""
 
-        # Patch the attribute of the `ChunkParser` class object
-        patch_member = mocker.patch.object(ChunkParser, test_attribute)
+        # Patch the attribute of the `ChunkParser` class object, returning the grammar, as the grammar is hashed
+        patch_member = mocker.patch.object(ChunkParser, test_attribute, return_value=file_grammar_regex_patterns)
 
         # Invoke the `ChunkParser` class
         _ = ChunkParser(test_input_filename)
@@ -79,6 +84,90 @@ def test_grammar_attribute_same_for_none_or_file_grammar():
     assert ChunkParser().grammar == ChunkParser(FIlE_GRAMMAR).grammar
 
 
+def test_chunkparser_raises_for_unknown_engine():
+    """Test that ChunkParser raises a ValueError if the engine is not in CHUNK_ENGINES."""
+    with pytest.raises(ValueError):
+        _ = ChunkParser(engine="unknown")
+
+
+@pytest.fixture
+def clear_parser_cache():
+    """Clear the module-level cache of chunking engine objects before, and after the test."""
+    text_chunking._PARSER_CACHE.clear()
+    yield
+    text_chunking._PARSER_CACHE.clear()
+
+
+@pytest.mark.usefixtures("clear_parser_cache")
+@pytest.mark.parametrize("test_input_engine, test_input_engine_class", [("nltk", "RegexpParser"),
+                                                                        ("compiled", "CompiledChunker")])
+class TestChunkParserCache:
+
+    def test_builds_engine_once_per_grammar(self, mocker, test_input_engine, test_input_engine_class):
+        """Test that ChunkParser only builds the chunking engine once for the same grammar, and engine."""
+
+        # Spy on the chunking engine class, and initialise two `ChunkParser` objects
+        spy_engine = mocker.spy(text_chunking, test_input_engine_class)
+        test_output = [ChunkParser(engine=test_input_engine), ChunkParser(FIlE_GRAMMAR, engine=test_input_engine)]
+
+        # Assert the chunking engine was only built once, and is shared
+        assert spy_engine.call_count == 1
+        assert test_output[0].parser is test_output[1].parser
+
+    def test_pickle_round_trip(self, test_input_engine, test_input_engine_class):
+        """Test that ChunkParser can be pickled, and the unpickled object extracts the same phrases."""
+        test_input = ChunkParser(engine=test_input_engine)
+        test_output = pickle.loads(pickle.dumps(test_input))
+        assert test_output.engine == test_input_engine
+        for sentences in args_extract_phrase_method_inputs:
+            assert test_output.extract_phrase(sentences, True) == test_input.extract_phrase(sentences, True)
+
+    def test_from_cache_creates_and_reuses_cache_file(self, mocker, tmp_path, test_input_engine,
+                                                      test_input_engine_class):
+        """Test that ChunkParser.from_cache creates the cache file, and then loads it instead of creating a parser."""
+        test_input_path = str(tmp_path.joinpath("parser.pickle"))
+        test_expected = ChunkParser.from_cache(test_input_path, engine=test_input_engine)
+        assert os.path.isfile(test_input_path)
+
+        # Clear the module-level cache, and spy on the `ChunkParser` class initialisation
+        text_chunking._PARSER_CACHE.clear()
+        spy_init = mocker.spy(ChunkParser, "__init__")
+
+        # Assert loading from the cache file does not initialise a `ChunkParser` object, and gives the same phrases
+        test_output = ChunkParser.from_cache(test_input_path, engine=test_input_engine)
+        spy_init.assert_not_called()
+        assert test_output.grammar == test_expected.grammar and test_output.engine == test_input_engine
+        for sentences in args_extract_phrase_method_inputs:
+            assert test_output.extract_phrase(sentences, True) == test_expected.extract_phrase(sentences, True)
+
+    @pytest.mark.parametrize("test_input_cache_content", [b"not a pickle", b""])
+    def test_from_cache_replaces_unreadable_cache_file(self, tmp_path, test_input_engine, test_input_engine_class,
+                                                       test_input_cache_content):
+        """Test that ChunkParser.from_cache replaces an unreadable cache file."""
+        test_input_path = tmp_path.joinpath("parser.pickle")
+        test_input_path.write_bytes(test_input_cache_content)
+        assert ChunkParser.from_cache(str(test_input_path), engine=test_input_engine).engine == test_input_engine
+        assert pickle.loads(test_input_path.read_bytes()).engine == test_input_engine
+
+
+def test_from_cache_replaces_cache_file_for_other_grammar_or_engine(tmp_path):
+    """Test that ChunkParser.from_cache replaces the cache file if the grammar, or engine has changed."""
+
+    # Write another grammar file, and create a cache file using the default grammar file, and 'nltk' engine
+    test_input_grammar_filename = str(tmp_path.joinpath("grammar.txt"))
+    with open(test_input_grammar_filename, "w") as f:
+        f.write("rb:\n{<RB>+}")
+    test_input_path = str(tmp_path.joinpath("parser.pickle"))
+    _ = ChunkParser.from_cache(test_input_path)
+
+    # Assert changing the grammar, and then the engine, replaces the cache file
+    assert ChunkParser.from_cache(test_input_path, test_input_grammar_filename).grammar == "rb:\n{<RB>+}"
+    test_output = ChunkParser.from_cache(test_input_path, test_input_grammar_filename, "compiled")
+    assert test_output.engine == "compiled"
+    with open(test_input_path, "rb") as f:
+        assert pickle.load(f).engine == "compiled"
+
+
 @pytest.fixture
 def temp_grammar_file(tmpdir_factory, temp_text):
     """Set up a pytest tmpdir_factory fixture to simulate a grammar regular expressions file."""
@@ -274,19 +363,21 @@ args_methods_with_list_chunk_outputs_returns_correctly = [
 ]
 
 
+@pytest.mark.parametrize("test_input_engine", CHUNK_ENGINES)
 @pytest.mark.parametrize("test_method, test_input, test_expected",
                          args_methods_with_list_chunk_outputs_returns_correctly)
-def test_methods_with_list_chunk_outputs_returns_correctly(test_method, test_input, test_expected):
-    """Test the instance methods of ChunkParser that return lists of Chunk objects are correct."""
+def test_methods_with_list_chunk_outputs_returns_correctly(test_method, test_input, test_expected, test_input_engine):
+    """Test the instance methods of ChunkParser that return lists of Chunk objects are correct for each engine."""
 
     # Invoke the `test_method` method of `ChunkParser`
-    test_output = getattr(ChunkParser(), test_method)(test_input)
+    test_output = getattr(ChunkParser(engine=test_input_engine), test_method)(test_input)
 
-    # Assert each element in `test_output` is a Chunk object, and has the same `__dict__` as the equivalent element
-    # in `test_expected`
+    # Assert each element in `test_output` is a Chunk object, and is equal to the equivalent element in
+    # `test_expected`, with the same text
     for e, o in zip(test_expected, test_output):
         assert isinstance(o, Chunk)
-        assert o.__dict__ == e.__dict__
+        assert o == e
+        assert o.text == e.text
 
 
 # Define input arguments for the `TestExtractPhraseMethod` test class; the first text is 'I am going to go and test to
@@ -451,19 +542,22 @@ args_extract_phrase_method = [
 ]
 
 
+@pytest.mark.parametrize("test_input_engine", CHUNK_ENGINES)
 @pytest.mark.parametrize("test_input_sentences, test_input_merge_inplace, test_expected", args_extract_phrase_method)
-def test_extract_phrase_returns_correctly(test_input_sentences, test_input_merge_inplace, test_expected):
-    """Test that the extract_phrase method returns correctly."""
+def test_extract_phrase_returns_correctly(test_input_sentences, test_input_merge_inplace, test_expected,
+                                          test_input_engine):
+    """Test that the extract_phrase method returns correctly for each engine."""
 
     # Invoke the `extract_phrase` method of `ChunkParser`
-    test_output = ChunkParser().extract_phrase(test_input_sentences, test_input_merge_inplace)
+    test_output = ChunkParser(engine=test_input_engine).extract_phrase(test_input_sentences, test_input_merge_inplace)
 
-    # Assert each element within the nested `test_output` is a Chunk object, and has the same `__dict__` as
-    # the equivalent nested element in `test_expected`
+    # Assert each element within the nested `test_output` is a Chunk object, and is equal to the equivalent nested
+    # element in `test_expected`, with the same text
     for e_list, o_list in zip(test_expected, test_output):
         for e, o in zip(e_list, o_list):
             assert isinstance(o, Chunk)
-            assert o.__dict__ == e.__dict__
+            assert o == e
+            assert o.text == e.text
 
 
 @pytest.fixture
@@ -545,3 +639,63 @@ class TestExtractPhraseCallsMethods:
             assert test_output == [resource__merge_adjacent_chunks_patch.return_value] * len(test_input_sentences)
         else:
             assert test_output == [resource__chunk_text_patch.return_value] * len(test_input_sentences)
+
+
+@pytest.mark.parametrize("test_input_merge_inplace", [False, True])
+def test_iter_phrase_yields_lazily(mocker, test_input_merge_inplace):
+    """Test that the iter_phrase method chunks each sentence lazily, and yields the same chunks as extract_phrase."""
+
+    # Combine all the example sentences, and spy on the `_chunk_text` method
+    test_input = [s for i in args_extract_phrase_method_inputs for s in i]
+    test_expected = ChunkParser().extract_phrase(test_input, test_input_merge_inplace)
+    spy_chunk_text = mocker.spy(ChunkParser, "_chunk_text")
+
+    # Assert no sentence is chunked until the first sentence is requested, and then only the first sentence is
+    test_output = ChunkParser().iter_phrase(iter(test_input), test_input_merge_inplace)
+    assert spy_chunk_text.call_count == 0
+    assert next(test_output) == test_expected[0]
+    assert spy_chunk_text.call_count == 1
+
+    # Assert the remaining sentences are the same as the output of the `extract_phrase` method
+    assert list(test_output) == test_expected[1:]
+
+
+# Define the test cases for the `test_filter_pairs_returns_correctly` pytest; each is a frozenset of allowed label pairs
+args_filter_pairs_label_pairs = [
+    frozenset(),
+    frozenset({("verb", "noun")}),
+    frozenset({("verb", "noun"), ("verb", "prep_noun"), ("verb", "noun_verb"), ("noun", "prep_noun"),
+               ("prep_noun", "noun"), ("prep_noun", "prep_noun")}),
+    frozenset({("noun", "verb"), ("verb", "verb")})
+]
+
+
+@pytest.mark.parametrize("test_input_label_pairs", args_filter_pairs_label_pairs)
+@pytest.mark.parametrize("test_input_sentences", args_extract_phrase_method_inputs)
+def test_filter_pairs_returns_correctly(test_input_sentences, test_input_label_pairs):
+    """Test filter_pairs returns the same pairs, in order, as filtering PreProcess.compute_combinations by label."""
+
+    # Extract the chunks of `test_input_sentences`, and define the expected pairs
+    test_input = ChunkParser().extract_phrase(test_input_sentences, merge_inplace=True)
+    test_expected = [tuple(c) for c in PreProcess.compute_combinations(test_input, 2)
+                     if (c[0].label, c[1].label) in test_input_label_pairs]
+
+    # Assert the output is a lazy iterator, and returns the expected pairs
+    test_output = ChunkParser.filter_pairs(test_input, test_input_label_pairs)
+    assert not isinstance(test_output, list)
+    assert list(test_output) == test_expected
+
+
+@pytest.mark.parametrize("test_input_label_pairs", args_filter_pairs_label_pairs)
+@pytest.mark.parametrize("test_input_sentences", args_extract_phrase_method_inputs)
+def test_iter_phrase_pairs_returns_correctly(test_input_sentences, test_input_label_pairs):
+    """Test iter_phrase_pairs returns the same pairs, in order, as filter_pairs of the merged extract_phrase output."""
+
+    # Define the expected pairs, from the merged chunks of `test_input_sentences`
+    test_expected = list(ChunkParser.filter_pairs(ChunkParser().extract_phrase(test_input_sentences, True),
+                                                  test_input_label_pairs))
+
+    # Assert the output is a lazy iterator, and returns the expected pairs
+    test_output = ChunkParser().iter_phrase_pairs(iter(test_input_sentences), test_input_label_pairs)
+    assert not isinstance(test_output, list)
+    assert list(test_output) == test_expected